@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from audio_buffer import AudioBuffer
+from response_cache import normalize_transcript
+
+
+class AssetLibrary:
+    """
+    Index of phrases rendered offline: speech plus Audio2Face emotion keys
+    and geometry cache (see flask-server/prerender.py).
+
+    Each entry is stored as <key>.wav (already prepared for A2F) next to the
+    exported cache, and described in index.json. Entries are found by the
+    normalized text the avatar would say, or by a visitor question they
+    answer (FAQ entries). Only entries rendered with this library's voice
+    match. The index is re-read whenever a render job rewrites it, so the
+    server picks up new phrases without a restart.
+
+    Parameters:
+    - directory: where WAVs, caches and the index live
+    - voice: ElevenLabs voice the entries must have been rendered with (None = any)
+    - max_memory_items: WAVs kept decoded in memory
+    """
+
+    def __init__(self, directory: str, voice: str | None = None, max_memory_items: int = 32):
+        self.directory = directory
+        self.voice = voice
+        self.max_memory_items = max_memory_items
+        self.question_hits = 0
+        self.response_hits = 0
+
+        self._audio = OrderedDict()   # key -> AudioBuffer
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(directory, "index.json")
+        self._index = {}              # key -> entry
+        self._by_text = {}            # normalized text -> key
+        self._by_question = {}        # normalized question -> key
+        self._index_mtime = None
+        os.makedirs(directory, exist_ok=True)
+        self._refresh()
+
+    @staticmethod
+    def key(text: str, **settings) -> str:
+        """Asset key for a phrase under the given voice/model settings."""
+        material = json.dumps({"text": normalize_transcript(text), **settings}, sort_keys=True)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()[:32]
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            self._refresh()
+            entry = self._index.get(key)
+            return dict(entry) if entry is not None else None
+
+    def entries(self) -> list[dict]:
+        with self._lock:
+            self._refresh()
+            return [dict(entry) for entry in self._index.values()]
+
+    def find_response(self, text: str) -> dict | None:
+        """The entry that says exactly this (after normalization), or None."""
+        return self._find("_by_text", text, "response_hits")
+
+    def find_question(self, question: str) -> dict | None:
+        """The FAQ entry that answers this question, or None."""
+        return self._find("_by_question", question, "question_hits")
+
+    def audio(self, entry: dict) -> AudioBuffer:
+        """The entry's speech, decoded once and kept in memory."""
+        key = entry["key"]
+        with self._lock:
+            buffer = self._audio.get(key)
+            if buffer is not None:
+                self._audio.move_to_end(key)
+                return buffer
+        buffer = AudioBuffer.from_wav(self.path(entry["wav"]))
+        with self._lock:
+            self._audio[key] = buffer
+            while len(self._audio) > self.max_memory_items:
+                self._audio.popitem(last=False)
+        return buffer
+
+    def path(self, file_name: str) -> str:
+        return os.path.join(self.directory, file_name)
+
+    def put(self, entry: dict) -> None:
+        """Adds or replaces an entry (entry["key"]) and rewrites the index."""
+        with self._lock:
+            self._refresh()
+            self._index[entry["key"]] = dict(entry)
+            self._audio.pop(entry["key"], None)
+            self._save_index()
+            self._rebuild_lookups()
+
+    def stats(self) -> dict:
+        with self._lock:
+            kinds = {}
+            for entry in self._index.values():
+                kind = entry.get("kind", "phrase")
+                kinds[kind] = kinds.get(kind, 0) + 1
+            return {
+                "entries": len(self._index),
+                "kinds": kinds,
+                "question_hits": self.question_hits,
+                "response_hits": self.response_hits,
+                "audio_seconds": round(sum(entry.get("duration", 0.0) for entry in self._index.values()), 2),
+            }
+
+    def _find(self, lookup: str, text: str, counter: str) -> dict | None:
+        with self._lock:
+            self._refresh()
+            key = getattr(self, lookup).get(normalize_transcript(text))
+            entry = self._index.get(key) if key else None
+            if entry is None:
+                return None
+            setattr(self, counter, getattr(self, counter) + 1)
+            return dict(entry)
+
+    # ─── Internals (call with the lock held) ───
+
+    def _refresh(self) -> None:
+        # Re-read the index if a render job (maybe another process) rewrote it
+        try:
+            mtime = os.stat(self._index_path).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._index_mtime:
+            return
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                self._index = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._index_mtime = mtime
+        self._audio.clear()
+        self._rebuild_lookups()
+
+    def _rebuild_lookups(self) -> None:
+        self._by_text, self._by_question = {}, {}
+        for key, entry in self._index.items():
+            if self.voice is not None and entry.get("voice") != self.voice:
+                continue
+            if not os.path.exists(self.path(entry["wav"])):
+                continue
+            self._by_text[normalize_transcript(entry["text"])] = key
+            for question in entry.get("questions", []):
+                self._by_question[normalize_transcript(question)] = key
+
+    def _save_index(self) -> None:
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, indent=2)
+        os.replace(tmp_path, self._index_path)
+        self._index_mtime = os.stat(self._index_path).st_mtime_ns
+
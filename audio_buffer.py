@@ -0,0 +1,151 @@
+import io
+import wave
+from dataclasses import dataclass
+from math import gcd
+
+import numpy as np
+
+from lazy_imports import is_available, lazy_import
+
+WHISPER_RATE = 16000   # Whisper always works on 16 kHz mono audio
+
+# Polyphase resampling (anti-aliased) when SciPy is installed, linear interpolation otherwise
+scipy_signal = lazy_import("scipy.signal")
+HAVE_SCIPY = is_available("scipy")
+
+
+@dataclass
+class AudioBuffer:
+    """
+    In-memory audio passed between pipeline stages.
+
+    samples is a NumPy array shaped (frames,) for mono or (frames, channels),
+    either int16 PCM or float32 in [-1, 1]. Conversions return the same array
+    when nothing needs to change and slices are views, so handing a buffer to
+    the next stage doesn't copy the audio.
+    """
+
+    samples: np.ndarray
+    sample_rate: int
+
+    @property
+    def channels(self) -> int:
+        return 1 if self.samples.ndim == 1 else self.samples.shape[1]
+
+    @property
+    def frames(self) -> int:
+        return self.samples.shape[0]
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate
+
+    # ─── Constructors ───
+
+    @classmethod
+    def from_pcm16(cls, data: bytes, sample_rate: int, channels: int = 1) -> "AudioBuffer":
+        """Wraps raw 16-bit PCM bytes without copying them."""
+        samples = np.frombuffer(data, dtype=np.int16)
+        if channels > 1:
+            samples = samples.reshape(-1, channels)
+        return cls(samples, sample_rate)
+
+    @classmethod
+    def from_wav(cls, source) -> "AudioBuffer":
+        """Reads a 16-bit WAV from a path or file-like object."""
+        with wave.open(source, 'rb') as wf:
+            if wf.getsampwidth() != 2:
+                raise ValueError(f"Only 16-bit WAV is supported, got {8 * wf.getsampwidth()}-bit")
+            data = wf.readframes(wf.getnframes())
+            return cls.from_pcm16(data, wf.getframerate(), wf.getnchannels())
+
+    @classmethod
+    def from_wav_bytes(cls, data: bytes) -> "AudioBuffer":
+        return cls.from_wav(io.BytesIO(data))
+
+    @classmethod
+    def concatenate(cls, buffers: list["AudioBuffer"]) -> "AudioBuffer":
+        """Joins buffers end to end (they must share sample rate and channel count)."""
+        if not buffers:
+            raise ValueError("Nothing to concatenate")
+        rate = buffers[0].sample_rate
+        if any(b.sample_rate != rate for b in buffers):
+            raise ValueError("Can't concatenate buffers with different sample rates")
+        if len(buffers) == 1:
+            return buffers[0]
+        samples = np.concatenate([b.to_int16().samples for b in buffers])
+        return cls(samples, rate)
+
+    # ─── Conversions ───
+
+    def to_float32(self) -> "AudioBuffer":
+        if self.samples.dtype == np.float32:
+            return self
+        return AudioBuffer(self.samples.astype(np.float32) / 32768.0, self.sample_rate)
+
+    def to_int16(self) -> "AudioBuffer":
+        if self.samples.dtype == np.int16:
+            return self
+        clipped = np.clip(self.samples, -1.0, 32767.0 / 32768.0)
+        return AudioBuffer((clipped * 32768.0).astype(np.int16), self.sample_rate)
+
+    def to_mono(self) -> "AudioBuffer":
+        if self.channels == 1:
+            return self
+        mixed = self.to_float32().samples.mean(axis=1, dtype=np.float32)
+        return AudioBuffer(mixed, self.sample_rate)
+
+    def resample(self, target_rate: int, method: str | None = None) -> "AudioBuffer":
+        """
+        Resamples mono audio (float32 out).
+
+        "poly" is SciPy's polyphase filter (44.1 kHz -> 16 kHz is 160/441),
+        which low-passes before decimating so nothing above the new Nyquist
+        folds back into the speech band. "linear" is plain np.interp. The
+        default is "poly" when SciPy is installed.
+        """
+        mono = self.to_mono().to_float32()
+        if target_rate == self.sample_rate or mono.frames == 0:
+            return mono
+        method = method or ("poly" if HAVE_SCIPY else "linear")
+        if method == "poly":
+            common = gcd(target_rate, self.sample_rate)
+            samples = scipy_signal.resample_poly(mono.samples, target_rate // common, self.sample_rate // common)
+            return AudioBuffer(samples.astype(np.float32, copy=False), target_rate)
+
+        n_out = int(round(mono.frames * target_rate / self.sample_rate))
+        positions = np.arange(n_out) * (self.sample_rate / target_rate)
+        samples = np.interp(positions, np.arange(mono.frames), mono.samples).astype(np.float32)
+        return AudioBuffer(samples, target_rate)
+
+    def as_whisper_input(self) -> np.ndarray:
+        """16 kHz mono float32 array, ready for WhisperModel.transcribe()."""
+        return self.resample(WHISPER_RATE).samples
+
+    def slice(self, start: float = 0.0, end: float | None = None) -> "AudioBuffer":
+        """View of the audio between two timestamps in seconds (no copy)."""
+        first = int(start * self.sample_rate)
+        last = self.frames if end is None else int(end * self.sample_rate)
+        return AudioBuffer(self.samples[first:last], self.sample_rate)
+
+    # ─── Output (only when a consumer needs bytes or a path) ───
+
+    def to_pcm16(self) -> bytes:
+        return self.to_int16().samples.tobytes()
+
+    def to_wav_bytes(self) -> bytes:
+        out = io.BytesIO()
+        self._write(out)
+        return out.getvalue()
+
+    def write_wav(self, path: str) -> str:
+        """Writes a 16-bit WAV and returns the path (for A2F, which loads files)."""
+        self._write(path)
+        return path
+
+    def _write(self, target) -> None:
+        with wave.open(target, 'wb') as wf:
+            wf.setnchannels(self.channels)
+            wf.setsampwidth(2)
+            wf.setframerate(self.sample_rate)
+            wf.writeframes(self.to_pcm16())
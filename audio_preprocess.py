@@ -0,0 +1,129 @@
+import numpy as np
+
+from audio_buffer import AudioBuffer, WHISPER_RATE
+
+# Vectorized clean-up between the mic / TTS and their consumers:
+# resample to 16 kHz mono float32 for Whisper, remove DC offset, bring speech
+# to a consistent loudness and cut leading/trailing silence. Everything works
+# on whole NumPy arrays (20 ms frames via reshape), no per-sample Python.
+
+FRAME_MS = 20              # Analysis frame for levels and silence detection
+TARGET_DBFS = -20.0        # Speech loudness we normalize to
+MAX_GAIN_DB = 20.0         # Never boost quiet input (e.g. room noise) more than this
+PEAK_LIMIT = 0.99          # Keep normalized peaks just under full scale
+SILENCE_DBFS = -50.0       # Frames quieter than this are always silence
+SILENCE_BELOW_PEAK_DB = 35.0   # ...and so is anything this far under the loudest frame
+TRIM_PAD_MS = 150          # Audio kept around the speech when trimming
+
+
+def frame_levels(samples: np.ndarray, rate: int, frame_ms: int = FRAME_MS) -> np.ndarray:
+    """RMS level of each frame_ms frame of mono float audio, in dBFS."""
+    frame = max(1, int(rate * frame_ms / 1000))
+    count = samples.size // frame
+    if count == 0:
+        frames = samples.reshape(1, -1) if samples.size else np.zeros((1, 1), dtype=np.float32)
+    else:
+        frames = samples[:count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    return 20.0 * np.log10(np.maximum(rms, 1e-6))
+
+
+def speech_threshold(levels_db: np.ndarray) -> float:
+    """Level above which a frame counts as speech (relative to the loudest frame)."""
+    return max(SILENCE_DBFS, float(levels_db.max()) - SILENCE_BELOW_PEAK_DB)
+
+
+def remove_dc(samples: np.ndarray) -> np.ndarray:
+    """Subtracts the mean, so a biased mic doesn't eat headroom or skew levels."""
+    if samples.size == 0:
+        return samples
+    return samples - samples.mean(dtype=np.float64).astype(samples.dtype)
+
+
+def normalize_loudness(
+    samples: np.ndarray,
+    rate: int,
+    target_dbfs: float = TARGET_DBFS,
+    max_gain_db: float = MAX_GAIN_DB
+) -> np.ndarray:
+    """
+    Scales audio so its speech frames average target_dbfs.
+
+    Only frames above the speech threshold are measured, so a long silent
+    tail doesn't make us over-boost. Gain is capped at max_gain_db and
+    reduced if the loudest sample would go past PEAK_LIMIT.
+    """
+    if samples.size == 0:
+        return samples
+    levels = frame_levels(samples, rate)
+    speech = levels[levels >= speech_threshold(levels)]
+    if speech.size == 0:
+        return samples
+
+    # Mean power of the speech frames, back in dB
+    speech_db = 10.0 * np.log10(np.mean(np.power(10.0, speech / 10.0)))
+    gain_db = min(target_dbfs - speech_db, max_gain_db)
+    gain = 10.0 ** (gain_db / 20.0)
+
+    peak = float(np.abs(samples).max())
+    if peak * gain > PEAK_LIMIT:
+        gain = PEAK_LIMIT / peak
+    return (samples * np.float32(gain)).astype(np.float32, copy=False)
+
+
+def trim_silence(samples: np.ndarray, rate: int, pad_ms: int = TRIM_PAD_MS) -> tuple[np.ndarray, float]:
+    """
+    Cuts leading and trailing silence, keeping pad_ms around the speech.
+
+    Returns:
+    - (trimmed view of samples, seconds cut from the start)
+    """
+    if samples.size == 0:
+        return samples, 0.0
+    levels = frame_levels(samples, rate)
+    if levels.max() < SILENCE_DBFS:
+        return samples, 0.0   # Nothing but silence; leave it for the caller to judge
+    voiced = np.flatnonzero(levels >= speech_threshold(levels))
+
+    frame = max(1, int(rate * FRAME_MS / 1000))
+    pad = int(rate * pad_ms / 1000)
+    start = max(0, voiced[0] * frame - pad)
+    end = min(samples.size, (voiced[-1] + 1) * frame + pad)
+    return samples[start:end], start / rate
+
+
+def preprocess_for_whisper(audio: AudioBuffer, trim: bool = True, normalize: bool = True) -> np.ndarray:
+    """
+    16 kHz mono float32 array ready for WhisperModel.transcribe().
+
+    Parameters:
+    - audio: captured audio at any rate/channel count
+    - trim: cut leading/trailing silence (leave off when segment timestamps
+      must line up with the input, e.g. streaming windows)
+    - normalize: bring speech to TARGET_DBFS
+    """
+    samples = remove_dc(audio.resample(WHISPER_RATE).samples)
+    if normalize:
+        samples = normalize_loudness(samples, WHISPER_RATE)
+    if trim:
+        samples, _ = trim_silence(samples, WHISPER_RATE)
+    return samples
+
+
+def prepare_for_a2f(audio: AudioBuffer, trim: bool = True, sample_rate: int | None = None) -> AudioBuffer:
+    """
+    Mono 16-bit audio for an Audio2Face player WAV.
+
+    Normalized so lip-sync intensity doesn't vary with TTS loudness, and
+    trimmed so the mouth starts moving as soon as playback starts.
+
+    Parameters:
+    - audio: TTS (or any) audio
+    - trim: cut leading/trailing silence
+    - sample_rate: resample to this rate (None keeps the input rate)
+    """
+    mono = audio.resample(sample_rate) if sample_rate else audio.to_mono().to_float32()
+    samples = normalize_loudness(remove_dc(mono.samples), mono.sample_rate)
+    if trim:
+        samples, _ = trim_silence(samples, mono.sample_rate)
+    return AudioBuffer(samples, mono.sample_rate).to_int16()
@@ -0,0 +1,238 @@
+"""
+Transcribe a whole archive of recordings in one go.
+
+    python batch_transcribe.py recordings/ -o transcripts.jsonl
+    python batch_transcribe.py manifest.txt -o transcripts.jsonl --workers 4 --device cpu
+
+Input is a directory (searched recursively for audio files) or a manifest:
+one path per line, or JSONL lines with a "path" field. Relative manifest
+paths are resolved against the manifest's folder.
+
+Each finished file is appended to the output as one JSON line (language,
+duration, segment timestamps, full text), so a crashed or interrupted run
+can simply be started again: files already in the output are skipped
+(failed ones are retried). On a restart the output is first compacted to
+one record per file, so a retried file never appears twice.
+
+The model is loaded once per worker. On CUDA one model is shared by a
+thread pool (CTranslate2 runs `workers` decodes side by side); on CPU each
+worker process loads its own model and gets an equal share of the cores.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from transcriber import DEFAULT_MODEL_SIZE, resolve_device
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".flac", ".m4a", ".ogg", ".webm")
+
+# The model this process (or thread pool) transcribes with; see _load_worker_model
+_worker_model = None
+_worker_options = {}
+
+
+def find_inputs(source: str) -> list[str]:
+    """
+    Absolute paths of every audio file to transcribe.
+
+    Parameters:
+    - source: a directory, a text manifest (one path per line) or a JSONL manifest
+    """
+    if os.path.isdir(source):
+        paths = []
+        for folder, _, files in os.walk(source):
+            paths.extend(os.path.join(folder, name) for name in files if name.lower().endswith(AUDIO_EXTENSIONS))
+        return sorted(os.path.abspath(path) for path in paths)
+
+    base = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            path = json.loads(line)["path"] if line.startswith("{") else line
+            paths.append(os.path.abspath(os.path.join(base, path)))
+    return paths
+
+
+def compact_output(output_path: str, retry: set[str] = frozenset()) -> set[str]:
+    """
+    Rewrites the output JSONL with one record per file before a resumed run.
+
+    The last record for a path wins; half-written lines from an interrupted
+    run are dropped, and so are failures of files in `retry` (this run
+    writes their new result).
+
+    Returns:
+    - paths that already have a successful result
+    """
+    if not os.path.exists(output_path):
+        return set()
+    records = {}
+    lines = 0
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            lines += 1
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue   # Half-written line from an interrupted run
+            records.pop(record["path"], None)   # Keep the file's place at its latest record
+            records[record["path"]] = record
+
+    kept = [record for path, record in records.items() if "error" not in record or path not in retry]
+    if len(kept) != lines:
+        tmp_path = output_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as out:
+            for record in kept:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, output_path)
+    return {record["path"] for record in kept if "error" not in record}
+
+
+def _load_worker_model(model_size, device, compute_type, cpu_threads, num_workers, options):
+    # Runs once per worker process (CPU) or once for the shared thread pool (GPU)
+    global _worker_model, _worker_options
+    from faster_whisper import WhisperModel
+
+    _worker_model = WhisperModel(
+        model_size, device=device, compute_type=compute_type,
+        cpu_threads=cpu_threads, num_workers=num_workers
+    )
+    _worker_options = options
+
+
+def transcribe_file(path: str) -> dict:
+    """One JSONL record for a file (with an "error" field if it couldn't be transcribed)."""
+    start = time.perf_counter()
+    try:
+        segments, info = _worker_model.transcribe(path, **_worker_options)
+        segments = [
+            {"start": round(segment.start, 2), "end": round(segment.end, 2), "text": segment.text.strip()}
+            for segment in segments
+        ]
+    except Exception as e:
+        return {"path": path, "error": f"{type(e).__name__}: {e}"}
+
+    return {
+        "path": path,
+        "language": info.language,
+        "language_probability": round(info.language_probability, 4),
+        "duration": round(info.duration, 2),
+        "text": " ".join(segment["text"] for segment in segments if segment["text"]),
+        "segments": segments,
+        "transcribe_seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def run_batch(
+    paths: list[str],
+    output_path: str,
+    model_size: str = DEFAULT_MODEL_SIZE,
+    device: str | None = None,
+    compute_type: str | None = None,
+    workers: int | None = None,
+    beam_size: int = 1,
+    language: str | None = None
+) -> dict:
+    """
+    Transcribes every path, appending one JSON line per file to output_path.
+
+    Parameters:
+    - paths: audio files (ones already done in output_path are skipped)
+    - output_path: JSONL file to append results to (compacted first, see compact_output)
+    - model_size / device / compute_type: Whisper model (device auto-detected when None)
+    - workers: parallel decodes (default: 2 on CUDA, one process per 4 cores on CPU)
+    - beam_size / language: passed to WhisperModel.transcribe
+
+    Returns:
+    - summary counts and timings
+    """
+    device, compute_type = resolve_device(device, compute_type)
+    done = compact_output(output_path, retry=set(paths))
+    todo = [path for path in paths if path not in done]
+    print(f"{len(paths)} files, {len(paths) - len(todo)} already done, {len(todo)} to go")
+
+    summary = {"files": len(todo), "skipped": len(paths) - len(todo), "failed": 0, "audio_seconds": 0.0}
+    start = time.perf_counter()
+    if todo:
+        cores = os.cpu_count() or 1
+        if workers is None:
+            workers = 2 if device == "cuda" else max(1, cores // 4)
+        options = {"beam_size": beam_size, "language": language}
+
+        print(f"Loading Whisper {model_size} on {device} with {compute_type} ({workers} workers)...")
+        if device == "cuda":
+            # One model on the GPU, decoded from several threads at once
+            _load_worker_model(model_size, device, compute_type, 0, workers, options)
+            executor = ThreadPoolExecutor(max_workers=workers)
+        else:
+            # The GIL would serialize CPU decodes across threads; give each process its own model
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_load_worker_model,
+                initargs=(model_size, device, compute_type, max(1, cores // workers), 1, options)
+            )
+
+        with executor, open(output_path, "a", encoding="utf-8") as out:
+            futures = {executor.submit(transcribe_file, path): path for path in todo}
+            for finished, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()   # Every finished file survives an interrupted run
+
+                name = os.path.basename(record["path"])
+                if "error" in record:
+                    summary["failed"] += 1
+                    print(f"[{finished}/{len(todo)}] {name} failed: {record['error']}")
+                else:
+                    summary["audio_seconds"] += record["duration"]
+                    print(f"[{finished}/{len(todo)}] {name} {record['duration']:.1f}s audio "
+                          f"in {record['transcribe_seconds']:.1f}s")
+
+    summary["wall_seconds"] = time.perf_counter() - start
+    summary["realtime_factor"] = (
+        summary["audio_seconds"] / summary["wall_seconds"] if summary["wall_seconds"] and summary["audio_seconds"] else None
+    )
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-transcribe a directory or manifest of recordings to JSONL")
+    parser.add_argument("source", help="directory of audio files, or a manifest (paths or JSONL with \"path\")")
+    parser.add_argument("-o", "--output", default="output/transcripts.jsonl", help="JSONL results (appended to)")
+    parser.add_argument("--model", default=DEFAULT_MODEL_SIZE, help="Whisper model size")
+    parser.add_argument("--device", choices=["cuda", "cpu"], help="default: CUDA when available")
+    parser.add_argument("--compute-type", help="CTranslate2 compute type (default picked from the device)")
+    parser.add_argument("--workers", type=int, help="parallel decodes")
+    parser.add_argument("--beam-size", type=int, default=1)
+    parser.add_argument("--language", help="skip language detection, e.g. \"en\"")
+    args = parser.parse_args(argv)
+
+    paths = find_inputs(args.source)
+    if not paths:
+        print(f"No audio files found in {args.source}")
+        return 1
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    summary = run_batch(
+        paths, args.output, args.model, args.device, args.compute_type,
+        args.workers, args.beam_size, args.language
+    )
+
+    print(f"Done: {summary['files'] - summary['failed']} transcribed, {summary['failed']} failed, "
+          f"{summary['skipped']} skipped in {summary['wall_seconds']:.1f}s")
+    if summary["realtime_factor"]:
+        print(f"{summary['audio_seconds'] / 60:.1f} min of audio at {summary['realtime_factor']:.1f}x real time")
+    print(f"Results in {args.output}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Compares the old file-based audio hand-offs with the in-memory AudioBuffer path.
+
+    python benchmarks/bench_audio_path.py [--wav audio/recording.wav] [--mp3 output/tts_output.mp3]
+
+Recorder → Whisper: write WAV, then decode it back at 16 kHz (what faster-whisper
+does with a path) vs. resampling the captured buffer directly.
+TTS → Audio2Face: MP3 → pydub decode → WAV export → decode again (convert_to_wav)
+vs. wrapping ElevenLabs' raw PCM and writing the one WAV A2F needs.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from audio_buffer import AudioBuffer
+
+
+def timeit(fn, repeat=10):
+    """Best-of-N wall time in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0
+
+
+def report(name, old_ms, new_ms):
+    print(f"{name:<28} file path {old_ms:8.2f} ms   in-memory {new_ms:8.2f} ms   saved {old_ms - new_ms:8.2f} ms")
+
+
+def bench_recorder_to_whisper(wav_path, tmp_dir, repeat):
+    recording = AudioBuffer.from_wav(wav_path)
+    rec_wav = os.path.join(tmp_dir, "mic_input.wav")
+
+    try:
+        from faster_whisper import decode_audio
+    except ImportError:
+        decode_audio = lambda path: AudioBuffer.from_wav(path).as_whisper_input()
+
+    def old():
+        recording.write_wav(rec_wav)
+        decode_audio(rec_wav)
+
+    def new():
+        recording.as_whisper_input()
+
+    report("recorder -> whisper", timeit(old, repeat), timeit(new, repeat))
+
+
+def bench_tts_to_a2f(mp3_path, tmp_dir, repeat):
+    try:
+        from pydub import AudioSegment
+        speech = AudioSegment.from_file(mp3_path).set_channels(1).set_sample_width(2)
+    except Exception as e:
+        print(f"tts -> a2f                   skipped (pydub/ffmpeg unavailable: {e})")
+        return
+
+    with open(mp3_path, "rb") as f:
+        mp3_bytes = f.read()
+    # Same audio as ElevenLabs would send it with output_format=pcm_*
+    pcm_bytes = speech.raw_data
+    rate = speech.frame_rate
+    tmp_mp3 = os.path.join(tmp_dir, "tts_output.mp3")
+    tmp_wav = os.path.join(tmp_dir, "tts_output.wav")
+
+    def old():
+        with open(tmp_mp3, "wb") as f:
+            f.write(mp3_bytes)
+        sound = AudioSegment.from_file(tmp_mp3).set_channels(1).set_sample_width(2)
+        sound.export(tmp_wav, format="wav")
+        AudioSegment.from_mp3(tmp_mp3).export(tmp_wav, format="wav")   # convert_to_wav.py
+
+    def new():
+        AudioBuffer.from_pcm16(pcm_bytes, rate).write_wav(tmp_wav)
+
+    report("tts -> a2f", timeit(old, repeat), timeit(new, repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wav", default=os.path.join(ROOT, "audio", "recording.wav"))
+    parser.add_argument("--mp3", default=os.path.join(ROOT, "output", "tts_output.mp3"))
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bench_recorder_to_whisper(args.wav, tmp_dir, args.repeat)
+        bench_tts_to_a2f(args.mp3, tmp_dir, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Barge-in benchmark: how much sooner the next turn starts when the visitor interrupts.
+
+    python benchmarks/bench_barge_in.py [--wav audio/recording.wav] [--interrupt-after 1.5]
+
+Runs the server's pipeline against the same local stand-ins as
+bench_pipeline (mock ElevenLabs and Audio2Face, stub Claude and Whisper),
+with one network slot so the two turns compete for the API like a
+rate-limited account would.
+
+Turn 1 asks for a long answer. Once Claude has been writing for
+--interrupt-after seconds the visitor speaks again (turn 2). This runs
+twice, with barge_in off and on, and compares when turn 2 got its network
+slot and when it finished. A second scenario interrupts turn 1 while the
+avatar is still speaking and checks the player was paused.
+
+Exits 1 if barge-in didn't make turn 2 finish sooner or didn't pause the avatar.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "flask-server"))
+
+from mock_services import MockTTSServer, MockA2FServer
+from stubs import StubWhisperModel, StubChatModel
+
+LONG_ANSWER = " ".join([
+    "This gallery holds the museum's oldest collection of scientific instruments.",
+    "Most of them were made by hand in small workshops during the eighteenth century.",
+    "The large brass telescope by the window was used to chart the moons of Jupiter.",
+    "Next to it you can see a set of glass prisms that students used to split sunlight.",
+    "The pocket watches in the case were some of the first to keep time at sea.",
+    "Every piece was cleaned and restored by our conservation team last winter.",
+    "If you look closely you can still see the makers' initials engraved on them.",
+    "Let me know which one you would like to hear more about!",
+])
+
+
+def wait_for(session, predicate, timeout=30.0):
+    """Blocks until a progress update satisfies predicate(state)."""
+    events = session.subscribe()
+    deadline = time.perf_counter() + timeout
+    try:
+        while time.perf_counter() < deadline:
+            event, data = events.get(timeout=deadline - time.perf_counter())
+            if event == "result" or predicate(data):
+                return
+    finally:
+        session.unsubscribe(events)
+
+
+def run_turns(server, options, interrupt_after):
+    """Turn 1, then turn 2 once Claude has been answering turn 1 for interrupt_after seconds."""
+    from cancellation import get_cancellation_metrics
+    import tracing
+
+    tracing.reset_metrics()
+    before = get_cancellation_metrics()
+
+    first = server.sessions.create(dict(options))
+    first_future = server.sessions.submit(first, server.run_conversation)
+    wait_for(first, lambda state: state["current_step"] == 3)
+    time.sleep(interrupt_after)
+
+    start = time.perf_counter()
+    second = server.sessions.create(dict(options))
+    second_body, second_status = server.sessions.submit(second, server.run_conversation).result()
+    second_total = time.perf_counter() - start
+    first_body, first_status = first_future.result()
+
+    after = get_cancellation_metrics()
+    stop = tracing.get_trace_metrics().get("cancel.stop")
+    for session in (first, second):
+        server.remove_session_wav(session)
+    return {
+        "turn1_status": first_status,
+        "turn2_status": second_status,
+        "turn2_network_wait": second.stage_waits.get("network", 0.0),
+        "turn2_total": second_total,
+        "cancel_to_stop_ms": stop["max_ms"] if stop else None,
+        "sentences_discarded": after["sentences_discarded"] - before["sentences_discarded"],
+        "requests_aborted": after["requests_aborted"] - before["requests_aborted"],
+    }
+
+
+def run_speaking(server, options, a2f_mock):
+    """Interrupts turn 1 after it finished but while its answer is still playing."""
+    from cancellation import get_cancellation_metrics
+
+    before = get_cancellation_metrics()["unplayed_audio_seconds"]
+    first = server.sessions.create(dict(options))
+    server.sessions.submit(first, server.run_conversation).result()
+    player = a2f_mock.regular_players[0]
+    playing = a2f_mock.playing.get(player)
+
+    second = server.sessions.create(dict(options))
+    server.sessions.submit(second, server.run_conversation).result()
+    for session in (first, second):
+        server.remove_session_wav(session)
+    return {
+        "playing_before": playing,
+        "pause_calls": a2f_mock.calls("/A2F/Player/Pause"),
+        "unplayed_seconds": get_cancellation_metrics()["unplayed_audio_seconds"] - before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wav", default=os.path.join(ROOT, "audio", "recording.wav"), help="fixture replayed as the mic")
+    parser.add_argument("--interrupt-after", type=float, default=1.5,
+                        help="seconds into turn 1's answer before the visitor speaks again")
+    parser.add_argument("--tts-rtf", type=float, default=4.0, help="mock ElevenLabs speed (x real time)")
+    parser.add_argument("--llm-token-delay", type=float, default=0.03, help="stub Claude seconds per word")
+    args = parser.parse_args()
+    args.wav = os.path.abspath(args.wav)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_barge_in_")
+    os.makedirs(os.path.join(work_dir, "output"), exist_ok=True)
+
+    with MockTTSServer(realtime_factor=args.tts_rtf) as tts_mock, MockA2FServer() as a2f_mock:
+        os.environ.update({
+            "ELEVENLABS_API_URL": tts_mock.url,
+            "ELEVENLABS_API_KEY": "bench-key",
+            "ELEVENLABS_VOICE_ID": "bench-voice",
+            "A2F_API_URL": a2f_mock.url,
+            "RESPONSE_CACHE_DIR": os.path.join(work_dir, "response_cache"),
+            "TRACE_LOG": "off",
+        })
+        os.chdir(work_dir)
+
+        import server
+        import transcriber
+        import claude_integration
+        from recorder import WavFileSource
+        from sessions import SessionManager, DEFAULT_STAGE_LIMITS
+        from viewport_stream import SyntheticFrameSource
+
+        server.audio_source = lambda: WavFileSource(args.wav)
+        server.viewport_capture.source = SyntheticFrameSource()
+        server.sessions = SessionManager(max_workers=2, stage_limits={**DEFAULT_STAGE_LIMITS, "network": 1})
+        transcriber.set_model(StubWhisperModel(realtime_factor=0.05))
+        claude_integration.set_llm(StubChatModel(
+            response=LONG_ANSWER, first_token_delay=0.3, token_delay=args.llm_token_delay
+        ))
+
+        # Through the server's parser, so options added later get their defaults
+        options = server.parse_options({
+            "duration": 10.0,
+            "endpointing": True,
+            "streaming_stt": True,
+            "streaming_tts": False,
+            "pipelined": True,
+            "use_cache": False,
+            "memory": False,
+            "speculative": False,
+            "speculation_stable_seconds": 0.6,
+        })
+
+        # A conversation per scenario, so one run's answer still playing isn't cut off by the next run
+        results = {}
+        for barge_in in (False, True):
+            results[barge_in] = run_turns(
+                server, {**options, "barge_in": barge_in, "conversation_id": f"turns-{barge_in}"}, args.interrupt_after
+            )
+        speaking = run_speaking(server, {**options, "barge_in": True, "conversation_id": "speaking"}, a2f_mock)
+        server.viewport.stop()
+
+    print(f"Turn 2 starts {args.interrupt_after:.1f}s into turn 1's answer (one network slot)\n")
+    for barge_in, result in results.items():
+        print(f"barge-in {'on ' if barge_in else 'off'}  turn 1 → {result['turn1_status']}   "
+              f"turn 2 → {result['turn2_status']}: queued {result['turn2_network_wait'] * 1000:7.1f} ms for the network, "
+              f"done in {result['turn2_total'] * 1000:7.1f} ms")
+    on = results[True]
+    stop = f"{on['cancel_to_stop_ms']:.1f} ms" if on["cancel_to_stop_ms"] is not None else "-"
+    print(f"\nTurn 1 stopped {stop} after cancel · {on['sentences_discarded']} sentences discarded · "
+          f"{on['requests_aborted']} requests aborted")
+    saved = results[False]["turn2_total"] - on["turn2_total"]
+    print(f"Turn 2 finished {saved * 1000:.0f} ms sooner with barge-in")
+
+    paused = speaking["playing_before"] and speaking["pause_calls"] > 0 and speaking["unplayed_seconds"] > 0
+    print(f"Interrupting playback: {'paused' if paused else 'NOT paused'}, "
+          f"{speaking['unplayed_seconds']:.1f}s of speech not played")
+
+    ok = saved > 0 and on["turn1_status"] == 409 and paused
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
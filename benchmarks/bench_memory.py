@@ -0,0 +1,103 @@
+"""
+Per-turn Claude latency over a long conversation, with and without the memory budget.
+
+    python benchmarks/bench_memory.py [--turns 60] [--budget 1200] [--prompt-token-ms 0.2]
+
+Runs the same conversation through claude_integration.get_claude_response
+twice against a stub model whose first token gets slower with every prompt
+token (like a real model's prefill):
+
+- budgeted: ConversationMemory as the server uses it (rolling summary
+  written in the background, fixed token budget)
+- full history: every turn sent verbatim, the naive way to add memory
+
+Reports average latency and history size per block of ten turns. Exits 1
+if the budgeted run's history ever goes over the budget, or its last block
+is more than --max-growth times slower than its second (once history has
+had ten turns to build up), so it can guard CI.
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import claude_integration
+from claude_integration import ConversationMemory, get_claude_response
+from stubs import StubChatModel
+
+QUESTIONS = [
+    "Hi, my name is Sam and I'm visiting with my two kids.",
+    "What is this exhibit about?",
+    "How old is the oldest piece in this room?",
+    "Can you tell me more about how it was restored?",
+    "My daughter wants to know who painted the big one on the left.",
+    "Is there a café nearby where we could get lunch later?",
+    "What else should we see before the museum closes at five?",
+]
+
+
+def run(memory, turns):
+    """Latency (ms) and prompt history tokens for each turn."""
+    latencies, prompt_tokens = [], []
+    for turn in range(turns):
+        question = f"{QUESTIONS[turn % len(QUESTIONS)]} (turn {turn + 1})"
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            get_claude_response(question, memory)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        prompt_tokens.append(memory.stats()["last_prompt_tokens"])
+    memory.wait_idle()
+    return latencies, prompt_tokens
+
+
+def report(name, latencies, prompt_tokens, memory):
+    """Prints one line per ten turns; returns (last block / second block latency, max history tokens)."""
+    blocks = [statistics.mean(latencies[i:i + 10]) for i in range(0, len(latencies), 10)]
+    stats = memory.stats()
+    print(f"{name}: {stats['summaries']} summaries covering {stats['turns_summarized']} turns, "
+          f"max history {max(prompt_tokens)} tokens")
+    for i, block in enumerate(blocks):
+        turns = f"{i * 10 + 1}-{min(len(latencies), i * 10 + 10)}"
+        print(f"  turns {turns:<8} {block:7.1f} ms   history {prompt_tokens[min(len(latencies), i * 10 + 10) - 1]:6d} tokens")
+    return blocks[-1] / blocks[1], max(prompt_tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--budget", type=int, default=claude_integration.MEMORY_TOKEN_BUDGET,
+                        help="history tokens per prompt")
+    parser.add_argument("--first-token-ms", type=float, default=50.0, help="stub model latency for an empty prompt")
+    parser.add_argument("--prompt-token-ms", type=float, default=0.2, help="extra stub latency per prompt token")
+    parser.add_argument("--max-growth", type=float, default=1.5,
+                        help="fail if budgeted last block / second block latency exceeds this")
+    args = parser.parse_args()
+
+    if args.turns < 30:
+        parser.error("--turns must be at least 30")
+    claude_integration.set_llm(StubChatModel(
+        response="That's a lovely question! The piece dates from the early 1800s and was restored in 2019.",
+        first_token_delay=args.first_token_ms / 1000.0, token_delay=0.0,
+        prompt_token_delay=args.prompt_token_ms / 1000.0
+    ))
+
+    print(f"{args.turns} turns, {args.budget}-token history budget, "
+          f"stub model {args.first_token_ms:.0f} ms + {args.prompt_token_ms} ms/token\n")
+    budgeted = ConversationMemory(token_budget=args.budget)
+    growth, max_history = report("budgeted", *run(budgeted, args.turns), budgeted)
+    full = ConversationMemory(token_budget=10 ** 9)
+    full_growth, _ = report("\nfull history", *run(full, args.turns), full)
+
+    print(f"\nLatency growth from turns 11-20 to the last block: budgeted {growth:.2f}x "
+          f"(limit {args.max_growth:.2f}x), full history {full_growth:.2f}x")
+    sys.exit(1 if growth > args.max_growth or max_history > args.budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+End-to-end conversation benchmark: Record → Transcribe → Claude → TTS → Audio2Face.
+
+    python benchmarks/bench_pipeline.py [--wav audio/recording.wav] [--sessions 1 4] [--rounds 3]
+
+Replays a WAV fixture as the microphone and runs the server's real pipeline
+(server.run_conversation on its session pool) against local stand-ins:
+mock ElevenLabs and Audio2Face HTTP servers (mock_services), a stub Claude
+model and, unless --stt whisper, a stub Whisper model (stubs). Nothing
+leaves the machine, so it runs offline on a CPU-only box.
+
+For each concurrency level N, N clients each run `rounds` conversations
+back to back. Reports time to first audio (avatar has speech to play), total
+latency per session, throughput, and p50/p95 for every traced stage.
+Use --json to keep the numbers and --max-total-p95-ms to fail a CI run
+when latency regresses. With --cache, the cached WAVs are then corrupted
+and read back by a fresh cache: every lookup must be a miss, and the
+sessions answered live (exits 1 otherwise).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "flask-server"))
+
+from mock_services import MockTTSServer, MockA2FServer
+from stubs import StubWhisperModel, StubChatModel
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile (None for no values)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))]
+
+
+def fmt_ms(seconds):
+    return f"{seconds * 1000:8.1f}" if seconds is not None else "       -"
+
+
+def watch(session, marks, start):
+    """Stamps when the session first hands audio to the avatar and when it finishes."""
+    events = session.subscribe()
+    while True:
+        event, data = events.get()
+        if event == "result":
+            marks["done"] = time.perf_counter() - start
+            marks["status"] = data["status"]
+            return
+        if data.get("current_step") == 5 and "first_audio" not in marks:
+            marks["first_audio"] = time.perf_counter() - start
+
+
+def run_level(server, options, concurrency, rounds):
+    """N clients, each running `rounds` conversations back to back."""
+    from sessions import SessionManager, DEFAULT_STAGE_LIMITS
+    import tracing
+
+    # Every replayed session has its own fake mic; GPU and avatar stay shared like in production
+    server.sessions = SessionManager(
+        max_workers=concurrency,
+        max_pending=concurrency,
+        stage_limits={**DEFAULT_STAGE_LIMITS, "mic": concurrency},
+    )
+    tracing.reset_metrics()
+    runs = []
+
+    def client():
+        for _ in range(rounds):
+            session = server.sessions.create(dict(options))
+            marks = {}
+            watcher = threading.Thread(target=watch, args=(session, marks, time.perf_counter()), daemon=True)
+            watcher.start()
+            server.sessions.submit(session, server.run_conversation).result()
+            watcher.join()
+            server.remove_session_wav(session)
+            runs.append(marks)
+
+    wall_start = time.perf_counter()
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    wall = time.perf_counter() - wall_start
+
+    ok = [marks for marks in runs if marks.get("status") == 200]
+    totals = [marks["done"] for marks in ok]
+    first_audio = [marks["first_audio"] for marks in ok if "first_audio" in marks]
+    stages = tracing.get_trace_metrics()
+    return {
+        "concurrency": concurrency,
+        "sessions": len(runs),
+        "errors": len(runs) - len(ok),
+        "wall_seconds": wall,
+        "throughput_per_minute": len(ok) / wall * 60.0,
+        "first_audio": {
+            "p50": percentile(first_audio, 50), "p95": percentile(first_audio, 95),
+            "mean": statistics.fmean(first_audio) if first_audio else None,
+        },
+        "total": {
+            "p50": percentile(totals, 50), "p95": percentile(totals, 95),
+            "max": max(totals) if totals else None,
+            "mean": statistics.fmean(totals) if totals else None,
+        },
+        "stages_ms": {
+            name: {"p50": stats["p50_ms"], "p95": stats["p95_ms"], "count": stats["count"]}
+            for name, stats in stages.items()
+        },
+    }
+
+
+def report(result):
+    fa, total = result["first_audio"], result["total"]
+    print(f"\n── {result['concurrency']} concurrent · {result['sessions']} sessions · "
+          f"{result['errors']} errors · {result['throughput_per_minute']:.1f} sessions/min")
+    print(f"   first audio  p50 {fmt_ms(fa['p50'])} ms   p95 {fmt_ms(fa['p95'])} ms")
+    print(f"   total        p50 {fmt_ms(total['p50'])} ms   p95 {fmt_ms(total['p95'])} ms   max {fmt_ms(total['max'])} ms")
+    for name, stats in result["stages_ms"].items():
+        if name.startswith("a2f /"):
+            continue   # Individual REST calls; a2f.play already covers them
+        print(f"   {name:<18} p50 {stats['p50']:8.1f} ms   p95 {stats['p95']:8.1f} ms   ({stats['count']}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wav", default=os.path.join(ROOT, "audio", "recording.wav"), help="fixture replayed as the mic")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4], help="concurrency levels to run")
+    parser.add_argument("--rounds", type=int, default=3, help="sessions per concurrency slot")
+    parser.add_argument("--duration", type=float, default=10.0, help="longest recording per session (seconds)")
+    parser.add_argument("--realtime", action="store_true", help="replay the WAV at mic speed instead of instantly")
+    parser.add_argument("--stt", choices=["stub", "whisper"], default="stub", help="stub Whisper, or the real model")
+    parser.add_argument("--stt-rtf", type=float, default=0.1, help="stub Whisper seconds per second of audio")
+    parser.add_argument("--llm-first-token", type=float, default=0.3, help="stub Claude time to first token")
+    parser.add_argument("--llm-token-delay", type=float, default=0.02, help="stub Claude seconds per word")
+    parser.add_argument("--tts-rtf", type=float, default=4.0, help="mock ElevenLabs speed (x real time)")
+    parser.add_argument("--a2f-latency", type=float, default=0.005, help="mock Audio2Face seconds per call")
+    parser.add_argument("--no-streaming-stt", action="store_true")
+    parser.add_argument("--no-endpointing", action="store_true")
+    parser.add_argument("--no-pipelined", action="store_true")
+    parser.add_argument("--cache", action="store_true", help="allow response cache hits (off: every session is a miss)")
+    parser.add_argument("--speculative", type=float, metavar="STABLE_SECONDS",
+                        help="start Claude once the partial transcript has been stable this long")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--max-total-p95-ms", type=float, help="exit 1 if any level's total p95 is above this")
+    args = parser.parse_args()
+    args.wav = os.path.abspath(args.wav)
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.makedirs(os.path.join(work_dir, "output"), exist_ok=True)   # transcript.txt lands here
+
+    with MockTTSServer(realtime_factor=args.tts_rtf) as tts_mock, MockA2FServer(latency=args.a2f_latency) as a2f_mock:
+        # Modules read their endpoints at import time
+        os.environ.update({
+            "ELEVENLABS_API_URL": tts_mock.url,
+            "ELEVENLABS_API_KEY": "bench-key",
+            "ELEVENLABS_VOICE_ID": "bench-voice",
+            "A2F_API_URL": a2f_mock.url,
+            "RESPONSE_CACHE_DIR": os.path.join(work_dir, "response_cache"),
+            "TRACE_LOG": "off",
+        })
+        os.chdir(work_dir)
+
+        import server
+        import transcriber
+        import claude_integration
+        from recorder import WavFileSource
+        from viewport_stream import SyntheticFrameSource
+
+        server.audio_source = lambda: WavFileSource(args.wav, realtime=args.realtime)
+        server.viewport_capture.source = SyntheticFrameSource()   # No display needed
+        claude_integration.set_llm(StubChatModel(
+            first_token_delay=args.llm_first_token, token_delay=args.llm_token_delay
+        ))
+        if args.stt == "stub":
+            transcriber.set_model(StubWhisperModel(realtime_factor=args.stt_rtf))
+        else:
+            transcriber.warm_up()
+
+        # Through the server's parser, so options added later get their defaults
+        options = server.parse_options({
+            "duration": args.duration,
+            "endpointing": not args.no_endpointing,
+            "streaming_stt": not args.no_streaming_stt,
+            "streaming_tts": False,   # Needs a live Audio2Face gRPC streaming player
+            "pipelined": not args.no_pipelined,
+            "use_cache": args.cache,
+            "conversation_id": "bench",
+            "memory": not args.cache,   # Follow-up questions skip the cache, so cached runs have no history
+            "barge_in": False,   # Clients share a conversation but aren't interrupting each other
+            "speculative": args.speculative is not None,
+            "speculation_stable_seconds": args.speculative or 0.0,
+        })
+        print(f"Fixture {args.wav} · STT {args.stt} · options {options}")
+
+        results = []
+        for concurrency in args.sessions:
+            result = run_level(server, options, concurrency, args.rounds)
+            report(result)
+            results.append(result)
+
+        corrupt_ok = True
+        if args.cache:
+            # A truncated or garbage WAV on disk is a miss, never a failed turn
+            from response_cache import ResponseCache
+            cache_dir = server.response_cache.cache_dir
+            for name in os.listdir(cache_dir):
+                if name.endswith(".wav"):
+                    with open(os.path.join(cache_dir, name), "wb") as f:
+                        f.write(b"not a wav")
+            with open(os.path.join(cache_dir, "index.json"), "r", encoding="utf-8") as f:
+                keys = list(json.load(f))
+            server.response_cache = ResponseCache(cache_dir)
+            entries = len(keys)
+            reread = [server.response_cache.get(key) for key in keys]
+            corrupt = run_level(server, options, 1, 1)
+            corrupt_ok = entries > 0 and not any(reread) and corrupt["errors"] == 0
+            print(f"\nCorrupted {entries} cached WAVs: {sum(e is None for e in reread)} read back as misses, "
+                  f"{corrupt['errors']} errors in the next session")
+        server.viewport.stop()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"options": options, "stt": args.stt, "results": results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    if args.max_total_p95_ms is not None:
+        slow = [r for r in results if r["total"]["p95"] is None or r["total"]["p95"] * 1000 > args.max_total_p95_ms]
+        if slow:
+            print(f"\n❌ Total p95 above {args.max_total_p95_ms:.0f} ms at concurrency "
+                  f"{', '.join(str(r['concurrency']) for r in slow)}")
+            sys.exit(1)
+    if not corrupt_ok:
+        print("\n❌ A corrupt cache entry wasn't treated as a miss")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmarks the NumPy/SciPy preprocessing stage against the file-based path.
+
+    python benchmarks/bench_preprocess.py [--wav audio/recording.wav] [--mp3 output/tts_output.mp3]
+
+Resample: np.interp vs. SciPy's polyphase filter, timed on the recording
+and checked for aliasing with a 12 kHz tone (above Whisper's 8 kHz Nyquist,
+so anything left of it after resampling is aliasing).
+Recorder → Whisper: write WAV + faster-whisper's file decode (or pydub when
+faster-whisper isn't installed) vs. preprocess_for_whisper on the buffer.
+TTS → Audio2Face: pydub MP3 → WAV (convert_to_wav) vs. prepare_for_a2f on
+the raw PCM.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from audio_buffer import AudioBuffer, HAVE_SCIPY, WHISPER_RATE
+from audio_preprocess import preprocess_for_whisper, prepare_for_a2f
+
+
+def timeit(fn, repeat=10):
+    """Best-of-N wall time in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0
+
+
+def report(name, old_name, old_ms, new_name, new_ms):
+    print(f"{name:<22} {old_name} {old_ms:8.2f} ms   {new_name} {new_ms:8.2f} ms   "
+          f"({old_ms / new_ms:5.1f}x)")
+
+
+def alias_dbfs(method):
+    """Level left of a full-scale 12 kHz tone after resampling 44.1 kHz -> 16 kHz."""
+    t = np.arange(44100, dtype=np.float32) / 44100
+    tone = AudioBuffer(np.sin(2 * np.pi * 12000 * t).astype(np.float32), 44100)
+    out = tone.resample(WHISPER_RATE, method).samples[1600:-1600]   # Skip filter edges
+    return 20 * np.log10(max(float(np.sqrt(np.mean(np.square(out)))), 1e-9) * np.sqrt(2))
+
+
+def bench_resample(recording, repeat):
+    if not HAVE_SCIPY:
+        print("resample               skipped (scipy not installed, np.interp is the only method)")
+        return
+    linear = timeit(lambda: recording.resample(WHISPER_RATE, "linear"), repeat)
+    poly = timeit(lambda: recording.resample(WHISPER_RATE, "poly"), repeat)
+    print(f"{'resample':<22} linear {linear:8.2f} ms   poly {poly:8.2f} ms")
+    print(f"{'  12 kHz alias':<22} linear {alias_dbfs('linear'):8.1f} dB   poly {alias_dbfs('poly'):8.1f} dB")
+
+
+def bench_recorder_to_whisper(recording, tmp_dir, repeat):
+    rec_wav = os.path.join(tmp_dir, "mic_input.wav")
+    try:
+        from faster_whisper import decode_audio
+        old_name = "file+ffmpeg"
+    except ImportError:
+        try:
+            from pydub import AudioSegment
+        except ImportError:
+            print("recorder -> whisper    skipped (neither faster-whisper nor pydub installed)")
+            return
+        old_name = "file+pydub "
+
+        def decode_audio(path):
+            sound = AudioSegment.from_wav(path).set_channels(1).set_frame_rate(WHISPER_RATE)
+            return np.array(sound.get_array_of_samples(), dtype=np.float32) / 32768.0
+
+    def old():
+        recording.write_wav(rec_wav)
+        decode_audio(rec_wav)
+
+    report("recorder -> whisper", old_name, timeit(old, repeat),
+           "preprocess ", timeit(lambda: preprocess_for_whisper(recording), repeat))
+
+    trimmed = preprocess_for_whisper(recording).size / WHISPER_RATE
+    print(f"{'  audio to decode':<22} {recording.duration:.2f}s -> {trimmed:.2f}s after trimming silence")
+
+
+def bench_tts_to_a2f(mp3_path, tmp_dir, repeat):
+    try:
+        from pydub import AudioSegment
+        speech = AudioSegment.from_file(mp3_path).set_channels(1).set_sample_width(2)
+    except Exception as e:
+        print(f"tts -> a2f             skipped (pydub/ffmpeg unavailable: {e})")
+        return
+
+    # Same audio as ElevenLabs sends with output_format=pcm_*
+    pcm_bytes = speech.raw_data
+    rate = speech.frame_rate
+    tmp_wav = os.path.join(tmp_dir, "tts_output.wav")
+
+    def old():
+        AudioSegment.from_mp3(mp3_path).export(tmp_wav, format="wav")   # convert_to_wav.py
+
+    def new():
+        prepare_for_a2f(AudioBuffer.from_pcm16(pcm_bytes, rate)).write_wav(tmp_wav)
+
+    report("tts -> a2f", "pydub      ", timeit(old, repeat), "prepare    ", timeit(new, repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wav", default=os.path.join(ROOT, "audio", "recording.wav"))
+    parser.add_argument("--mp3", default=os.path.join(ROOT, "output", "tts_output.mp3"))
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    recording = AudioBuffer.from_wav(args.wav)
+    print(f"{args.wav}: {recording.duration:.2f}s at {recording.sample_rate} Hz, {recording.channels} ch\n")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bench_resample(recording, args.repeat)
+        bench_recorder_to_whisper(recording, tmp_dir, args.repeat)
+        bench_tts_to_a2f(args.mp3, tmp_dir, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
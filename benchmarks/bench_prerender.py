@@ -0,0 +1,187 @@
+"""
+Pre-render benchmark: batch job throughput, and how much a pre-rendered answer saves at runtime.
+
+    python benchmarks/bench_prerender.py [--manifest flask-server/prerender_manifest.json] [--workers 4]
+
+Renders the manifest into a fresh asset library against the mock
+ElevenLabs and Audio2Face servers (emotion keys and cache exports take
+--a2f-seconds each, like a real A2F), first with one worker and one rig,
+then with --workers workers and --rigs players. A second run must skip
+every phrase.
+
+Then the server answers an FAQ question from the library with
+prerendered off and on, and Claude "goes down" so its canned apology is
+spoken from the library instead of ElevenLabs.
+
+Last, the FAQ answer's WAV is corrupted; the server must answer live
+rather than fail the turn.
+
+Exits 1 if a phrase is missing from the library, a cache wasn't exported,
+the server still called ElevenLabs for a pre-rendered answer, or a broken
+asset failed the turn.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "flask-server"))
+
+from mock_services import MockTTSServer, MockA2FServer
+from stubs import StubWhisperModel, StubChatModel
+
+FAQ_QUESTION = "Who are you?"
+
+
+def render_with(prerender, manifest, library_dir, workers, client, settings):
+    """Runs the job on one library with the manifest's A2F settings overridden by settings"""
+    from asset_library import AssetLibrary
+
+    phrases, defaults = prerender.load_manifest(manifest)
+    library = AssetLibrary(library_dir, voice=prerender.VOICE_ID)
+    summary = prerender.run_prerender(phrases, library, {**defaults, **settings}, workers=workers, client=client)
+    return phrases, library, summary
+
+
+def ask(server, options, rounds):
+    """Median seconds per conversation and the last response body"""
+    totals = []
+    for _ in range(rounds):
+        session = server.sessions.create(dict(options))
+        start = time.perf_counter()
+        body, status = server.sessions.submit(session, server.run_conversation).result()
+        totals.append(time.perf_counter() - start)
+        server.remove_session_wav(session)
+    return statistics.median(totals), body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--manifest", default=os.path.join(ROOT, "flask-server", "prerender_manifest.json"))
+    parser.add_argument("--wav", default=os.path.join(ROOT, "audio", "recording.wav"), help="fixture replayed as the mic")
+    parser.add_argument("--workers", type=int, default=4, help="TTS workers for the parallel run")
+    parser.add_argument("--rigs", type=int, default=2, help="A2F players for the parallel run")
+    parser.add_argument("--a2f-seconds", type=float, default=0.3, help="mock emotion key / cache export time")
+    parser.add_argument("--rounds", type=int, default=3, help="conversations per setting")
+    args = parser.parse_args()
+    args.manifest = os.path.abspath(args.manifest)
+    args.wav = os.path.abspath(args.wav)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_prerender_")
+    os.makedirs(os.path.join(work_dir, "output"), exist_ok=True)
+    players = [f"/World/audio2face/Player_{i:02d}" for i in range(args.rigs)]
+    slow = {"/A2F/A2E/GenerateKeys": args.a2f_seconds, "/A2F/Exporter/ExportGeometryCache": args.a2f_seconds}
+
+    with MockTTSServer() as tts_mock, MockA2FServer(regular_players=players, endpoint_latency=slow) as a2f_mock:
+        library_dir = os.path.join(work_dir, "assets")
+        os.environ.update({
+            "ELEVENLABS_API_URL": tts_mock.url,
+            "ELEVENLABS_API_KEY": "bench-key",
+            "ELEVENLABS_VOICE_ID": "bench-voice",
+            "A2F_API_URL": a2f_mock.url,
+            "RESPONSE_CACHE_DIR": os.path.join(work_dir, "response_cache"),
+            "ASSET_LIBRARY_DIR": library_dir,
+            "TRACE_LOG": "off",
+        })
+        os.chdir(work_dir)
+
+        import audio2face_api as a2f
+        import prerender
+
+        # One worker on one rig, then the pool; the second library is the one the server uses
+        serial_client = a2f.Audio2FaceClient(a2f_mock.url)
+        serial_settings = {"rigs": [{"player": players[0], "instance": prerender.A2F_INSTANCE}]}
+        phrases, _, serial = render_with(prerender, args.manifest, os.path.join(work_dir, "serial"), 1,
+                                         serial_client, serial_settings)
+        keys_before = a2f_mock.calls("/A2F/A2E/GenerateKeys")
+        rigs = {"rigs": [{"player": player, "instance": f"{prerender.A2F_INSTANCE}_{i:02d}"}
+                         for i, player in enumerate(players)]}
+        _, library, parallel = render_with(prerender, args.manifest, library_dir, args.workers,
+                                           a2f.Audio2FaceClient(a2f_mock.url), rigs)
+        keys_generated = a2f_mock.calls("/A2F/A2E/GenerateKeys") - keys_before
+        _, _, again = render_with(prerender, args.manifest, library_dir, args.workers,
+                                  a2f.Audio2FaceClient(a2f_mock.url), rigs)
+
+        entries = library.entries()
+        exported = sum(os.path.exists(library.path(entry["geometry_cache"])) for entry in entries)
+
+        # Runtime: an FAQ question answered from the library
+        import server
+        import transcriber
+        import claude_integration
+        from recorder import WavFileSource
+        from viewport_stream import SyntheticFrameSource
+
+        server.audio_source = lambda: WavFileSource(args.wav)
+        server.viewport_capture.source = SyntheticFrameSource()
+        transcriber.set_model(StubWhisperModel(FAQ_QUESTION, realtime_factor=0.05))
+        claude_integration.set_llm(StubChatModel())
+        # Through the server's parser, so options added later get their defaults
+        options = server.parse_options({
+            "duration": 10.0,
+            "endpointing": True,
+            "streaming_stt": True,
+            "streaming_tts": False,
+            "pipelined": True,
+            "use_cache": False,
+            "conversation_id": "bench",
+            "memory": False,
+            "barge_in": False,
+            "speculative": False,
+            "speculation_stable_seconds": 0.6,
+        })
+        runs = {}
+        for prerendered in (False, True):
+            tts_before = len(tts_mock.requests)
+            seconds, body = ask(server, {**options, "prerendered": prerendered}, args.rounds)
+            runs[prerendered] = (seconds, body, len(tts_mock.requests) - tts_before)
+        played = [payload.get("dir_path") for path, payload in a2f_mock.payloads if path == "/A2F/Player/SetRootPath"]
+
+        # Claude down: the canned apology comes from the library too
+        transcriber.set_model(StubWhisperModel("What's on display today?", realtime_factor=0.05))
+        claude_integration.set_llm(StubChatModel(error_rate=1.0))
+        tts_before = len(tts_mock.requests)
+        _, apology = ask(server, {**options, "prerendered": True}, 1)
+        apology_tts = len(tts_mock.requests) - tts_before
+
+        # An unreadable WAV in the library: the FAQ is answered live instead of failing the turn
+        transcriber.set_model(StubWhisperModel(FAQ_QUESTION, realtime_factor=0.05))
+        claude_integration.set_llm(StubChatModel())
+        faq = library.find_question(FAQ_QUESTION)
+        with open(library.path(faq["wav"]), "wb") as f:
+            f.write(b"not a wav")
+        library.put(faq)   # Rewrites the index, so the server drops the copy it decoded earlier
+        tts_before = len(tts_mock.requests)
+        _, broken = ask(server, {**options, "prerendered": True}, 1)
+        broken_tts = len(tts_mock.requests) - tts_before
+        server.viewport.stop()
+
+    print(f"\nRendered {len(phrases)} phrases ({parallel['audio_seconds']:.1f}s of speech)")
+    print(f"1 worker, 1 rig        {serial['wall_seconds']:6.2f}s")
+    print(f"{args.workers} workers, {args.rigs} rigs      {parallel['wall_seconds']:6.2f}s   "
+          f"({serial['wall_seconds'] / parallel['wall_seconds']:.1f}x)")
+    print(f"Second run: {again['skipped']} skipped, {again['phrases']} rendered")
+    print(f"Library: {len(entries)} entries, {exported} geometry caches exported, {keys_generated} emotion key runs")
+
+    print(f"\n'{FAQ_QUESTION}' answered in (median of {args.rounds})")
+    for prerendered, (seconds, body, tts_calls) in runs.items():
+        print(f"prerendered {'on ' if prerendered else 'off'}  {seconds * 1000:7.1f} ms   "
+              f"{tts_calls} ElevenLabs requests   → '{body.get('claude_response', body.get('error'))}'")
+    print(f"Claude down: {apology_tts} ElevenLabs requests for '{apology.get('claude_response')}'")
+    print(f"Unreadable FAQ WAV: {'answered live' if broken.get('success') else 'failed'} "
+          f"({broken_tts} ElevenLabs requests)")
+
+    on = runs[True]
+    ok = (len(entries) == len(phrases) and exported == len(entries) and keys_generated == len(phrases)
+          and again["phrases"] == 0 and on[1].get("prerendered") and on[2] == 0
+          and library_dir in played and apology_tts == 0
+          and broken.get("success") and not broken.get("prerendered") and broken_tts > 0)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Resilience benchmark: tail latency with and without hedging, and failover during an outage.
+
+    python benchmarks/bench_resilience.py [--calls 40] [--slow-fraction 0.1]
+
+ElevenLabs is the mock server from mock_services with slow_fraction of
+requests stalling for --slow-delay seconds; Claude is the stub chat model
+with the same fault mix. Each is called --calls times with hedging off and
+on (after a warm-up that fills the p95 window), and the p50/p95/p99 of the
+TTS round trip and of Claude's first token are compared.
+
+Then both providers go down (every request fails): the circuit breaker
+should open after a few failures, and later calls should be answered by the
+fallback voice / an earlier answer in milliseconds instead of waiting.
+
+Last, a request that fails at once and then succeeds on the retry: that
+retry must not be counted as a hedge win.
+
+Exits 1 if hedging didn't cut the p99, the breakers didn't fail over or a
+retry was counted as a hedge.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from mock_services import MockTTSServer
+from stubs import StubChatModel
+
+TEXT = "The brass telescope charted the moons of Jupiter."
+QUESTION = "What is the telescope for?"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1)] if ordered else 0.0
+
+
+def summarize(samples):
+    return {pct: percentile(samples, pct) * 1000.0 for pct in (50, 95, 99)}
+
+
+def timed_tts(tts, calls):
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        tts.synthesize_to_buffer(TEXT)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def timed_first_token(claude_integration, calls):
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        deltas = claude_integration.stream_claude_response(QUESTION)
+        next(deltas)
+        samples.append(time.perf_counter() - start)
+        deltas.close()
+    return samples
+
+
+def compare(policy, run, calls, warm_up):
+    """(baseline samples, hedged samples, hedges fired, hedges won)"""
+    initial = policy.hedge_after
+    results = {}
+    for hedged in (False, True):
+        policy.reset()
+        policy.hedge_after = initial if hedged else None
+        run(warm_up)
+        before = policy.stats()
+        results[hedged] = run(calls)
+        after = policy.stats()
+    policy.hedge_after = initial
+    return results[False], results[True], after["hedges_fired"] - before["hedges_fired"], \
+        after["hedges_won"] - before["hedges_won"]
+
+
+def outage(policy, run, calls):
+    """Per-call seconds while the provider is down, plus the policy's stats afterwards"""
+    policy.reset()
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+    return samples, policy.stats()
+
+
+def fast_fail_retry():
+    """Stats of one call whose first attempt fails at once and whose retry succeeds"""
+    from resilience import Resilient
+
+    policy = Resilient("bench.retry", deadline=5.0, hedge_after=2.0)
+    outcomes = iter([ConnectionError("refused"), "audio"])
+
+    def request():
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return policy.call(request), policy.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=40, help="measured calls per mode")
+    parser.add_argument("--slow-fraction", type=float, default=0.1, help="share of requests that stall")
+    parser.add_argument("--slow-delay", type=float, default=2.0, help="seconds a stalled request waits")
+    args = parser.parse_args()
+
+    random.seed(0)
+    with MockTTSServer(realtime_factor=20.0, slow_fraction=args.slow_fraction, slow_delay=args.slow_delay) as tts_mock:
+        os.environ.update({
+            "ELEVENLABS_API_URL": tts_mock.url,
+            "ELEVENLABS_API_KEY": "bench-key",
+            "ELEVENLABS_VOICE_ID": "bench-voice",
+            "ELEVENLABS_DEADLINE": str(args.slow_delay * 3),
+            "TRACE_LOG": "off",
+        })
+        os.chdir(tempfile.mkdtemp(prefix="bench_resilience_"))
+
+        import tts
+        import claude_integration
+        from audio_buffer import AudioBuffer
+
+        fallback_calls = []
+
+        def tone(text):
+            fallback_calls.append(text)
+            return AudioBuffer.from_pcm16(tts_mock.render(text), tts.TTS_SAMPLE_RATE)
+
+        tts.set_fallback_voice(tone)
+        claude_integration.set_llm(StubChatModel(
+            slow_fraction=args.slow_fraction, slow_delay=args.slow_delay, token_delay=0.0
+        ))
+
+        warm_up = 12
+        tts_results = compare(tts.elevenlabs, lambda n: timed_tts(tts, n), args.calls, warm_up)
+        llm_results = compare(claude_integration.bedrock_stream,
+                              lambda n: timed_first_token(claude_integration, n), args.calls, warm_up)
+
+        # One whole answer for the fallback to reuse, then every request fails
+        "".join(claude_integration.stream_claude_response(QUESTION))
+        tts_mock.error_rate = 1.0
+        claude_integration.set_llm(StubChatModel(error_rate=1.0))
+        tts_down, tts_down_stats = outage(tts.elevenlabs, lambda: tts.synthesize_to_buffer(TEXT), 10)
+        answers = []
+        llm_down, llm_down_stats = outage(
+            claude_integration.bedrock, lambda: answers.append(claude_integration.get_claude_response(QUESTION)), 10
+        )
+        retried, retry_stats = fast_fail_retry()
+
+    ok = True
+    for label, (baseline, hedged, fired, won) in (("ElevenLabs round trip", tts_results),
+                                                   ("Claude first token", llm_results)):
+        off, on = summarize(baseline), summarize(hedged)
+        print(f"\n{label} ({args.calls} calls, {args.slow_fraction:.0%} stall {args.slow_delay:.1f}s)")
+        print("            p50 ms     p95 ms     p99 ms")
+        print(f"hedge off {off[50]:8.1f}   {off[95]:8.1f}   {off[99]:8.1f}")
+        print(f"hedge on  {on[50]:8.1f}   {on[95]:8.1f}   {on[99]:8.1f}   ({fired} hedges fired, {won} won)")
+        ok = ok and on[99] < off[99]
+
+    print("\nOutage (every request fails)")
+    for label, samples, stats in (("ElevenLabs", tts_down, tts_down_stats), ("Claude", llm_down, llm_down_stats)):
+        print(f"{label:<10} circuit {stats['state']:<9} · {stats['short_circuited']} calls short-circuited · "
+              f"{stats['fallbacks']} fallbacks · first call {samples[0] * 1000:7.1f} ms, "
+              f"last call {samples[-1] * 1000:6.1f} ms")
+        ok = ok and stats["state"] == "open" and stats["short_circuited"] > 0 and stats["fallbacks"] == len(samples)
+    reused = sum(answer != claude_integration.CONNECTION_ERROR_RESPONSE for answer in answers)
+    print(f"Fallback voice spoke {len(fallback_calls)} times · Claude fallback reused an earlier answer "
+          f"{reused}/{len(answers)} times")
+    ok = ok and reused == len(answers)
+
+    print(f"\nFast failure then retry: answered {retried!r} · {retry_stats['retries']} retries · "
+          f"{retry_stats['hedges_fired']} hedges fired, {retry_stats['hedges_won']} won")
+    ok = ok and retried == "audio" and retry_stats["retries"] == 1 and retry_stats["hedges_won"] == 0
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Tunes speculative Claude calls: latency saved vs. calls wasted per stability interval.
+
+    python benchmarks/bench_speculation.py [--stable-seconds 0.3 0.6 1.0] [--rounds 3]
+
+Replays the WAV fixture at mic speed through the server pipeline (same
+stand-ins as bench_pipeline) with a stub Whisper model whose partial
+transcripts grow word by word, like a live decode. Runs once without
+speculation and once per --stable-seconds value, and reports time to
+first audio next to the speculation counters: hit rate, average head
+start on a hit, and Claude time spent on guesses that were thrown away.
+Shorter intervals guess earlier (more saved on a hit) but are more often
+wrong while the visitor is still talking.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "flask-server"))
+
+from bench_pipeline import fmt_ms, run_level
+from mock_services import MockTTSServer, MockA2FServer
+from stubs import StubWhisperModel, StubChatModel
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wav", default=os.path.join(ROOT, "audio", "recording.wav"), help="fixture replayed as the mic")
+    parser.add_argument("--stable-seconds", type=float, nargs="+", default=[0.3, 0.6, 1.0])
+    parser.add_argument("--rounds", type=int, default=3, help="sessions per setting")
+    parser.add_argument("--words-per-second", type=float, default=2.0, help="how fast stub partials grow")
+    parser.add_argument("--llm-first-token", type=float, default=0.6, help="stub Claude time to first token")
+    args = parser.parse_args()
+    args.wav = os.path.abspath(args.wav)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_speculation_")
+    os.makedirs(os.path.join(work_dir, "output"), exist_ok=True)
+
+    with MockTTSServer() as tts_mock, MockA2FServer() as a2f_mock:
+        os.environ.update({
+            "ELEVENLABS_API_URL": tts_mock.url,
+            "ELEVENLABS_API_KEY": "bench-key",
+            "ELEVENLABS_VOICE_ID": "bench-voice",
+            "A2F_API_URL": a2f_mock.url,
+            "RESPONSE_CACHE_DIR": os.path.join(work_dir, "response_cache"),
+            "TRACE_LOG": "off",
+        })
+        os.chdir(work_dir)
+
+        import server
+        import transcriber
+        import claude_integration
+        from recorder import WavFileSource
+        from speculation import get_speculation_metrics
+        from viewport_stream import SyntheticFrameSource
+
+        server.audio_source = lambda: WavFileSource(args.wav, realtime=True)
+        server.viewport_capture.source = SyntheticFrameSource()
+        transcriber.set_model(StubWhisperModel(realtime_factor=0.05, words_per_second=args.words_per_second))
+        claude_integration.set_llm(StubChatModel(first_token_delay=args.llm_first_token))
+
+        # Through the server's parser, so options added later get their defaults
+        options = server.parse_options({
+            "duration": 10.0,
+            "endpointing": True,
+            "streaming_stt": True,
+            "streaming_tts": False,
+            "pipelined": True,
+            "use_cache": False,
+            "conversation_id": "bench",
+            "memory": False,
+            "barge_in": False,
+        })
+
+        rows = []
+        for stable in [None] + args.stable_seconds:
+            before = get_speculation_metrics()
+            result = run_level(server, {
+                **options, "speculative": stable is not None, "speculation_stable_seconds": stable or 0.0
+            }, 1, args.rounds)
+            after = get_speculation_metrics()
+            delta = {key: after[key] - before[key] for key in
+                     ("started", "hits", "misses", "superseded", "saved_seconds_total", "wasted_seconds_total")}
+            rows.append((stable, result, delta))
+        server.viewport.stop()
+
+    print(f"\n{args.rounds} sessions per setting, partials at {args.words_per_second} words/s\n")
+    print("stable     first audio p50   total p50   guesses  hits  misses  superseded  avg saved   wasted")
+    for stable, result, delta in rows:
+        label = "off" if stable is None else f"{stable:.1f}s"
+        resolved = delta["hits"] + delta["misses"]
+        avg_saved = delta["saved_seconds_total"] / delta["hits"] if delta["hits"] else None
+        print(f"{label:<8} {fmt_ms(result['first_audio']['p50'])} ms   {fmt_ms(result['total']['p50'])} ms"
+              f"   {delta['started']:7d} {delta['hits']:5d} {delta['misses']:7d} {delta['superseded']:11d}"
+              f"  {fmt_ms(avg_saved)} ms {fmt_ms(delta['wasted_seconds_total'])} ms"
+              + (f"   (hit rate {delta['hits'] / resolved:.0%})" if resolved else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Import-time budget for the entry points.
+
+    python benchmarks/bench_startup.py [--budget-ms 1000] [--top 8]
+
+Imports each module in a fresh interpreter with `python -X importtime` and
+reports its cumulative import time, the slowest modules it pulled in, and
+any heavy dependency (Whisper, OpenCV, PortAudio, boto3, ...) that got
+imported at startup instead of on first use. Exits 1 if a module goes over
+the budget or imports something on the deferred list, so it can guard CI.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SERVER_DIR = os.path.join(ROOT, "flask-server")
+
+# module -> folder it's imported from
+TARGETS = {
+    "recorder": ROOT,
+    "convert_to_wav": ROOT,
+    "transcriber": ROOT,
+    "tts": ROOT,
+    "main": ROOT,
+    "batch_transcribe": ROOT,
+    "server": SERVER_DIR,
+}
+
+# Should only ever be imported when a feature actually uses them
+DEFERRED = ["faster_whisper", "ctranslate2", "torch", "cv2", "mss", "pyaudio", "pydub",
+            "boto3", "botocore", "langchain", "langchain_core", "langchain_aws", "grpc"]
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module, cwd):
+    """(cumulative ms, every module imported, [(ms, name)] of its direct imports, error or None)"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([cwd, ROOT]), TRACE_LOG="off")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, env=env, capture_output=True, text=True
+    )
+    if proc.returncode:
+        return None, [], [], proc.stderr.strip().splitlines()[-1]
+
+    imported, children, pending = [], [], []
+    total = None
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        ms, depth, name = int(match.group(2)) / 1000.0, len(match.group(3)), match.group(4)
+        imported.append(name)
+        if depth == 3:
+            pending.append((ms, name))   # Nested one level under whatever top-level import comes next
+        elif depth == 1:
+            if name == module:
+                total, children = ms, pending
+            pending = []
+    return total, imported, children, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=1000.0, help="max import time per module")
+    parser.add_argument("--top", type=int, default=8, help="slowest top-level imports to list per module")
+    parser.add_argument("modules", nargs="*", help=f"subset of {', '.join(TARGETS)}")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules or TARGETS:
+        total, imported, children, error = measure(module, TARGETS.get(module, ROOT))
+        if error:
+            print(f"\n{module:<18} import failed: {error}")
+            failed = True
+            continue
+
+        over = total > args.budget_ms
+        eager = sorted({name.split(".")[0] for name in imported} & set(DEFERRED))
+        failed |= over or bool(eager)
+        print(f"\n{module:<18} {total:8.1f} ms {'❌ over budget' if over else '✅'}")
+        if eager:
+            print(f"  imported at startup: {', '.join(eager)}")
+
+        # What the module imports directly, slowest first
+        for ms, name in sorted(children, reverse=True)[:args.top]:
+            print(f"    {ms:8.1f} ms  {name}")
+
+    print(f"\nBudget {args.budget_ms:.0f} ms per module; deferred: {', '.join(DEFERRED)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Time to first audio: buffered TTS download vs. streaming synthesis.
+
+    python benchmarks/bench_tts_stream.py
+
+Runs against benchmarks/mock_services.MockTTSServer, so no API key or network is needed.
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from mock_services import MockTTSServer
+
+TEXT = ("Hi there, I'm Magic Mirror. I can answer questions about the exhibit, "
+        "tell you a story, or just chat for a while.")
+
+
+def main():
+    with MockTTSServer() as mock:
+        os.environ["ELEVENLABS_API_URL"] = mock.url
+        os.environ.setdefault("ELEVENLABS_API_KEY", "test-key")
+        os.environ.setdefault("ELEVENLABS_VOICE_ID", "test-voice")
+        import tts
+
+        start = time.perf_counter()
+        speech = tts.synthesize_to_buffer(TEXT)
+        buffered = time.perf_counter() - start
+
+        start = time.perf_counter()
+        first = None
+        seconds = 0.0
+        for chunk in tts.synthesize_stream(TEXT):
+            if first is None:
+                first = time.perf_counter() - start
+            seconds += chunk.duration
+        total = time.perf_counter() - start
+
+    print(f"audio length          {speech.duration:6.2f} s (streamed {seconds:.2f} s)")
+    print(f"buffered first audio  {buffered * 1000:8.1f} ms")
+    print(f"streamed first audio  {first * 1000:8.1f} ms (all chunks after {total * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Local stand-ins for the external services the pipeline talks to.
+
+Each server runs on a background thread bound to 127.0.0.1 on a free port:
+
+    with MockTTSServer(realtime_factor=4.0) as tts:
+        os.environ["ELEVENLABS_API_URL"] = tts.url
+"""
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+class _MockServer:
+    """Runs a ThreadingHTTPServer on a daemon thread; usable as a context manager."""
+
+    handler_class = BaseHTTPRequestHandler
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), self.handler_class)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+        self.requests = []   # (method, path) of every request served
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _TTSHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        mock = self.server.mock
+        mock.requests.append(("POST", self.path))
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        fault = mock.fault()
+        if fault == "error":
+            self.send_error(503, "Service temporarily unavailable")
+            return
+        if fault == "slow":
+            time.sleep(mock.slow_delay)
+
+        pcm = mock.render(body.get("text", ""))
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/pcm")
+
+        if self.path.split("?")[0].endswith("/stream"):
+            # Send each chunk as soon as it has been "synthesized"
+            self.end_headers()
+            time.sleep(mock.first_byte_delay)
+            step = 2 * mock.sample_rate // 10   # 100 ms of audio
+            for start in range(0, len(pcm), step):
+                time.sleep(0.1 / mock.realtime_factor)
+                self.wfile.write(pcm[start:start + step])
+                self.wfile.flush()
+        else:
+            # Whole body only once synthesis has finished
+            time.sleep(mock.first_byte_delay + mock.audio_seconds(pcm) / mock.realtime_factor)
+            self.send_header("Content-Length", str(len(pcm)))
+            self.end_headers()
+            self.wfile.write(pcm)
+
+
+class MockTTSServer(_MockServer):
+    """
+    ElevenLabs stand-in that speaks a tone instead of words.
+
+    Audio length scales with the text (seconds_per_char) and is "synthesized"
+    realtime_factor times faster than real time, after first_byte_delay.
+
+    For resilience tests it can misbehave: slow_fraction of requests stall
+    an extra slow_delay seconds first, error_rate of them get a 503 (1.0 is
+    an outage). Faults are drawn from a seeded generator, so runs repeat.
+    """
+
+    handler_class = _TTSHandler
+
+    def __init__(self, sample_rate=22050, seconds_per_char=0.06, realtime_factor=4.0,
+                 first_byte_delay=0.15, slow_fraction=0.0, slow_delay=2.0, error_rate=0.0, seed=0, **kwargs):
+        super().__init__(**kwargs)
+        self.sample_rate = sample_rate
+        self.seconds_per_char = seconds_per_char
+        self.realtime_factor = realtime_factor
+        self.first_byte_delay = first_byte_delay
+        self.slow_fraction = slow_fraction
+        self.slow_delay = slow_delay
+        self.error_rate = error_rate
+        self.faults = {"slow": 0, "error": 0}
+        self._random = random.Random(seed)
+        self._fault_lock = threading.Lock()
+
+    def fault(self):
+        """"error", "slow" or None for the next request."""
+        with self._fault_lock:
+            draw = self._random.random()
+            fault = "error" if draw < self.error_rate else "slow" if draw < self.error_rate + self.slow_fraction else None
+            if fault:
+                self.faults[fault] += 1
+            return fault
+
+    def audio_seconds(self, pcm):
+        return len(pcm) / (2 * self.sample_rate)
+
+    def render(self, text):
+        n = int(max(len(text), 1) * self.seconds_per_char * self.sample_rate)
+        t = np.arange(n) / self.sample_rate
+        return (8000 * np.sin(2 * np.pi * 220 * t)).astype(np.int16).tobytes()
+
+
+class _A2FHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, result):
+        mock = self.server.mock
+        time.sleep(mock.endpoint_latency.get(self.path.split("?")[0], mock.latency))
+        body = json.dumps({"status": "OK", "result": result, "message": ""}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        mock = self.server.mock
+        mock.requests.append(("GET", self.path))
+        if self.path == "/A2F/Player/GetInstances":
+            self._reply({"regular": mock.regular_players, "streaming": mock.streaming_players})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        mock = self.server.mock
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        mock.requests.append(("POST", self.path))
+        mock.payloads.append((self.path, payload))
+        if self.path == "/A2F/Player/Play":
+            mock.playing[payload.get("a2f_player")] = True
+        elif self.path == "/A2F/Player/Pause":
+            mock.playing[payload.get("a2f_player")] = False
+        elif self.path == "/A2F/Exporter/ExportGeometryCache":
+            mock.export(payload)
+        self._reply(mock.results.get(self.path, "OK"))
+
+
+class MockA2FServer(_MockServer):
+    """
+    Audio2Face REST stand-in: answers every endpoint with {"status": "OK"}
+    after `latency` seconds and records what was called (and whether each
+    player was last told to Play or Pause).
+
+    endpoint_latency overrides the delay per path (emotion keys and cache
+    exports take seconds on a real A2F). ExportGeometryCache writes a small
+    placeholder file where the real exporter would put the cache.
+    """
+
+    handler_class = _A2FHandler
+
+    def __init__(self, latency=0.005, regular_players=None, streaming_players=None, endpoint_latency=None,
+                 **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.endpoint_latency = endpoint_latency or {}
+        self.regular_players = regular_players if regular_players is not None else ["/World/audio2face/Player"]
+        self.streaming_players = streaming_players or []
+        self.payloads = []   # (path, JSON body) of every POST
+        self.results = {}    # path -> custom "result" value
+        self.playing = {}    # player -> True after Play, False after Pause
+
+    def calls(self, path):
+        """How many times an endpoint was hit."""
+        return sum(1 for _, p in self.requests if p == path)
+
+    def export(self, payload):
+        directory = payload.get("export_directory")
+        if directory and os.path.isdir(directory):
+            name = f"{payload.get('file_name', 'cache')}.{payload.get('cache_type', 'usd')}"
+            with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+                f.write(f"#usda 1.0\n# mock geometry cache for {', '.join(payload.get('meshes', []))}\n")
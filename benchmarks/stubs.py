@@ -0,0 +1,106 @@
+"""
+In-process stand-ins for the models the pipeline runs: Whisper and Claude.
+
+Both take a fixed amount of time per unit of work so a benchmark measures
+the pipeline around them, not the models:
+
+    transcriber.set_model(StubWhisperModel("what time is it", realtime_factor=0.1))
+    claude_integration.set_llm(StubChatModel(response="It's noon."))
+"""
+import random
+import re
+import time
+from collections import namedtuple
+
+import numpy as np
+
+WHISPER_RATE = 16000
+
+Segment = namedtuple("Segment", "start end text")
+TranscriptionInfo = namedtuple("TranscriptionInfo", "language language_probability")
+
+
+class StubWhisperModel:
+    """
+    faster-whisper WhisperModel stand-in that always hears `transcript`.
+
+    transcribe() sleeps realtime_factor seconds per second of audio (0.1 =
+    ten times faster than real time), like a decode would. With
+    words_per_second set, only the words "spoken" by that point of the audio
+    are heard, so streaming partials grow the way they do on a live mic.
+    """
+
+    def __init__(self, transcript="What can you tell me about the exhibit?", realtime_factor=0.1,
+                 words_per_second=None):
+        self.transcript = transcript
+        self.realtime_factor = realtime_factor
+        self.words_per_second = words_per_second
+        self.calls = 0
+
+    def transcribe(self, audio, beam_size=5, **kwargs):
+        self.calls += 1
+        seconds = np.asarray(audio).size / WHISPER_RATE if not isinstance(audio, str) else 1.0
+        time.sleep(seconds * self.realtime_factor)
+        text = self.transcript
+        if self.words_per_second:
+            text = " ".join(text.split()[:int(seconds * self.words_per_second)])
+        segments = iter([Segment(0.0, seconds, " " + text)] if seconds and text else [])
+        return segments, TranscriptionInfo("en", 0.99)
+
+
+def StubChatModel(response="Great question! The mirror listens, thinks, and answers out loud. Ask me anything.",
+                  first_token_delay=0.3, token_delay=0.02, prompt_token_delay=0.0,
+                  slow_fraction=0.0, slow_delay=5.0, error_rate=0.0):
+    """
+    Chat model for claude_integration.set_llm(): waits first_token_delay,
+    then streams `response` one word every token_delay seconds.
+
+    prompt_token_delay adds time to the first token per prompt token (~4
+    characters), like a real model's prefill, so longer prompts are slower.
+
+    Like a flaky provider, slow_fraction of calls wait another slow_delay
+    seconds before the first token and error_rate of them raise instead
+    (drawn from the `random` module, so random.seed() makes runs repeat).
+    """
+    from langchain_core.language_models import SimpleChatModel
+    from langchain_core.messages import AIMessageChunk
+    from langchain_core.outputs import ChatGenerationChunk
+
+    class _StubChatModel(SimpleChatModel):
+        response: str
+        first_token_delay: float
+        token_delay: float
+        prompt_token_delay: float
+        slow_fraction: float
+        slow_delay: float
+        error_rate: float
+
+        @property
+        def _llm_type(self):
+            return "stub-chat-model"
+
+        def _tokens(self):
+            return re.findall(r"\S+\s*", self.response)
+
+        def _prefill(self, messages):
+            draw = random.random()
+            if draw < self.error_rate:
+                raise ConnectionError("stub model unavailable")
+            chars = sum(len(message.content) for message in messages if isinstance(message.content, str))
+            slow = self.slow_delay if draw < self.error_rate + self.slow_fraction else 0.0
+            return self.first_token_delay + self.prompt_token_delay * chars / 4 + slow
+
+        def _call(self, messages, stop=None, run_manager=None, **kwargs):
+            time.sleep(self._prefill(messages) + self.token_delay * max(len(self._tokens()) - 1, 0))
+            return self.response
+
+        def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+            time.sleep(self._prefill(messages))
+            for i, token in enumerate(self._tokens()):
+                if i:
+                    time.sleep(self.token_delay)
+                yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    return _StubChatModel(response=response, first_token_delay=first_token_delay, token_delay=token_delay,
+                          prompt_token_delay=prompt_token_delay, slow_fraction=slow_fraction, slow_delay=slow_delay,
+                          error_rate=error_rate)
@@ -0,0 +1,172 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from tracing import record
+
+# Barge-in support: a conversation turn runs inside cancel_scope(token), and
+# everything it calls (Claude streaming, ElevenLabs downloads, the sentence
+# pipeline, A2F pushes) checks current_token() or registers an on_cancel()
+# hook, so one token.cancel() stops the whole turn wherever it is.
+
+# The token of the turn running in the current thread/context (None outside one)
+_current = contextvars.ContextVar("cancellation_token", default=None)
+
+# Work given up on because of cancellations, exposed through get_cancellation_metrics()
+_metrics_lock = threading.Lock()
+_metrics = {
+    "cancelled": 0,
+    "sentences_discarded": 0,
+    "requests_aborted": 0,
+    "unplayed_audio_seconds": 0.0,
+}
+
+
+class Cancelled(Exception):
+    """Raised inside a turn once its token has been cancelled"""
+
+    def __init__(self, reason: str | None = None):
+        super().__init__(reason or "cancelled")
+        self.reason = reason
+
+
+class CancellationToken:
+    """
+    One-shot flag shared by every stage of a turn.
+
+    cancel() sets it and runs the registered on_cancel hooks (closing
+    sockets, pausing the avatar, ...) on the cancelling thread, so work that
+    is blocked rather than polling stops too. A child() token stops one
+    part of the turn on its own and is cancelled along with its parent.
+    """
+
+    def __init__(self, parent: "CancellationToken | None" = None):
+        self.parent = parent
+        self.reason = None
+        self.cancelled_at = None
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Cancels the turn; False if it was already cancelled"""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self.cancelled_at = time.perf_counter()
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        if self.parent is None:
+            count("cancelled")   # Turns, not the parts of one
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ Cancel hook failed: {e}")
+        return True
+
+    def on_cancel(self, callback):
+        """
+        Runs callback() when the token is cancelled (right away if it already is).
+
+        Returns:
+        - a function that unregisters the callback (call it once the work is done)
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def child(self) -> "CancellationToken":
+        """A token for part of the turn: cancelled with this one, or by itself"""
+        child = CancellationToken(parent=self)
+        self.on_cancel(lambda: child.cancel(self.reason))
+        return child
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise Cancelled(self.reason)
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Sleeps up to timeout seconds; True as soon as the token is cancelled"""
+        return self._event.wait(timeout)
+
+    def _remove(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+@contextmanager
+def cancel_scope(token: CancellationToken):
+    """Makes token the current_token() for the block (and threads started with its context)"""
+    reset = _current.set(token)
+    try:
+        yield token
+    finally:
+        _current.reset(reset)
+
+
+def current_token() -> CancellationToken | None:
+    return _current.get()
+
+
+def is_cancelled() -> bool:
+    token = _current.get()
+    return token is not None and token.cancelled
+
+
+def check_cancelled() -> None:
+    """Raises Cancelled if the current turn has been cancelled"""
+    token = _current.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+@contextmanager
+def abort_on_cancel(close):
+    """
+    Calls close() if the current turn is cancelled while the block runs.
+
+    Used around blocking I/O: closing the HTTP response or gRPC channel
+    unblocks the reading thread, which then sees is_cancelled().
+    """
+    token = _current.get()
+    if token is None:
+        yield
+        return
+
+    def abort():
+        count("requests_aborted")
+        close()
+
+    unregister = token.on_cancel(abort)
+    try:
+        yield
+    finally:
+        unregister()
+
+
+def count(name: str, amount=1) -> None:
+    with _metrics_lock:
+        _metrics[name] += amount
+
+
+def record_stopped(token: CancellationToken) -> None:
+    """Logs how long the turn took to wind down after cancel()"""
+    if token.cancelled_at is not None:
+        record("cancel.stop", time.perf_counter() - token.cancelled_at, reason=token.reason)
+
+
+def get_cancellation_metrics() -> dict:
+    """Cancelled turns and the work they didn't have to finish"""
+    with _metrics_lock:
+        return dict(_metrics)
@@ -1,13 +1,85 @@
-import boto3
-from langchain_aws import ChatBedrock
-from langchain_core.prompts import ChatPromptTemplate
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+from cancellation import Cancelled, is_cancelled
+from resilience import Resilient, Unavailable
+from tracing import record
+
+# boto3 and langchain are imported lazily inside the functions below, so tools
+# that import this module without talking to Claude don't pay for them.
+
+MODEL_ID = "us.anthropic.claude-3-7-sonnet-20250219-v1:0"
+
+# Canned answers when Claude can't be reached (never worth caching)
+CONNECTION_ERROR_RESPONSE = "I'm sorry, I'm having trouble connecting to my AI brain right now."
+ERROR_RESPONSE = "I'm sorry, I encountered an error while thinking about that."
+FALLBACK_RESPONSES = (CONNECTION_ERROR_RESPONSE, ERROR_RESPONSE)
+
+SYSTEM_PROMPT = """You are Magic Mirror, an AI avatar assistant. You are helpful, friendly, and conversational. 
+        Keep your responses concise (1-3 sentences) since they will be spoken aloud by a digital avatar. 
+        Be engaging and personable in your responses."""
+
+SUMMARY_PROMPT = """You keep the running memory of a spoken conversation between a visitor and Magic Mirror, an AI avatar.
+Update the summary with the new exchanges. Keep names, facts the visitor shared, questions still open and anything
+Magic Mirror promised. Write plain prose, at most {words} words, and reply with the summary only."""
+
+# Conversation memory: every prompt carries at most this many tokens of
+# history (rolling summary + recent turns), so latency doesn't grow per turn
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "1200"))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("MEMORY_SUMMARY_TOKENS", "250"))
+MAX_CONVERSATIONS = 64      # Memories kept (least recently used dropped first)
+CHARS_PER_TOKEN = 4         # Rough English average; good enough for budgeting
+
+# Per-call deadlines: a whole answer, or the first token of a streamed one
+CLAUDE_DEADLINE = float(os.getenv("CLAUDE_DEADLINE", "20"))
+CLAUDE_FIRST_TOKEN_DEADLINE = float(os.getenv("CLAUDE_FIRST_TOKEN_DEADLINE", "8"))
+MAX_FALLBACK_ANSWERS = 128  # Recent good answers kept to reuse while Claude is down
+
+# Hedged + circuit-broken Bedrock calls (see resilience.py)
+bedrock = Resilient("bedrock", deadline=CLAUDE_DEADLINE, hedge_after=6.0)
+bedrock_stream = Resilient("bedrock.stream", deadline=CLAUDE_FIRST_TOKEN_DEADLINE, hedge_after=2.5)
+
+# Normalized question -> last good answer, least recently used first
+_fallback_answers = OrderedDict()
+_fallback_lock = threading.Lock()
+
+class IncompleteResponse(Exception):
+    """A streamed answer broke off part-way; the text already yielded stands, but isn't the whole answer"""
+
+
+# One Bedrock client + prompt chain for the whole process (see get_chain)
+_chain = None
+_chain_lock = threading.Lock()
+
+# Setup vs. model timings, exposed through get_llm_metrics()
+_metrics_lock = threading.Lock()
+_metrics = {
+    "client_setups": 0,
+    "setup_seconds_total": 0.0,
+    "last_setup_seconds": None,
+    "calls": 0,
+    "errors": 0,
+    "model_seconds_total": 0.0,
+    "last_model_seconds": None,
+    "last_first_token_seconds": None,
+}
 
 def return_llm(type="claude"):
     """Initialize Claude AI model"""
     try:
+        import boto3
+        from botocore.config import Config
+        from langchain_aws import ChatBedrock
+
         # You'll need to configure your AWS credentials
         session = boto3.Session(profile_name='iff_aws_crtveapps_aitools_user-889166750058')   
-        bedrock_client = session.client('bedrock-runtime', region_name='us-east-1')
+        # Timeouts and retries are handled by the bedrock policies, not botocore
+        bedrock_client = session.client('bedrock-runtime', region_name='us-east-1', config=Config(
+            connect_timeout=3, read_timeout=CLAUDE_DEADLINE, retries={"max_attempts": 1}
+        ))
         
         model_kwargs = {
             "max_tokens": 2048,
@@ -19,35 +91,448 @@ def return_llm(type="claude"):
         
         return ChatBedrock(
             client=bedrock_client,
-            model_id="us.anthropic.claude-3-7-sonnet-20250219-v1:0",
+            model_id=MODEL_ID,
             model_kwargs=model_kwargs
         )
     except Exception as e:
         print(f"❌ Claude initialization error: {e}")
         return None
 
-def get_claude_response(user_input):
-    """Get AI response from Claude"""
+def build_prompt():
+    """
+    Conversational prompt for the avatar.
+
+    The system prompt never changes and comes first, then the history
+    (summary, then turns in order), then the new question. Each turn only
+    appends to what the previous prompt sent, so the prefix stays
+    byte-identical between turns for provider-side prompt caching.
+    """
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+    return ChatPromptTemplate.from_messages([
+        ("system", SYSTEM_PROMPT),
+        MessagesPlaceholder("history", optional=True),
+        ("human", "{question}")
+    ])
+
+def get_chain():
+    """
+    Shared prompt | model chain, built on first use.
+
+    The Bedrock client is thread-safe, so every request reuses the same one
+    instead of opening a new session per utterance. Returns None (and tries
+    again next time) if the client can't be created.
+    """
+    global _chain
+    if _chain is not None:
+        return _chain
+
+    with _chain_lock:
+        if _chain is None:
+            start = time.perf_counter()
+            model = return_llm("claude")
+            if not model:
+                return None
+            _chain = build_prompt() | model
+            _record_setup(time.perf_counter() - start)
+    return _chain
+
+def set_llm(model):
+    """
+    Swap in a different chat model (e.g. a langchain FakeListChatModel stub).
+    Pass None to go back to Bedrock on the next call.
+    """
+    global _chain
+    with _chain_lock:
+        _chain = build_prompt() | model if model is not None else None
+
+def warm_up(ping=True):
+    """
+    Create the Bedrock client ahead of the first request.
+
+    With ping=True, also sends one tiny prompt so the TLS handshake and
+    first model call happen now instead of during a conversation.
+    Returns False if the client couldn't be created.
+    """
+    chain = get_chain()
+    if chain is None:
+        return False
+    if ping:
+        start = time.perf_counter()
+        chain.invoke({"question": "Reply with just the word OK."})
+        record("llm.warm_up_ping", time.perf_counter() - start)
+    return True
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count (no tokenizer round trip on the hot path)"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def summarize_turns(summary: str, turns: list, max_tokens: int = SUMMARY_TOKEN_BUDGET) -> str:
+    """
+    Folds (user, assistant) turns into the running summary with one model call.
+
+    Raises if Claude isn't available; ConversationMemory keeps going without
+    the summary in that case.
+    """
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    chain = get_chain()
+    if chain is None:
+        raise RuntimeError("Claude is not available")
+
+    exchanges = "\n".join(f"Visitor: {user}\nMagic Mirror: {assistant}" for user, assistant in turns)
+    start = time.perf_counter()
+    result = chain.last.invoke([
+        SystemMessage(SUMMARY_PROMPT.format(words=max_tokens * 3 // 4)),
+        HumanMessage(f"Summary so far: {summary or '(none yet)'}\n\nNew exchanges:\n{exchanges}")
+    ])
+    record("llm.summarize", time.perf_counter() - start, turns=len(turns))
+    return result.content.strip()
+
+class ConversationMemory:
+    """
+    History for one conversation, held to a fixed token budget.
+
+    The newest turns go into the prompt verbatim. Once they outgrow the
+    budget, the oldest are folded into a rolling summary on a background
+    thread, so the conversation itself never waits for summarization.
+    Until a summary lands, turns past the budget are simply left out of
+    the prompt.
+
+    Parameters:
+    - token_budget: max history tokens per prompt (summary + turns)
+    - summary_budget: part of token_budget reserved for the summary
+    - summarizer: fn(summary, [(user, assistant)], max_tokens) -> new summary
+    """
+
+    def __init__(self, token_budget: int = MEMORY_TOKEN_BUDGET, summary_budget: int = SUMMARY_TOKEN_BUDGET,
+                 summarizer=summarize_turns):
+        self.token_budget = token_budget
+        self.summary_budget = min(summary_budget, token_budget // 2)
+        self.summarizer = summarizer
+        self.summary = ""
+        self._turns = []             # (user, assistant, tokens), oldest first
+        self._lock = threading.Lock()
+        self._summarizing = False
+        self._generation = 0         # Bumped by clear() so a late summary is discarded
+        self._stats = {
+            "turns": 0,
+            "summaries": 0,
+            "summary_errors": 0,
+            "turns_summarized": 0,
+            "summary_seconds_total": 0.0,
+            "last_prompt_tokens": 0,
+        }
+
+    def messages(self) -> list:
+        """History messages for the prompt: summary, then the newest turns that fit"""
+        from langchain_core.messages import AIMessage, HumanMessage
+
+        with self._lock:
+            summary = self.summary
+            room = self.token_budget - (estimate_tokens(summary) if summary else 0)
+            recent = []
+            for user, assistant, tokens in reversed(self._turns):
+                if tokens > room:
+                    break
+                recent.append((user, assistant))
+                room -= tokens
+            self._stats["last_prompt_tokens"] = self.token_budget - room
+
+        history = []
+        if summary:
+            # As an exchange rather than a second system message: Claude wants turns to alternate
+            history += [HumanMessage(f"(Summary of our conversation so far: {summary})"),
+                        AIMessage("Got it, I remember.")]
+        for user, assistant in reversed(recent):
+            history += [HumanMessage(user), AIMessage(assistant)]
+        return history
+
+    def add_turn(self, user: str, assistant: str):
+        """Records a finished exchange and starts summarizing if history is over budget"""
+        with self._lock:
+            self._turns.append((user, assistant, estimate_tokens(user) + estimate_tokens(assistant)))
+            self._stats["turns"] += 1
+            batch = self._take_overflow()
+            generation = self._generation
+        if batch:
+            threading.Thread(
+                target=self._summarize, args=(batch, generation), name="memory-summary", daemon=True
+            ).start()
+
+    def is_empty(self) -> bool:
+        """True until the first turn is recorded (and again after clear())"""
+        with self._lock:
+            return not self._turns and not self.summary and not self._summarizing
+
+    def clear(self):
+        with self._lock:
+            self._turns = []
+            self.summary = ""
+            self._generation += 1
+
+    def wait_idle(self, timeout: float = 10.0) -> bool:
+        """Blocks until no summary is being written (for tests and benchmarks)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._summarizing:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["turns_in_memory"] = len(self._turns)
+            snapshot["history_tokens"] = sum(tokens for _, _, tokens in self._turns)
+            snapshot["summary_tokens"] = estimate_tokens(self.summary) if self.summary else 0
+            snapshot["summarizing"] = self._summarizing
+        return snapshot
+
+    def _take_overflow(self) -> list:
+        # Called with the lock held. Once the turns no longer fit next to the
+        # summary, hand the oldest ones to the summarizer until half the room
+        # is free again, so summaries run every few turns rather than every turn.
+        if self._summarizing:
+            return []
+        room = self.token_budget - self.summary_budget
+        total = sum(tokens for _, _, tokens in self._turns)
+        if total <= room:
+            return []
+        batch = []
+        for user, assistant, tokens in self._turns[:-1]:   # Always keep the newest turn verbatim
+            if total <= room // 2:
+                break
+            batch.append((user, assistant))
+            total -= tokens
+        self._summarizing = bool(batch)
+        return batch
+
+    def _summarize(self, batch, generation):
+        start = time.perf_counter()
+        try:
+            summary = self.summarizer(self.summary, batch, self.summary_budget)
+        except Exception as e:
+            print(f"⚠️ Conversation summary failed, dropping {len(batch)} old turns: {e}")
+            summary = None
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._summarizing = False
+            if generation != self._generation:
+                return   # clear() ran meanwhile
+            # Only add_turn appends while we run, so the batch is still at the front
+            del self._turns[:len(batch)]
+            if summary is None:
+                self._stats["summary_errors"] += 1
+            else:
+                # Hold the summary to its budget even if the model ran long
+                self.summary = summary[:self.summary_budget * CHARS_PER_TOKEN]
+                self._stats["summaries"] += 1
+                self._stats["turns_summarized"] += len(batch)
+                self._stats["summary_seconds_total"] += elapsed
+            batch = self._take_overflow()   # Turns may have piled up while we worked
+        if batch:
+            self._summarize(batch, generation)
+
+# Memory per conversation id, least recently used first
+_memories = OrderedDict()
+_memories_lock = threading.Lock()
+
+def get_memory(conversation_id: str) -> ConversationMemory:
+    """The conversation's memory, created on first use"""
+    with _memories_lock:
+        memory = _memories.get(conversation_id)
+        if memory is None:
+            memory = _memories[conversation_id] = ConversationMemory()
+            while len(_memories) > MAX_CONVERSATIONS:
+                _memories.popitem(last=False)
+        _memories.move_to_end(conversation_id)
+        return memory
+
+def forget_conversation(conversation_id: str) -> bool:
+    """Drops a conversation's memory; False if there was none"""
+    with _memories_lock:
+        return _memories.pop(conversation_id, None) is not None
+
+def get_memory_metrics() -> dict:
+    """Per-conversation memory sizes and summary counters"""
+    with _memories_lock:
+        memories = dict(_memories)
+    return {conversation_id: memory.stats() for conversation_id, memory in memories.items()}
+
+def get_llm_metrics():
+    """Snapshot of client setup and per-call model timings"""
+    with _metrics_lock:
+        snapshot = dict(_metrics)
+    calls = snapshot["calls"]
+    snapshot["avg_model_seconds"] = snapshot["model_seconds_total"] / calls if calls else None
+    return snapshot
+
+def _record_setup(elapsed):
+    record("llm.setup", elapsed)
+    with _metrics_lock:
+        _metrics["client_setups"] += 1
+        _metrics["setup_seconds_total"] += elapsed
+        _metrics["last_setup_seconds"] = elapsed
+
+def _record_call(elapsed, first_token=None, error=False):
+    record("llm.call", elapsed, error=error)
+    if first_token is not None:
+        record("llm.first_token", first_token)
+    with _metrics_lock:
+        _metrics["calls"] += 1
+        _metrics["errors"] += int(error)
+        _metrics["model_seconds_total"] += elapsed
+        _metrics["last_model_seconds"] = elapsed
+        if first_token is not None:
+            _metrics["last_first_token_seconds"] = first_token
+
+def _inputs(user_input, memory):
+    return {"question": user_input, "history": memory.messages() if memory is not None else []}
+
+def _fallback_key(user_input):
+    return " ".join("".join(c for c in user_input.lower() if c.isalnum() or c.isspace()).split())
+
+def _remember_answer(user_input, response):
+    key = _fallback_key(user_input)
+    with _fallback_lock:
+        _fallback_answers[key] = response
+        _fallback_answers.move_to_end(key)
+        while len(_fallback_answers) > MAX_FALLBACK_ANSWERS:
+            _fallback_answers.popitem(last=False)
+
+def fallback_answer(user_input, policy=bedrock):
+    """What to say while Claude is unavailable: the last answer to the same question, else an apology"""
+    with _fallback_lock:
+        answer = _fallback_answers.get(_fallback_key(user_input))
+    policy.record_fallback()
+    if answer is not None:
+        print("♻️ Claude unavailable, reusing an earlier answer")
+        return answer
+    return CONNECTION_ERROR_RESPONSE
+
+def _chunk_text(chunk):
+    if isinstance(chunk.content, str):
+        return chunk.content
+    return "".join(part.get("text", "") for part in chunk.content if isinstance(part, dict))
+
+def _open_stream(llm_chain, inputs):
+    """Starts a streamed answer and waits for its first text: (stream, first delta)"""
+    stream = llm_chain.stream(inputs)
     try:
-        model = return_llm("claude")
-        if not model:
-            return "I'm sorry, I'm having trouble connecting to my AI brain right now."
-        
-        # Create a conversational prompt
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are Magic Mirror, an AI avatar assistant. You are helpful, friendly, and conversational. 
-            Keep your responses concise (1-3 sentences) since they will be spoken aloud by a digital avatar. 
-            Be engaging and personable in your responses."""),
-            ("human", "{question}")
-        ])
+        for chunk in stream:
+            text = _chunk_text(chunk)
+            if text:
+                return stream, text
+    except Exception:
+        stream.close()
+        raise
+    return stream, ""
+
+def get_claude_response(user_input, memory=None, remember=True):
+    """
+    Get AI response from Claude.
+
+    With a ConversationMemory, earlier turns go into the prompt and this
+    exchange is added to it once it succeeds (unless remember=False, e.g.
+    for a speculative call that may be thrown away).
+    The call has a deadline and is hedged past the recent p95; while Bedrock
+    is failing, an earlier answer to the same question (or an apology) is
+    returned right away.
+    """
+    start = None
+    try:
+        llm_chain = get_chain()
+        if not llm_chain:
+            return CONNECTION_ERROR_RESPONSE
         
-        llm_chain = prompt | model
-        result = llm_chain.invoke({"question": user_input})
+        start = time.perf_counter()
+        result = bedrock.call(llm_chain.invoke, _inputs(user_input, memory))
+        _record_call(time.perf_counter() - start)
         
         response = result.content.strip()
         print(f"🤖 Claude response: '{response}'")
+        if response:
+            _remember_answer(user_input, response)
+        if memory is not None and remember and response:
+            memory.add_turn(user_input, response)
         return response
         
+    except Cancelled:
+        return ""
+    except Unavailable as e:
+        _record_call(time.perf_counter() - start, error=True)
+        print(f"❌ Claude unavailable: {e}")
+        return fallback_answer(user_input)
+    except Exception as e:
+        if start is not None:
+            _record_call(time.perf_counter() - start, error=True)
+        print(f"❌ Claude error: {e}")
+        return ERROR_RESPONSE
+
+def stream_claude_response(user_input, memory=None, remember=True):
+    """
+    Stream the AI response from Claude as text deltas.
+
+    Lets TTS start on the first sentence while Claude is still writing the rest.
+    With a ConversationMemory, the exchange is added once the stream completes
+    (unless remember=False).
+    The first token has a deadline and a hedged duplicate request goes out
+    if it's slower than the recent p95; while Bedrock is failing, the
+    fallback answer is yielded instead.
+    Stops early (closing the Bedrock stream) if the turn is cancelled; an
+    interrupted answer isn't added to memory.
+    If the stream fails after text went out, raises IncompleteResponse so
+    the caller knows the answer is cut short (and not worth caching).
+    """
+    emitted = []
+    start = first_token = None
+    try:
+        llm_chain = get_chain()
+        if not llm_chain:
+            yield CONNECTION_ERROR_RESPONSE
+            return
+        
+        start = time.perf_counter()
+        try:
+            stream, head = bedrock_stream.call(
+                _open_stream, llm_chain, _inputs(user_input, memory), discard=lambda opened: opened[0].close()
+            )
+        except Cancelled:
+            return
+        except Unavailable as e:
+            _record_call(time.perf_counter() - start, error=True)
+            print(f"❌ Claude unavailable: {e}")
+            yield fallback_answer(user_input, bedrock_stream)
+            return
+        with closing(stream):
+            if head:
+                first_token = time.perf_counter() - start
+                emitted.append(head)
+                yield head
+            for chunk in stream:
+                if is_cancelled():
+                    break
+                text = _chunk_text(chunk)
+                if text:
+                    emitted.append(text)
+                    yield text
+        _record_call(time.perf_counter() - start, first_token)
+        if is_cancelled():
+            print("✋ Claude stream cancelled")
+            return
+        if emitted:
+            _remember_answer(user_input, "".join(emitted).strip())
+        if memory is not None and remember and emitted:
+            memory.add_turn(user_input, "".join(emitted).strip())
+        
     except Exception as e:
+        if start is not None:
+            _record_call(time.perf_counter() - start, first_token, error=True)
         print(f"❌ Claude error: {e}")
-        return "I'm sorry, I encountered an error while thinking about that."
+        if not emitted:
+            yield ERROR_RESPONSE
+        elif not is_cancelled():
+            raise IncompleteResponse(f"stream failed after {len(emitted)} chunks: {e}") from e
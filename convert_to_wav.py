@@ -1,7 +1,9 @@
-from pydub import AudioSegment
+from lazy_imports import lazy_import
+
+pydub = lazy_import("pydub", "pip install pydub")   # Only loaded when something is converted
 
 def convert_mp3_to_wav(mp3_path, wav_path):
-    sound = AudioSegment.from_mp3(mp3_path)
+    sound = pydub.AudioSegment.from_mp3(mp3_path)
     sound.export(wav_path, format="wav")
     print(f"Converted {mp3_path} → {wav_path}")
 
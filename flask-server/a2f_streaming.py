@@ -0,0 +1,148 @@
+# a2f_streaming.py
+#
+# Pushes audio to an Audio2Face *streaming* player over gRPC, so lip-sync can
+# start on the first TTS chunk instead of waiting for a finished WAV file.
+# The audio2face_pb2 / audio2face_pb2_grpc modules ship with Audio2Face
+# (exts/omni.audio2face.player/.../streaming_server); put that folder on
+# PYTHONPATH to enable this path. Without them the server falls back to the
+# regular file-based player.
+
+import contextvars
+import os
+import queue
+import threading
+
+import numpy as np
+
+from cancellation import CancellationToken, abort_on_cancel, cancel_scope, current_token
+
+A2F_GRPC_URL = os.getenv("A2F_GRPC_URL", "localhost:50051")
+
+
+def streaming_available() -> bool:
+    """True when grpc and the Audio2Face protobuf modules can be imported."""
+    try:
+        import grpc  # noqa: F401
+        import audio2face_pb2  # noqa: F401
+        import audio2face_pb2_grpc  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def push_audio_stream(chunks, instance_name: str, sample_rate: int, url: str = A2F_GRPC_URL,
+                      block_until_playback_is_finished: bool = False) -> bool:
+    """
+    Streams audio chunks to a streaming player as they're produced.
+
+    Parameters:
+    - chunks: iterable of AudioBuffer chunks (e.g. tts.synthesize_stream)
+    - instance_name: streaming player prim path from get_streaming_player_instances()
+    - sample_rate: rate of every chunk (A2F needs it up front)
+    - url: A2F gRPC endpoint
+
+    Returns:
+    - True if Audio2Face accepted the stream (False if the turn was cancelled mid-stream)
+    """
+    import grpc
+    import audio2face_pb2
+    import audio2face_pb2_grpc
+
+    # gRPC pulls requests on its own thread; read the chunks in our context so
+    # TTS sees this turn's cancellation token and trace
+    context = contextvars.copy_context()
+    token = current_token()
+    chunks = iter(chunks)
+
+    def requests_iter():
+        start = audio2face_pb2.PushAudioRequestStart(
+            samplerate=sample_rate,
+            instance_name=instance_name,
+            block_until_playback_is_finished=block_until_playback_is_finished
+        )
+        yield audio2face_pb2.PushAudioStreamRequest(start_marker=start)
+        while token is None or not token.cancelled:
+            chunk = context.run(next, chunks, None)
+            if chunk is None:
+                break
+            # A2F expects mono float32 samples
+            samples = chunk.to_mono().to_float32().samples.astype(np.float32, copy=False)
+            yield audio2face_pb2.PushAudioStreamRequest(audio_data=samples.tobytes())
+
+    with grpc.insecure_channel(url) as channel, abort_on_cancel(channel.close):
+        stub = audio2face_pb2_grpc.Audio2FaceStub(channel)
+        try:
+            response = stub.PushAudioStream(requests_iter())
+        except grpc.RpcError:
+            if token is not None and token.cancelled:
+                return False   # Closed by a barge-in
+            raise
+        if not response.success:
+            print(f"❌ A2F streaming push failed: {response.message}")
+        return response.success
+
+
+class BackgroundPush:
+    """
+    Runs a push (e.g. push_audio_stream) on its own thread, fed one chunk at a time.
+
+    The caller keeps producing audio (holding the network slot for Claude and
+    TTS) while the push waits for and holds the avatar, so neither stage holds
+    the other's slot while it waits. The thread runs in a copy of the
+    caller's context, so it sees the turn's trace, under `token`: a child of
+    the turn's token, so a barge-in stops the push and cancel() stops only it.
+
+    Parameters:
+    - push: fn(chunks) -> result, given an iterator over everything put()
+    """
+
+    def __init__(self, push):
+        turn = current_token()
+        self.token = turn.child() if turn is not None else CancellationToken()
+        self._chunks = queue.Queue()   # None marks the end
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+        threading.Thread(
+            target=contextvars.copy_context().run, args=(self._run, push), name="a2f-push", daemon=True
+        ).start()
+
+    @property
+    def done(self) -> bool:
+        """True once the push has returned (or failed), e.g. after a barge-in"""
+        return self._done.is_set()
+
+    def put(self, chunk) -> None:
+        self._chunks.put(chunk)
+
+    def close(self) -> None:
+        """No more chunks are coming"""
+        self._chunks.put(None)
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """Stops the push (closing the gRPC stream) without cancelling the turn"""
+        self.token.cancel(reason)
+        self.close()
+
+    def result(self):
+        """Waits for the push and returns its result (or raises its error)"""
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def _queued(self):
+        while True:
+            chunk = self._chunks.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    def _run(self, push) -> None:
+        try:
+            with cancel_scope(self.token):
+                self._result = push(self._queued())
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._done.set()
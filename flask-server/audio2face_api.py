@@ -1,63 +1,260 @@
 # audio2face_api.py
 
+import os
+import threading
+import time
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from tracing import record
+
+A2F_API_URL = os.getenv("A2F_API_URL", "http://localhost:8011")
+A2F_TIMEOUT = (3.05, 30)   # (connect, read) seconds; USD loads can take a while
+
+
+class Audio2FaceClient:
+    """
+    Keep-alive client for the Audio2Face REST API.
+
+    One pooled requests.Session is shared by every call, failed connections
+    are retried with backoff (POSTs only if they never reached A2F, so Play
+    or a track load is never sent twice), and the loaded USD scene, player list and each
+    player's root path are remembered so a conversation turn only sends the
+    calls that actually change something. Per-endpoint latency is kept for
+    /metrics. Call reset() if Audio2Face was restarted.
+    """
+
+    def __init__(self, base_url: str = A2F_API_URL, timeout=A2F_TIMEOUT,
+                 retries: int = 2, backoff: float = 0.2, pool_size: int = 4):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            # Read and status retries for GET only: a POST that got through (Play, Load, ...)
+            # may already have acted. Connect errors are retried for every method.
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._loaded_usd = None
+        self._players = None        # {"regular": [...], "streaming": [...]}
+        self._root_paths = {}       # player -> dir_path last set
+        self._latency = {}          # endpoint -> stats
+
+    # ─── Transport ───
+
+    def _request(self, method: str, endpoint: str, payload: dict | None = None) -> dict:
+        start = time.perf_counter()
+        ok = False
+        try:
+            resp = self.session.request(method, f"{self.base_url}{endpoint}", json=payload, timeout=self.timeout)
+            resp.raise_for_status()
+            ok = True
+            return resp.json()
+        finally:
+            self._record(endpoint, time.perf_counter() - start, ok)
+
+    def _post(self, endpoint: str, payload: dict) -> dict:
+        return self._request("POST", endpoint, payload)
+
+    def _get(self, endpoint: str) -> dict:
+        return self._request("GET", endpoint)
+
+    def _record(self, endpoint: str, elapsed: float, ok: bool) -> None:
+        record(f"a2f {endpoint}", elapsed, ok=ok)
+        with self._lock:
+            stats = self._latency.setdefault(
+                endpoint, {"calls": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0, "last_seconds": None}
+            )
+            stats["calls"] += 1
+            stats["errors"] += int(not ok)
+            stats["total_seconds"] += elapsed
+            stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+            stats["last_seconds"] = elapsed
+
+    def latency_stats(self) -> dict:
+        """Per-endpoint call counts and latencies"""
+        with self._lock:
+            snapshot = {endpoint: dict(stats) for endpoint, stats in self._latency.items()}
+        for stats in snapshot.values():
+            stats["avg_seconds"] = stats["total_seconds"] / stats["calls"]
+        return snapshot
+
+    def reset(self) -> None:
+        """Forget cached scene/player state (e.g. after Audio2Face restarts)"""
+        with self._lock:
+            self._loaded_usd = None
+            self._players = None
+            self._root_paths.clear()
+
+    # ─── Cached scene / player state ───
+
+    def ensure_scene(self, file_path: str) -> None:
+        """Loads the USD scene unless it's already the one loaded"""
+        if self._loaded_usd == file_path:
+            return
+        self.load_usd(file_path)
+        with self._lock:
+            self._loaded_usd = file_path
+            self._players = None
+            self._root_paths.clear()
+
+    def players(self, refresh: bool = False) -> dict:
+        """{"regular": [...], "streaming": [...]}, discovered once per scene"""
+        if self._players is None or refresh:
+            players = self._fetch_players()
+            with self._lock:
+                self._players = players
+        return self._players
+
+    def load_track(self, player: str, dir_path: str, file_name: str, time_range: list[int] | None = None) -> dict:
+        """Puts a WAV on a regular player without playing it: root path only when it changed, then track and range"""
+        time_range = time_range or [0, -1]
+        if self._root_paths.get(player) != dir_path:
+            self.set_root_path(dir_path, player)
+            with self._lock:
+                self._root_paths[player] = dir_path
+        self.set_track(file_name, player, time_range)
+        return self.set_range(player, time_range)
+
+    def play_file(self, player: str, dir_path: str, file_name: str, time_range: list[int] | None = None) -> dict:
+        """
+        Plays a WAV on a regular player: root path only when it changed,
+        then track, range and play.
+        """
+        self.load_track(player, dir_path, file_name, time_range)
+        return self.play_audio(player)
+
+    def _fetch_players(self) -> dict:
+        data = self._get("/A2F/Player/GetInstances")
+
+        # new API returns data["result"] = {"regular": [...], "streaming": [...]}
+        result = data.get("result", {})
+        if isinstance(result, dict):
+            return {"regular": result.get("regular", []), "streaming": result.get("streaming", [])}
+
+        # fallback: maybe it’s already a list
+        if isinstance(result, list):
+            return {"regular": result, "streaming": []}
+
+        return {"regular": [], "streaming": []}
+
+    # ─── Endpoints ───
+
+    def load_usd(self, file_path: str) -> dict:
+        return self._post("/A2F/USD/Load", {"file_name": file_path})
+
+    def get_player_instances(self) -> list[str]:
+        players = self._fetch_players()
+        return players["regular"] + players["streaming"]
+
+    def get_streaming_player_instances(self) -> list[str]:
+        return self._fetch_players()["streaming"]
+
+    def set_root_path(self, path: str, player: str) -> dict:
+        return self._post("/A2F/Player/SetRootPath", {"a2f_player": player, "dir_path": path})
+
+    def set_track(self, file_name: str, player: str, time_range: list[int] | None = None) -> dict:
+        payload = {"a2f_player": player, "file_name": file_name}
+        if time_range is not None:
+            payload["time_range"] = time_range
+        return self._post("/A2F/Player/SetTrack", payload)
+
+    def play_audio(self, player: str) -> dict:
+        return self._post("/A2F/Player/Play", {"a2f_player": player})
+
+    def pause_audio(self, player: str) -> dict:
+        return self._post("/A2F/Player/Pause", {"a2f_player": player})
+
+    def generate_emotion_keys(self, instance: str, window_size: int = 8, stride: int = 4,
+                              emotion_strength: float = 0.8) -> dict:
+        return self._post("/A2F/A2E/GenerateKeys", {
+            "a2f_instance": instance,
+            "a2e_window_size": window_size,
+            "a2e_stride": stride,
+            "a2e_emotion_strength": emotion_strength
+        })
+
+    def export_geometry_cache(self, meshes: list[str], export_directory: str, file_name: str,
+                              cache_type: str = "usd", xform_keys: bool = True, batch: bool = False,
+                              fps: int = 24) -> dict:
+        return self._post("/A2F/Exporter/ExportGeometryCache", {
+            "meshes": meshes,
+            "export_directory": export_directory,
+            "file_name": file_name,
+            "cache_type": cache_type,
+            "xform_keys": xform_keys,
+            "batch": batch,
+            "fps": fps
+        })
+
+    def get_root_path(self, player: str) -> dict:
+        return self._post("/A2F/Player/GetRootPath", {"a2f_player": player})
+
+    def get_tracks(self, player: str) -> dict:
+        return self._post("/A2F/Player/GetTracks", {"a2f_player": player})
+
+    def get_current_track(self, player: str) -> dict:
+        return self._post("/A2F/Player/GetCurrentTrack", {"a2f_player": player})
+
+    def get_time(self, player: str) -> dict:
+        return self._post("/A2F/Player/GetTime", {"a2f_player": player})
+
+    def set_range(self, player: str, time_range: list[int]) -> dict:
+        return self._post("/A2F/Player/SetRange", {"a2f_player": player, "time_range": time_range})
+
+    def get_range(self, player: str) -> dict:
+        return self._post("/A2F/Player/GetRange", {"a2f_player": player})
+
+
+# Shared client behind the module-level helpers below
+default_client = Audio2FaceClient()
 
-A2F_API_URL = "http://localhost:8011"
 
 def load_usd(file_path: str) -> dict:
-    url = f"{A2F_API_URL}/A2F/USD/Load"
-    resp = requests.post(url, json={"file_name": file_path})
-    resp.raise_for_status()
-    return resp.json()
+    return default_client.load_usd(file_path)
 
 def get_player_instances() -> list[str]:
     """
     GET /A2F/Player/GetInstances
     Returns a flat list of all audio-player prim paths in the stage.
     """
-    url = f"{A2F_API_URL}/A2F/Player/GetInstances"
-    resp = requests.get(url)
-    resp.raise_for_status()
-    data = resp.json()
-
-    # new API returns data["result"] = {"regular": [...], "streaming": [...]}
-    result = data.get("result", {})
-    if isinstance(result, dict):
-        regular   = result.get("regular", [])
-        streaming = result.get("streaming", [])
-        return regular + streaming
+    return default_client.get_player_instances()
 
-    # fallback: maybe it’s already a list
-    if isinstance(result, list):
-        return result
 
-    return []
+def get_streaming_player_instances() -> list[str]:
+    """
+    Just the streaming audio players, which accept audio pushed over gRPC
+    (see a2f_streaming.py) instead of loading a WAV from disk.
+    """
+    return default_client.get_streaming_player_instances()
 
 
 def set_root_path(path: str, player: str) -> dict:
-    url = f"{A2F_API_URL}/A2F/Player/SetRootPath"
-    resp = requests.post(url, json={"a2f_player": player, "dir_path": path})
-    resp.raise_for_status()
-    return resp.json()
+    return default_client.set_root_path(path, player)
 
 def set_track(
     file_name: str,
     player: str,
     time_range: list[int] | None = None
 ) -> dict:
-    url = f"{A2F_API_URL}/A2F/Player/SetTrack"
-    payload = {"a2f_player": player, "file_name": file_name}
-    if time_range is not None:
-        payload["time_range"] = time_range
-    resp = requests.post(url, json=payload)
-    resp.raise_for_status()
-    return resp.json()
+    return default_client.set_track(file_name, player, time_range)
 
 def play_audio(player: str) -> dict:
-    url = f"{A2F_API_URL}/A2F/Player/Play"
-    resp = requests.post(url, json={"a2f_player": player})
-    resp.raise_for_status()
-    return resp.json()
+    return default_client.play_audio(player)
+
+def pause_audio(player: str) -> dict:
+    """Stops the player mid-track (barge-in)"""
+    return default_client.pause_audio(player)
 
 def generate_emotion_keys(
     instance: str,
@@ -65,16 +262,7 @@ def generate_emotion_keys(
     stride: int = 4,
     emotion_strength: float = 0.8
 ) -> dict:
-    url = f"{A2F_API_URL}/A2F/A2E/GenerateKeys"
-    payload = {
-        "a2f_instance": instance,
-        "a2e_window_size": window_size,
-        "a2e_stride": stride,
-        "a2e_emotion_strength": emotion_strength
-    }
-    resp = requests.post(url, json=payload)
-    resp.raise_for_status()
-    return resp.json()
+    return default_client.generate_emotion_keys(instance, window_size, stride, emotion_strength)
 
 def export_geometry_cache(
     meshes: list[str],
@@ -85,43 +273,21 @@ def export_geometry_cache(
     batch: bool = False,
     fps: int = 24
 ) -> dict:
-    url = f"{A2F_API_URL}/A2F/Exporter/ExportGeometryCache"
-    payload = {
-        "meshes": meshes,
-        "export_directory": export_directory,
-        "file_name": file_name,
-        "cache_type": cache_type,
-        "xform_keys": xform_keys,
-        "batch": batch,
-        "fps": fps
-    }
-    resp = requests.post(url, json=payload)
-    resp.raise_for_status()
-    return resp.json()
+    return default_client.export_geometry_cache(
+        meshes, export_directory, file_name, cache_type, xform_keys, batch, fps
+    )
 
 def get_root_path(player: str) -> dict:
-    url = f"{A2F_API_URL}/A2F/Player/GetRootPath"
-    resp = requests.post(url, json={"a2f_player": player})
-    resp.raise_for_status()
-    return resp.json()
+    return default_client.get_root_path(player)
 
 def get_tracks(player: str) -> dict:
-    url = f"{A2F_API_URL}/A2F/Player/GetTracks"
-    resp = requests.post(url, json={"a2f_player": player})
-    resp.raise_for_status()
-    return resp.json()
+    return default_client.get_tracks(player)
 
 def get_current_track(player: str) -> dict:
-    url = f"{A2F_API_URL}/A2F/Player/GetCurrentTrack"
-    resp = requests.post(url, json={"a2f_player": player})
-    resp.raise_for_status()
-    return resp.json()
+    return default_client.get_current_track(player)
 
 def get_time(player: str) -> dict:
-    url = f"{A2F_API_URL}/A2F/Player/GetTime"
-    resp = requests.post(url, json={"a2f_player": player})
-    resp.raise_for_status()
-    return resp.json()
+    return default_client.get_time(player)
 
 # ─── NEW: explicitly set & get play range ───
 
@@ -130,18 +296,11 @@ def set_range(player: str, time_range: list[int]) -> dict:
     POST /A2F/Player/SetRange
     Body: { "a2f_player": "<player>", "time_range": [start, end] }
     """
-    url = f"{A2F_API_URL}/A2F/Player/SetRange"
-    payload = {"a2f_player": player, "time_range": time_range}
-    resp = requests.post(url, json=payload)
-    resp.raise_for_status()
-    return resp.json()
+    return default_client.set_range(player, time_range)
 
 def get_range(player: str) -> dict:
     """
     POST /A2F/Player/GetRange
     Body: { "a2f_player": "<player>" }
     """
-    url = f"{A2F_API_URL}/A2F/Player/GetRange"
-    resp = requests.post(url, json={"a2f_player": player})
-    resp.raise_for_status()
-    return resp.json()
+    return default_client.get_range(player)
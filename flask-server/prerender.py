@@ -0,0 +1,222 @@
+"""
+Render canned phrases (greetings, idle lines, FAQ answers) ahead of time.
+
+    python flask-server/prerender.py flask-server/prerender_manifest.json
+    python flask-server/prerender.py manifest.json --library output/assets --workers 4 --force
+
+For every phrase in the manifest: ElevenLabs speech (prepared for A2F and
+saved as a WAV), Audio2Face emotion keys for it, and a geometry cache
+export, all stored in the asset library (asset_library.AssetLibrary) with
+an index the server reads. At runtime a matching FAQ question or response
+then plays straight from the library, with no Claude call, no TTS and no
+WAV to write.
+
+The manifest is JSON:
+
+    {"a2f": {"usd": "...", "rigs": [{"player": "...", "instance": "..."}], "meshes": ["..."]},
+     "phrases": [{"id": "hours", "kind": "faq", "text": "We're open 9 to 5.",
+                  "questions": ["When are you open?"]}]}
+
+Speech is synthesized by `--workers` threads at once. A2F steps hold a rig
+(a player and its A2F instance) for the whole set-track → keys → export
+sequence, so they run one per rig. Phrases already in the library with the
+same text and voice are skipped, so an interrupted run can simply be
+started again.
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(HERE, "..")))
+
+import audio2face_api as a2f
+from asset_library import AssetLibrary
+from audio_preprocess import prepare_for_a2f
+from tts import synthesize_to_buffer, TTS_MODEL_ID, VOICE_ID
+
+DEFAULT_LIBRARY = os.getenv("ASSET_LIBRARY_DIR", os.path.join(HERE, "output", "assets"))
+A2F_INSTANCE = os.getenv("A2F_INSTANCE", "/World/audio2face/CoreFullface")
+A2F_EXPORT_MESHES = os.getenv("A2F_EXPORT_MESHES", "/World/audio2face/CoreFullface/mesh").split(",")
+
+# Geometry cache + emotion settings unless the manifest's "a2f" section says otherwise
+DEFAULT_A2F_SETTINGS = {
+    "usd": None,
+    "rigs": None,          # Default: the scene's first regular player with A2F_INSTANCE
+    "meshes": A2F_EXPORT_MESHES,
+    "cache_type": "usd",
+    "fps": 30,
+    "emotion_strength": 0.8,
+}
+
+
+def load_manifest(path: str) -> tuple[list[dict], dict]:
+    """
+    Phrases and A2F settings from a manifest.
+
+    Returns:
+    - (phrases, a2f settings); every phrase has "id", "text", "kind" and "questions"
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    phrases = []
+    for i, phrase in enumerate(manifest.get("phrases", [])):
+        if not phrase.get("text", "").strip():
+            raise ValueError(f"Phrase {i} in {path} has no text")
+        phrases.append({
+            "id": phrase.get("id", f"phrase-{i}"),
+            "text": phrase["text"].strip(),
+            "kind": phrase.get("kind", "phrase"),
+            "questions": list(phrase.get("questions", [])),
+        })
+    return phrases, {**DEFAULT_A2F_SETTINGS, **manifest.get("a2f", {})}
+
+
+def _ok(result: dict, what: str) -> dict:
+    # A2F answers HTTP 200 with {"status": "ERROR"} when a step fails
+    if result.get("status") != "OK":
+        raise RuntimeError(f"{what} failed: {result.get('message') or result}")
+    return result
+
+
+def render_phrase(phrase: dict, library: AssetLibrary, rigs: queue.Queue, settings: dict,
+                  client: a2f.Audio2FaceClient) -> dict:
+    """
+    TTS → emotion keys → geometry cache for one phrase, added to the library.
+
+    Returns:
+    - the new library entry plus per-step timings (or {"id", "error"})
+    """
+    key = library.key(phrase["text"], voice=VOICE_ID, tts_model=TTS_MODEL_ID)
+    wav_name = f"{key}.wav"
+    start = time.perf_counter()
+    try:
+        speech = synthesize_to_buffer(phrase["text"], fallback=False)
+        if speech is None:
+            raise RuntimeError("ElevenLabs returned no audio")
+        speech = prepare_for_a2f(speech)
+        speech.write_wav(library.path(wav_name))
+        tts_seconds = time.perf_counter() - start
+
+        rig = rigs.get()   # Waits for a free player / instance
+        a2f_start = time.perf_counter()
+        try:
+            _ok(client.load_track(rig["player"], library.directory, wav_name), "Loading the track")
+            _ok(client.generate_emotion_keys(rig["instance"], emotion_strength=settings["emotion_strength"]),
+                "Emotion key generation")
+            _ok(client.export_geometry_cache(
+                settings["meshes"], library.directory, key, cache_type=settings["cache_type"], fps=settings["fps"]
+            ), "Geometry cache export")
+        finally:
+            rigs.put(rig)
+        a2f_seconds = time.perf_counter() - a2f_start
+    except Exception as e:
+        return {"id": phrase["id"], "error": f"{type(e).__name__}: {e}"}
+
+    entry = {
+        "key": key,
+        "id": phrase["id"],
+        "kind": phrase["kind"],
+        "text": phrase["text"],
+        "questions": phrase["questions"],
+        "wav": wav_name,
+        "duration": round(speech.duration, 3),
+        "geometry_cache": f"{key}.{settings['cache_type']}",
+        "emotion_keys": True,
+        "fps": settings["fps"],
+        "voice": VOICE_ID,
+        "tts_model": TTS_MODEL_ID,
+        "rendered_at": time.time(),
+    }
+    library.put(entry)
+    return {**entry, "tts_seconds": round(tts_seconds, 3), "a2f_seconds": round(a2f_seconds, 3)}
+
+
+def find_rigs(settings: dict, client: a2f.Audio2FaceClient) -> list[dict]:
+    """Players (with their A2F instance) the job may render on"""
+    if settings["usd"]:
+        client.ensure_scene(settings["usd"])
+    if settings["rigs"]:
+        return list(settings["rigs"])
+    players = client.players(refresh=True)["regular"]
+    return [{"player": players[0], "instance": A2F_INSTANCE}] if players else []
+
+
+def run_prerender(phrases: list[dict], library: AssetLibrary, settings: dict, workers: int = 3,
+                  force: bool = False, client: a2f.Audio2FaceClient | None = None) -> dict:
+    """
+    Renders every phrase not yet in the library.
+
+    Parameters:
+    - phrases / settings: from load_manifest()
+    - library: where the results go
+    - workers: concurrent ElevenLabs requests (A2F work is bounded by the number of rigs)
+    - force: render phrases again even if the library already has them
+
+    Returns:
+    - summary counts and timings
+    """
+    client = client or a2f.default_client
+    todo = []
+    for phrase in phrases:
+        entry = library.get(library.key(phrase["text"], voice=VOICE_ID, tts_model=TTS_MODEL_ID))
+        if force or entry is None or not os.path.exists(library.path(entry["wav"])):
+            todo.append(phrase)
+    print(f"{len(phrases)} phrases, {len(phrases) - len(todo)} already rendered, {len(todo)} to go")
+
+    summary = {"phrases": len(todo), "skipped": len(phrases) - len(todo), "failed": 0, "audio_seconds": 0.0}
+    start = time.perf_counter()
+    if todo:
+        rigs = queue.Queue()
+        for rig in find_rigs(settings, client):
+            rigs.put(rig)
+        if rigs.empty():
+            raise RuntimeError("No Audio2Face player to render on")
+        print(f"Rendering on {rigs.qsize()} A2F rig(s) with {workers} TTS workers...")
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prerender") as executor:
+            futures = [executor.submit(render_phrase, phrase, library, rigs, settings, client) for phrase in todo]
+            for finished, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                if "error" in result:
+                    summary["failed"] += 1
+                    print(f"[{finished}/{len(todo)}] {result['id']} failed: {result['error']}")
+                else:
+                    summary["audio_seconds"] += result["duration"]
+                    print(f"[{finished}/{len(todo)}] {result['id']} {result['duration']:.1f}s "
+                          f"(TTS {result['tts_seconds']:.2f}s, A2F {result['a2f_seconds']:.2f}s)")
+
+    summary["wall_seconds"] = time.perf_counter() - start
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-render canned phrases into the Audio2Face asset library")
+    parser.add_argument("manifest", help="JSON manifest of phrases (see the module docstring)")
+    parser.add_argument("--library", default=DEFAULT_LIBRARY, help="asset library directory")
+    parser.add_argument("--workers", type=int, default=3, help="concurrent ElevenLabs requests")
+    parser.add_argument("--force", action="store_true", help="render phrases that are already in the library")
+    args = parser.parse_args(argv)
+
+    phrases, settings = load_manifest(args.manifest)
+    if not phrases:
+        print(f"No phrases in {args.manifest}")
+        return 1
+
+    library = AssetLibrary(os.path.abspath(args.library))
+    summary = run_prerender(phrases, library, settings, args.workers, args.force)
+
+    print(f"Done: {summary['phrases'] - summary['failed']} rendered, {summary['failed']} failed, "
+          f"{summary['skipped']} skipped in {summary['wall_seconds']:.1f}s "
+          f"({summary['audio_seconds']:.1f}s of speech)")
+    print(f"Library in {library.directory} ({library.stats()['entries']} phrases)")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
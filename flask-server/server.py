@@ -1,25 +1,41 @@
 import os
 import sys
-import time
+import json
+import queue
 import threading
+import time
+import wave
 from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
-import cv2
-import numpy as np
-import mss
 
 # Allow imports from parent folder
 HERE = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, os.path.abspath(os.path.join(HERE, "..")))
 
 # Import your existing modules
-from recorder import record_audio
-from transcriber import transcribe_audio
-from tts import synthesize_speech
+from recorder import capture_buffer, stream_audio, get_device, EnergyEndpointer
+from transcriber import transcribe_audio, warm_up as warm_up_whisper, get_model_metrics, StreamingTranscriber, save_transcript
+from tts import synthesize_to_buffer, synthesize_stream, TTS_SAMPLE_RATE, TTS_MODEL_ID, VOICE_ID
 import audio2face_api as a2f
+import a2f_streaming
 
 # Import Claude integration
-from claude_integration import get_claude_response
+from claude_integration import get_claude_response, stream_claude_response, get_llm_metrics
+from claude_integration import MODEL_ID as CLAUDE_MODEL_ID, FALLBACK_RESPONSES
+from claude_integration import warm_up as warm_up_claude
+from claude_integration import get_memory, forget_conversation, get_memory_metrics
+from speech_pipeline import SentencePipeline, split_sentences
+from audio_buffer import AudioBuffer
+from audio_preprocess import prepare_for_a2f
+from response_cache import ResponseCache
+from asset_library import AssetLibrary
+from sessions import SessionManager
+from cancellation import Cancelled, cancel_scope, check_cancelled, count, current_token, get_cancellation_metrics, record_stopped
+from speculation import SpeculativeResponder, get_speculation_metrics
+from resilience import get_resilience_metrics
+from viewport_stream import FrameBroadcaster, ViewportCapture, ScreenSource
+from tracing import trace, span, get_trace_metrics
+from warmup import WarmUp
 
 app = Flask(__name__)
 CORS(app, origins="*")
@@ -27,11 +43,24 @@ CORS(app, origins="*")
 # Output directory for all audio files
 OUTPUT_DIR = os.path.join(HERE, "output")
 os.makedirs(OUTPUT_DIR, exist_ok=True)
-REC_WAV = os.path.join(OUTPUT_DIR, "mic_input.wav")
-TTS_WAV = os.path.join(OUTPUT_DIR, "tts_output.wav")
+A2F_USD = r"C:\Users\Devan\Desktop\Working Face.usd"
+
+# Pooled keep-alive A2F client; caches the loaded scene and player list
+a2f_client = a2f.default_client
+
+# Answers + speech for repeat questions (memory LRU backed by a size-capped disk cache)
+response_cache = ResponseCache(
+    os.getenv("RESPONSE_CACHE_DIR", os.path.join(OUTPUT_DIR, "response_cache")),
+    max_disk_bytes=int(os.getenv("RESPONSE_CACHE_MB", "200")) * 1024 * 1024
+)
 
-# Global state for real-time updates
-pipeline_state = {
+# Greetings, FAQ answers and canned replies rendered offline by prerender.py
+asset_library = AssetLibrary(
+    os.getenv("ASSET_LIBRARY_DIR", os.path.join(OUTPUT_DIR, "assets")), voice=VOICE_ID
+)
+
+# Progress reported before any conversation has started
+IDLE_STATE = {
     "current_step": 0,
     "status": "idle",
     "transcript": "",
@@ -40,9 +69,41 @@ pipeline_state = {
     "stream_active": False
 }
 
-# Video streaming globals
-streaming_active = False
-current_frame = None
+# Comment line sent on idle SSE streams so proxies keep them open
+SSE_KEEPALIVE_SECONDS = 15
+
+# Each open SSE stream holds a Flask worker thread, so there are only this many at once and
+# each lasts this long; past either limit the client polls /jobs/<id> instead
+SSE_MAX_SUBSCRIBERS = int(os.getenv("SSE_MAX_SUBSCRIBERS", "8"))
+SSE_MAX_SECONDS = float(os.getenv("SSE_MAX_SECONDS", "60"))
+sse_subscribers = threading.BoundedSemaphore(SSE_MAX_SUBSCRIBERS)
+
+# Speculative Claude calls on stable partial transcripts (per-request "speculative" overrides)
+SPECULATIVE_LLM = os.getenv("SPECULATIVE_LLM", "0") == "1"
+SPECULATION_STABLE_SECONDS = float(os.getenv("SPECULATION_STABLE_SECONDS", "0.6"))
+
+def session_wav(session_id):
+    """Per-session TTS file, so concurrent conversations don't overwrite each other"""
+    return os.path.join(OUTPUT_DIR, f"tts_{session_id}.wav")
+
+def remove_session_wav(session):
+    try:
+        os.remove(session_wav(session.id))
+    except OSError:
+        pass
+
+# Per-conversation state + bounded worker pool (GPU/mic/avatar serialized, network parallel)
+sessions = SessionManager(
+    max_workers=int(os.getenv("SESSION_WORKERS", "4")),
+    on_evict=remove_session_wav
+)
+
+# One mic stream for the server's lifetime, with pre-roll so the first syllable isn't clipped
+microphone = get_device()
+microphone.preroll_seconds = float(os.getenv("MIC_PREROLL_SECONDS", "0.5"))
+
+# Where recordings come from (benchmarks swap in a recorder.WavFileSource factory)
+audio_source = microphone.source
 
 # Audio2Face capture coordinates
 AUDIO2FACE_COORDS = {
@@ -52,206 +113,696 @@ AUDIO2FACE_COORDS = {
     "height": 600
 }
 
-def send_progress_update(step, status, data=None):
-    """Send real-time progress updates"""
-    pipeline_state["current_step"] = step
-    pipeline_state["status"] = status
-    if data:
-        pipeline_state.update(data)
-    print(f"📡 Progress Update: Step {step} - {status}")
-
-def capture_audio2face_viewport():
-    """Capture Audio2Face viewport"""
-    global streaming_active, current_frame
-    
-    with mss.mss() as sct:
-        while streaming_active:
-            try:
-                monitor = AUDIO2FACE_COORDS.copy()
-                screenshot = sct.grab(monitor)
-                frame = np.array(screenshot)
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2RGB)
-                frame = cv2.resize(frame, (640, 480))
-                
-                _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
-                current_frame = buffer.tobytes()
-                
-                time.sleep(0.033)  # ~30 FPS
-                
-            except Exception as e:
-                print(f"❌ Screen capture error: {e}")
-                time.sleep(1)
+# Grab → convert → encode producer; skips idle frames and degrades quality if it falls behind
+viewport_capture = ViewportCapture(
+    ScreenSource(AUDIO2FACE_COORDS),
+    profile=os.getenv("CAPTURE_PROFILE", "high")
+)
 
-@app.route("/record_and_speak", methods=["POST"])
-def record_and_speak():
+# One capture thread at most, shared by all viewers
+viewport = FrameBroadcaster(viewport_capture)
+
+def warm_up_avatar():
+    """Loads the USD scene and discovers its players before the first conversation"""
+    a2f_client.ensure_scene(A2F_USD)
+    a2f_client.players(refresh=True)
+
+# Restart on code changes (dev); FLASK_RELOADER=0 serves from a single process
+FLASK_RELOADER = os.getenv("FLASK_RELOADER", "1") == "1"
+
+# Cold-start work (Whisper load + CUDA init, Bedrock handshake, USD load) paid before traffic arrives
+warmup = WarmUp(retry_seconds=float(os.getenv("WARMUP_RETRY_SECONDS", "30")))
+warmup.add("whisper", warm_up_whisper)
+warmup.add("claude", warm_up_claude)
+warmup.add("audio2face", warm_up_avatar)
+# Not required: on a box without a mic the server still serves everything else
+warmup.add("microphone", microphone.start, required=False)
+
+def barge_in(session):
+    """The visitor started talking again: stop every earlier turn of this conversation"""
+    if not session.options["barge_in"]:
+        return
+    for interrupted in sessions.interrupt(session.options["conversation_id"], "barge-in", exclude=session):
+        print(f"✋ [{session.id}] Barge-in, cancelling {interrupted.id}")
+
+def stop_speaking_on_cancel(session, player, token=None):
+    """Pauses the avatar if this session (or `token`) is cancelled while its answer is still playing"""
+    def stop():
+        if not session.speaking:
+            return
+        count("unplayed_audio_seconds", session.speaking_until - time.time())
+        session.speaking_until = time.time()
+        try:
+            a2f_client.pause_audio(player)
+        except Exception as e:
+            print(f"⚠️ Couldn't pause {player}: {e}")
+    (token or session.token).on_cancel(stop)
+
+def cache_response(key, text, audio):
+    """Cache an answer and its speech, unless it's one of the canned error replies"""
+    if not text or text in FALLBACK_RESPONSES:
+        return
+    try:
+        response_cache.put(key, text, audio)
+    except Exception as e:
+        print(f"⚠️ Couldn't cache response: {e}")
+
+def load_asset(asset):
+    """An asset's speech, or None if its WAV is missing or unreadable (the caller then goes live)"""
+    if asset is None:
+        return None
+    try:
+        return asset_library.audio(asset)
+    except (OSError, EOFError, ValueError, wave.Error) as e:
+        print(f"⚠️ Couldn't load pre-rendered '{asset.get('id', asset['key'])}', answering live: {e}")
+        return None
+
+def synthesize_sentence(text):
+    """Pre-rendered speech for a known phrase, otherwise ElevenLabs"""
+    audio = load_asset(asset_library.find_response(text))
+    return audio if audio is not None else synthesize_to_buffer(text)
+
+def find_streaming_player():
+    """First A2F streaming player in the scene, or None if we can't stream audio"""
+    if not a2f_streaming.streaming_available():
+        return None
+    try:
+        a2f_client.ensure_scene(A2F_USD)
+        players = a2f_client.players()["streaming"]
+    except Exception as a2f_error:
+        print(f"⚠️ Audio2Face streaming unavailable: {a2f_error}")
+        a2f_client.reset()
+        return None
+    return players[0] if players else None
+
+def parse_options(data):
+    """Pipeline options from a request body (raises ValueError if they're invalid)"""
+    duration = float(data.get("duration", 5.0))
+    if not (0.5 <= duration <= 30):
+        raise ValueError("Duration must be between 0.5-30 seconds")
+    return {
+        "duration": duration,
+        # With endpointing on, duration is just the longest we'll listen for
+        "endpointing": bool(data.get("endpointing", True)),
+        # Streaming STT transcribes while we record instead of after
+        "streaming_stt": bool(data.get("streaming_stt", True)),
+        # Streaming TTS pushes audio to an A2F streaming player as it downloads
+        "streaming_tts": bool(data.get("streaming_tts", True)),
+        # Pipelined mode sends each sentence to TTS while Claude is still writing
+        "pipelined": bool(data.get("pipelined", True)),
+        # Answer repeat questions from the response cache
+        "use_cache": bool(data.get("use_cache", True)),
+        # Calls with the same conversation_id share memory of earlier turns
+        "conversation_id": str(data.get("conversation_id", "default")),
+        "memory": bool(data.get("memory", True)),
+        # New speech cancels whatever earlier turns of the conversation are still doing
+        "barge_in": bool(data.get("barge_in", True)),
+        # Start Claude on the partial transcript once it stops changing (streaming STT only)
+        "speculative": bool(data.get("speculative", SPECULATIVE_LLM)),
+        "speculation_stable_seconds": float(data.get("speculation_stable_seconds", SPECULATION_STABLE_SECONDS)),
+        # Play phrases from the pre-rendered asset library when the question or answer matches
+        "prerendered": bool(data.get("prerendered", True)),
+    }
+
+def run_conversation(session):
     """
     Enhanced AI pipeline: Record → Transcribe → Claude AI → TTS → Audio2Face
+
+    Runs on the session pool; every stage waits for its slot (mic, gpu,
+    network, avatar), so concurrent sessions overlap instead of colliding.
+    The whole run is one trace (logged as JSON, percentiles in /metrics).
+    A barge-in cancels session.token; the turn then stops wherever it is
+    and returns 409 with "cancelled": true.
+    Returns (response body, HTTP status).
     """
-    global streaming_active
+    with trace("conversation", session_id=session.id, **session.options) as root, cancel_scope(session.token):
+        try:
+            body, status = _run_conversation(session)
+            check_cancelled()
+        except Cancelled as e:
+            print(f"✋ [{session.id}] Cancelled ({e.reason}) at step {session.state['current_step']}")
+            session.update(session.state["current_step"], "cancelled")
+            record_stopped(session.token)
+            body, status = {
+                "success": False,
+                "session_id": session.id,
+                "cancelled": True,
+                "reason": e.reason
+            }, 409
+        root.set(status=status, cached=body.get("cached", False), prerendered=body.get("prerendered", False),
+                 cancelled=body.get("cancelled", False))
+    return body, status
+
+def _run_conversation(session):
+    opts = session.options
+    duration = opts["duration"]
+    progress = session.update
+    tts_wav = session_wav(session.id)
+
+    def failed(step, error, status=500):
+        progress(step, "error", {"error": error})
+        return {"error": error, "session_id": session.id}, status
+
+    print(f"🎤 [{session.id}] Starting {duration}s recording...")
+    progress(1, "recording")
+    memory = get_memory(opts["conversation_id"]) if opts["memory"] else None
+    speculator = None
     
-    try:
-        data = request.get_json() or {}
-        duration = float(data.get("duration", 5.0))
-        
-        if not (0.5 <= duration <= 30):
-            return jsonify({"error": "Duration must be between 0.5-30 seconds"}), 400
-
-        # Reset state
-        pipeline_state.update({
-            "current_step": 0,
-            "status": "starting",
-            "transcript": "",
-            "claude_response": "",
-            "error": None,
-            "stream_active": False
-        })
-
-        print(f"🎤 Starting {duration}s recording...")
-        send_progress_update(1, "recording")
-        
-        # Step 1: Record from microphone
-        record_audio(REC_WAV, duration)
+    # Steps 1+2 overlapped: Whisper decodes the mic stream while we're still recording
+    if opts["streaming_stt"]:
+        if opts["speculative"]:
+            # Guesses don't go into memory until the final transcript confirms them
+            speculator = SpeculativeResponder(
+                lambda text: stream_claude_response(text, memory, remember=False),
+                on_commit=memory.add_turn if memory is not None else None,
+                stable_seconds=opts["speculation_stable_seconds"]
+            )
+
+        def on_partial(text):
+            progress(1, "recording", {"transcript": text})
+            if speculator is not None:
+                speculator.update(text)
+
+        with sessions.stage("mic", session), span("record", streaming_stt=True):
+            source = audio_source()
+            endpointer = EnergyEndpointer(
+                rate=source.rate, on_speech_start=lambda: barge_in(session)
+            ) if opts["endpointing"] else None
+            if endpointer is None:
+                barge_in(session)
+            stt = StreamingTranscriber(
+                source.rate, source.channels,
+                on_partial=on_partial,
+                decode_lock=sessions.slot("gpu")
+            )
+            for chunk in stream_audio(source, duration, endpointer):
+                stt.feed(chunk)
+        duration = round(stt.audio_seconds, 2)
+        print("✅ Recording complete")
+        progress(1, "complete")
+
+        print("🔤 Finalizing transcript...")
+        progress(2, "processing")
+        with span("transcribe", streaming_stt=True):
+            user_text = stt.finish().strip()
+        save_transcript(user_text)
+        print(f"⏱️ Final transcript {stt.final_latency:.2f}s after speech ended")
+    else:
+        # Step 1: Record from microphone into memory (stops early once the user stops talking)
+        with sessions.stage("mic", session), span("record"):
+            source = audio_source()
+            endpointer = EnergyEndpointer(
+                rate=source.rate, on_speech_start=lambda: barge_in(session)
+            ) if opts["endpointing"] else None
+            if endpointer is None:
+                barge_in(session)
+            recording = capture_buffer(duration, source, endpointer=endpointer)
+        duration = round(recording.duration, 2)
         print("✅ Recording complete")
-        send_progress_update(1, "complete")
+        progress(1, "complete")
 
         # Step 2: Transcribe the recorded audio
         print("🔤 Transcribing audio...")
-        send_progress_update(2, "processing")
-        user_text = transcribe_audio(REC_WAV).strip()
-        
-        if not user_text:
-            pipeline_state["error"] = "Transcription failed - no text detected"
-            return jsonify({"error": "Transcription failed - no text detected"}), 500
-        
-        print(f"✅ User said: '{user_text}'")
-        send_progress_update(2, "complete", {"transcript": user_text})
+        progress(2, "processing")
+        with sessions.stage("gpu", session), span("transcribe"):
+            user_text = transcribe_audio(recording).strip()
+    
+    check_cancelled()
+    if not user_text:
+        if speculator is not None:
+            speculator.close()
+        return failed(2, "Transcription failed - no text detected")
+    
+    print(f"✅ User said: '{user_text}'")
+    progress(2, "complete", {"transcript": user_text})
 
-        # Step 3: Get Claude AI response
-        print("🤖 Getting Claude AI response...")
-        send_progress_update(3, "thinking")
-        claude_response = get_claude_response(user_text)
-        
-        if not claude_response:
-            claude_response = "I'm sorry, I didn't understand that."
-        
-        print(f"✅ Claude responds: '{claude_response}'")
-        send_progress_update(3, "complete", {"claude_response": claude_response})
-
-        # Step 4: Generate TTS from Claude's response (not user's text!)
-        print("🗣️ Generating TTS for Claude's response...")
-        send_progress_update(4, "generating")
-        synthesize_speech(claude_response, TTS_WAV)  # Use Claude's response
-        print("✅ TTS generation complete")
-        send_progress_update(4, "complete")
-
-        # Step 5: Audio2Face lip-sync animation
-        print("🎭 Starting Audio2Face animation...")
-        send_progress_update(5, "animating")
-        
+    # Look for an A2F streaming player up front so audio can flow to it as it's made
+    streaming_player = find_streaming_player() if opts["streaming_tts"] else None
+
+    # Repeat questions skip Claude and ElevenLabs entirely
+    cache_key = response_cache.key(
+        user_text, voice=VOICE_ID, tts_model=TTS_MODEL_ID, llm_model=CLAUDE_MODEL_ID
+    )
+    # Keyed on the question alone, so only an opening question may be answered (or cached)
+    # without Claude; a follow-up like "and the other one?" depends on the earlier turns
+    context_free = memory is None or memory.is_empty()
+    use_cache = opts["use_cache"] and context_free
+    # FAQ questions rendered offline skip Claude, TTS and the WAV write altogether
+    asset = asset_library.find_question(user_text) if opts["prerendered"] and context_free else None
+    with span("cache.lookup") as lookup:
+        asset_audio = load_asset(asset)
+        if asset_audio is not None:
+            cached = (asset["text"], asset_audio)
+        else:
+            asset = None
+            cached = response_cache.get(cache_key) if use_cache else None
+        lookup.set(hit=bool(cached), prerendered=asset is not None, context_free=context_free)
+
+    # Step 3: Get Claude AI response
+    print("🤖 Getting Claude AI response...")
+    progress(3, "thinking")
+
+    # A speculative call on the same words is already answering; otherwise it's cancelled here
+    speculation = None
+    if speculator is not None:
+        if cached:
+            speculator.close()
+        else:
+            speculation = speculator.resolve(user_text)
+
+    with sessions.stage("network", session):
+        if cached:
+            claude_response, cached_audio = cached
+            print(f"⚡ {'Pre-rendered' if asset else 'Cache hit, reusing'} answer: '{claude_response}'")
+            if memory is not None:
+                memory.add_turn(user_text, claude_response)
+            progress(3, "complete", {"claude_response": claude_response})
+            audio_chunks = iter([cached_audio])
+        elif opts["pipelined"]:
+            # Steps 3+4 overlapped: each finished sentence goes to TTS while Claude keeps writing
+            speech = SentencePipeline(
+                split_sentences(speculation.deltas() if speculation else stream_claude_response(user_text, memory)),
+                synthesize=synthesize_sentence if opts["prerendered"] else synthesize_to_buffer,
+                on_sentence=lambda text: progress(3, "thinking", {"claude_response": text})
+            )
+            audio_chunks = speech.audio()
+        else:
+            with span("llm", speculative=speculation is not None):
+                if speculation is not None:
+                    try:
+                        claude_response = speculation.result()
+                    except Exception as e:
+                        # Cut short (IncompleteResponse) or failed: drop the guess and ask Claude again
+                        print(f"⚠️ Speculative answer failed ({e}), asking Claude again")
+                        speculator.close()
+                        speculation = None
+                        claude_response = get_claude_response(user_text, memory)
+                else:
+                    claude_response = get_claude_response(user_text, memory)
+            
+            if not claude_response:
+                claude_response = "I'm sorry, I didn't understand that."
+            
+            check_cancelled()
+            print(f"✅ Claude responds: '{claude_response}'")
+            progress(3, "complete", {"claude_response": claude_response})
+            # A known phrase (e.g. a canned apology) already has pre-rendered speech
+            asset = asset_library.find_response(claude_response) if opts["prerendered"] else None
+            asset_audio = load_asset(asset)
+            if asset_audio is None:
+                asset = None
+            if streaming_player:
+                audio_chunks = iter([asset_audio]) if asset else synthesize_stream(claude_response)
+
+        # Steps 4+5 streamed: audio goes straight to an A2F streaming player
+        if streaming_player:
+            print(f"🗣️ Streaming TTS to {streaming_player}...")
+            progress(4, "generating")
+
+            spoken = []   # Keep what we pushed so it can be cached afterwards
+
+            def on_first_chunk(chunks):
+                # Flip to "animating" as soon as the avatar has audio to lip-sync
+                for i, chunk in enumerate(chunks):
+                    if i == 0:
+                        progress(5, "animating")
+                        session.speaking_until = time.time()
+                    spoken.append(chunk)
+                    session.speaking_until += chunk.duration
+                    yield chunk
+
+            def push(chunks):
+                # On its own thread: only the push waits for and holds the avatar slot
+                with sessions.stage("avatar", session, token=current_token()), \
+                        span("a2f.stream", player=streaming_player):
+                    viewport.start()
+                    return a2f_streaming.push_audio_stream(
+                        on_first_chunk(chunks), streaming_player, TTS_SAMPLE_RATE
+                    )
+
+            pusher = a2f_streaming.BackgroundPush(push)
+            # The push's token is cancelled by a barge-in and by a failed turn below
+            stop_speaking_on_cancel(session, streaming_player, pusher.token)
+            try:
+                # Claude + TTS produce under the network slot, which is released once they're done
+                for chunk in audio_chunks:
+                    if pusher.done:
+                        break   # Cancelled or rejected; pusher.result() says which
+                    pusher.put(chunk)
+            except Cancelled:
+                raise
+            except Exception as tts_error:
+                print(f"❌ Streaming TTS error: {str(tts_error)}")
+                # The turn failed: the avatar mustn't go on to say the half we already pushed
+                pusher.cancel("tts failed")
+                try:
+                    pusher.result()
+                except Cancelled:
+                    pass
+                except Exception as a2f_error:
+                    print(f"⚠️ Audio2Face push failed too: {str(a2f_error)}")
+                return failed(4, f"TTS failed: {str(tts_error)}")
+            finally:
+                pusher.close()
+        else:
+            # Step 4: Generate TTS from Claude's response (not user's text!)
+            print("🗣️ Generating TTS for Claude's response...")
+            progress(4, "generating")
+            if cached:
+                tts_audio = cached_audio
+            elif opts["pipelined"]:
+                # Sentences were synthesized as they arrived; join them in order
+                with span("llm+tts"):
+                    tts_audio = speech.assemble()
+                claude_response = speech.text
+                use_cache = use_cache and speech.complete
+                print(f"✅ Claude responds: '{claude_response}'")
+                progress(3, "complete", {"claude_response": claude_response})
+            elif asset:
+                tts_audio = asset_audio
+            else:
+                with span("tts"):
+                    tts_audio = synthesize_to_buffer(claude_response)  # Use Claude's response
+
+    if streaming_player:
         try:
-            # Load USD scene
-            a2f.load_usd(r"C:\Users\Devan\Desktop\Working Face.usd")
+            pushed = pusher.result()
+        except Cancelled:
+            raise
+        except Exception as a2f_error:
+            print(f"❌ Audio2Face error: {str(a2f_error)}")
+            return failed(5, f"Audio2Face failed: {str(a2f_error)}")
+        check_cancelled()
+        if not pushed:
+            return failed(5, "Audio2Face rejected the audio stream")
+
+        if opts["pipelined"] and not cached:
+            claude_response = speech.text
+            progress(3, "complete", {"claude_response": claude_response})
+            # A sentence without speech or a stream that broke off: play it, don't keep it
+            use_cache = use_cache and speech.complete
+        if use_cache and not cached and not asset and spoken:
+            cache_response(cache_key, claude_response, AudioBuffer.concatenate(spoken))
+
+        print("✅ Magic Mirror is speaking Claude's response!")
+        progress(5, "complete", {"stream_active": True})
+        return {
+            "success": True,
+            "session_id": session.id,
+            "user_transcript": user_text,
+            "claude_response": claude_response,
+            "tts_file": None,
+            "duration_recorded": duration,
+            "message": "AI conversation complete!",
+            "stream_active": True,
+            "cached": bool(cached),
+            "prerendered": asset is not None
+        }, 200
+
+    check_cancelled()   # Before anything half-finished gets written or cached
+    if tts_audio is None:
+        return failed(4, "TTS generation failed")
+    if asset:
+        # Already prepared and on disk in the library
+        track = (asset_library.directory, asset["wav"])
+    else:
+        # A2F's player needs a file path, so this is the one WAV we write
+        with span("tts.write"):
+            # Normalized + trimmed so lip-sync starts with the first word
+            prepare_for_a2f(tts_audio).write_wav(tts_wav)
+        track = (OUTPUT_DIR, os.path.basename(tts_wav))
+    if use_cache and not cached and not asset:
+        cache_response(cache_key, claude_response, tts_audio)
+    print("✅ TTS generation complete")
+    progress(4, "complete")
+
+    # Step 5: Audio2Face lip-sync animation
+    print("🎭 Starting Audio2Face animation...")
+    progress(5, "animating")
+    
+    try:
+        with sessions.stage("avatar", session), span("a2f.play"):
+            # Load USD scene (only the first time; the client remembers it)
+            a2f_client.ensure_scene(A2F_USD)
             
-            # Get player instances
-            players = a2f.get_player_instances()
+            # Get player instances (discovered once per scene)
+            players = a2f_client.players()["regular"]
             if not players:
                 print("⚠️ No Audio2Face Player found in scene")
-                send_progress_update(5, "error", {"error": "No Audio2Face Player found"})
-                return jsonify({
+                progress(5, "error", {"error": "No Audio2Face Player found"})
+                return {
                     "success": False,
+                    "session_id": session.id,
                     "error": "No Audio2Face Player found in scene"
-                }), 500
+                }, 500
             
             player = players[0]
             print(f"🎬 Using player: {player}")
 
-            # Configure audio playback
-            a2f.set_root_path(OUTPUT_DIR, player=player)
-            a2f.set_track(os.path.basename(TTS_WAV), player=player, time_range=[0, -1])
-            a2f.set_range(player=player, time_range=[0, -1])
-            
-            # Start video streaming
-            streaming_active = True
-            threading.Thread(target=capture_audio2face_viewport, daemon=True).start()
-            
-            # Small delay then play
-            time.sleep(0.3)
-            a2f.play_audio(player=player)
+            # Start video streaming (no-op if the capture thread is already running)
+            viewport.start()
             
-            print("✅ Magic Mirror is speaking Claude's response!")
-            send_progress_update(5, "complete", {"stream_active": True})
-            
-            return jsonify({
-                "success": True,
-                "user_transcript": user_text,
-                "claude_response": claude_response,
-                "tts_file": TTS_WAV,
-                "duration_recorded": duration,
-                "message": "AI conversation complete!",
-                "stream_active": True
-            })
-            
-        except Exception as a2f_error:
-            print(f"❌ Audio2Face error: {str(a2f_error)}")
-            send_progress_update(5, "error", {"error": str(a2f_error)})
-            return jsonify({"error": f"Audio2Face failed: {str(a2f_error)}"}), 500
+            # Small delay, then track + range + play (root path only if it changed)
+            if session.token.wait(0.3):
+                check_cancelled()
+            a2f_client.play_file(player, *track, time_range=[0, -1])
+            session.speaking_until = time.time() + tts_audio.duration
+            stop_speaking_on_cancel(session, player)
+        
+        print("✅ Magic Mirror is speaking Claude's response!")
+        progress(5, "complete", {"stream_active": True})
+        
+        return {
+            "success": True,
+            "session_id": session.id,
+            "user_transcript": user_text,
+            "claude_response": claude_response,
+            "tts_file": tts_wav,
+            "duration_recorded": duration,
+            "message": "AI conversation complete!",
+            "stream_active": True,
+            "cached": bool(cached),
+            "prerendered": asset is not None
+        }, 200
+        
+    except Cancelled:
+        raise
+    except Exception as a2f_error:
+        print(f"❌ Audio2Face error: {str(a2f_error)}")
+        a2f_client.reset()   # Rediscover the scene next time in case A2F restarted
+        return failed(5, f"Audio2Face failed: {str(a2f_error)}")
 
-    except Exception as e:
-        print(f"❌ Error in AI pipeline: {str(e)}")
-        pipeline_state["error"] = str(e)
-        return jsonify({"error": f"AI pipeline failed: {str(e)}"}), 500
+@app.route("/record_and_speak", methods=["POST"])
+def record_and_speak():
+    """
+    Enhanced AI pipeline: Record → Transcribe → Claude AI → TTS → Audio2Face
+
+    Each call gets its own session; follow it with /progress/<session_id>.
+    """
+    try:
+        options = parse_options(request.get_json() or {})
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    session = sessions.create(options)
+    if session is None:
+        return jsonify({"error": "Too many conversations in progress, try again shortly"}), 503
+
+    body, status = sessions.submit(session, run_conversation).result()
+    return jsonify(body), status
+
+@app.route("/conversations/<conversation_id>", methods=["DELETE"])
+def forget(conversation_id):
+    """Start a conversation over: Claude forgets its earlier turns"""
+    if not forget_conversation(conversation_id):
+        return jsonify({"error": "Unknown conversation"}), 404
+    return jsonify({"conversation_id": conversation_id, "forgotten": True})
+
+@app.route("/conversations/<conversation_id>/interrupt", methods=["POST"])
+def interrupt(conversation_id):
+    """Barge-in from the client (e.g. its own voice detector): stop the avatar and any turn in flight"""
+    interrupted = sessions.interrupt(conversation_id, "interrupted")
+    return jsonify({"conversation_id": conversation_id, "cancelled": [session.id for session in interrupted]})
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    """
+    Start the pipeline in the background and return a job ID right away.
+
+    Follow the job with /jobs/<job_id>/events (Server-Sent Events) or poll
+    /jobs/<job_id>; no Flask worker is tied up while the pipeline runs.
+    """
+    try:
+        options = parse_options(request.get_json() or {})
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    session = sessions.create(options)
+    if session is None:
+        return jsonify({"error": "Too many conversations in progress, try again shortly"}), 503
+
+    sessions.submit(session, run_conversation)
+    return jsonify({
+        "job_id": session.id,
+        "status_url": f"/jobs/{session.id}",
+        "events_url": f"/jobs/{session.id}/events"
+    }), 202
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """Current progress of a job, plus its result once it has finished"""
+    session = sessions.get(job_id)
+    if session is None:
+        return jsonify({"error": "Unknown job"}), 404
+    job = {"job_id": session.id, "done": session.done, "progress": session.snapshot()}
+    if session.done:
+        body, status = session.result
+        job["result"] = {"status": status, "body": body}
+    return jsonify(job)
+
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """
+    Server-Sent Events stream for a job: "progress" events as each stage
+    moves, then a final "result" event ({"status", "body"}) before closing.
+
+    Every open stream ties up a Flask worker thread. With SSE_MAX_SUBSCRIBERS
+    streams already open this returns 503, and a stream still open after
+    SSE_MAX_SECONDS ends with a "poll" event ({"status_url"}); either way the
+    client follows the job by polling /jobs/<job_id>.
+    """
+    session = sessions.get(job_id)
+    if session is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if not sse_subscribers.acquire(blocking=False):
+        return jsonify({"error": "Too many event streams open, poll the job instead",
+                        "status_url": f"/jobs/{job_id}"}), 503
+
+    def event_stream():
+        events = session.subscribe()
+        deadline = time.monotonic() + SSE_MAX_SECONDS
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    yield f"event: poll\ndata: {json.dumps({'status_url': f'/jobs/{job_id}'})}\n\n"
+                    break
+                try:
+                    event, data = events.get(timeout=min(SSE_KEEPALIVE_SECONDS, remaining))
+                except queue.Empty:
+                    yield ": keep-alive\n\n"   # Stops proxies from closing an idle stream
+                    continue
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+                if event == "result":
+                    break
+        finally:
+            session.unsubscribe(events)
+
+    response = Response(
+        event_stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    # Runs when the response is closed, even if the client left before the first event
+    response.call_on_close(sse_subscribers.release)
+    return response
 
 @app.route("/progress", methods=["GET"])
 def get_progress():
-    """Get current pipeline progress"""
-    return jsonify(pipeline_state)
+    """Get progress of the most recent session"""
+    session = sessions.latest()
+    if session is None:
+        return jsonify(IDLE_STATE)
+    return jsonify(session.snapshot())
+
+@app.route("/progress/<session_id>", methods=["GET"])
+def get_session_progress(session_id):
+    """Get progress of one session"""
+    session = sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": "Unknown session"}), 404
+    return jsonify(session.snapshot())
 
 @app.route("/stream/start", methods=["POST"])
 def start_stream():
-    """Start video stream"""
-    global streaming_active
-    
-    if not streaming_active:
-        streaming_active = True
-        threading.Thread(target=capture_audio2face_viewport, daemon=True).start()
+    """Start video stream (optional body: {"profile": "high" | "medium" | "low"})"""
+    profile = (request.get_json(silent=True) or {}).get("profile")
+    if profile:
+        try:
+            viewport_capture.set_profile(profile)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    if viewport.start():
         print("📹 Video stream started")
     
-    return jsonify({"success": True, "streaming": streaming_active})
+    return jsonify({"success": True, "streaming": viewport.running})
 
 @app.route("/stream/stop", methods=["POST"])
 def stop_stream():
     """Stop video stream"""
-    global streaming_active
-    streaming_active = False
+    viewport.stop()
     print("⏹️ Video stream stopped")
-    return jsonify({"success": True, "streaming": streaming_active})
+    return jsonify({"success": True, "streaming": viewport.running})
 
 @app.route("/video_feed")
 def video_feed():
-    """Video streaming endpoint"""
+    """Video streaming endpoint (wakes only when the shared capture publishes a new frame)"""
     def generate_frames():
-        while streaming_active:
-            if current_frame is not None:
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + current_frame + b'\r\n')
-            time.sleep(0.033)
+        for frame in viewport.frames():
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
     
     return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Model load and inference timings, plus p50/p95/p99 for every traced stage"""
+    return jsonify({
+        "latency": get_trace_metrics(),
+        "whisper": get_model_metrics(),
+        "claude": get_llm_metrics(),
+        "memory": get_memory_metrics(),
+        "barge_in": get_cancellation_metrics(),
+        "speculation": get_speculation_metrics(),
+        "outbound": get_resilience_metrics(),
+        "response_cache": response_cache.stats(),
+        "prerendered": asset_library.stats(),
+        "audio2face": a2f_client.latency_stats(),
+        "sessions": sessions.stats(),
+        "microphone": microphone.stats(),
+        "video": {**viewport.stats(), "capture": viewport_capture.stats()}
+    })
+
 @app.route("/health", methods=["GET"])
 def health_check():
-    """Health check"""
+    """Health check (the process is up; see /ready for whether it can serve conversations)"""
     return jsonify({
         "status": "healthy",
+        "ready": warmup.ready,
         "ai_enabled": True,
-        "claude_available": True,
-        "streaming_active": streaming_active
+        "claude_available": warmup.is_ready("claude"),
+        "whisper_loaded": warmup.is_ready("whisper"),
+        "audio2face_available": warmup.is_ready("audio2face"),
+        "streaming_active": viewport.running,
+        "circuits": {name: stats["state"] for name, stats in get_resilience_metrics().items()},
+        "components": warmup.status()
     })
 
+@app.route("/ready", methods=["GET"])
+def readiness_check():
+    """200 once every component has warmed up, 503 until then (for load balancers / the kiosk UI)"""
+    return jsonify({"ready": warmup.ready, "components": warmup.status()}), 200 if warmup.ready else 503
+
 if __name__ == "__main__":
     print("🚀 Starting Magic Mirror AI Server with Claude Integration")
     print("🤖 Claude AI: Ready for conversations")
     print("🎭 Audio2Face: Ready for responses")
     print("📹 Video streaming: Ready")
+
+    # Load + exercise Whisper, Bedrock and the A2F scene in the background; /ready flips once they're warm.
+    # The reloader also runs this file in a watcher process that never serves: only warm up where we serve.
+    if not FLASK_RELOADER or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        warmup.start()
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=True, use_reloader=FLASK_RELOADER, host='0.0.0.0', port=5000)
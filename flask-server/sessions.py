@@ -0,0 +1,240 @@
+# sessions.py
+#
+# Per-conversation pipeline state plus a bounded scheduler, so several
+# /record_and_speak calls can be in flight at once without clobbering each
+# other's progress.
+
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from cancellation import CancellationToken
+from tracing import span
+
+# How many sessions may use each shared resource at the same time.
+# The mic, the GPU (Whisper) and the avatar (A2F playback) are single devices;
+# Bedrock/ElevenLabs calls are network-bound and can overlap.
+DEFAULT_STAGE_LIMITS = {
+    "mic": 1,
+    "gpu": 1,
+    "network": int(os.getenv("NETWORK_STAGE_WORKERS", "4")),
+    "avatar": 1,
+}
+
+
+class PipelineSession:
+    """Progress and result of one Record → Transcribe → Claude → TTS → A2F run"""
+
+    def __init__(self, options: dict):
+        self.id = uuid.uuid4().hex[:12]
+        self.options = options
+        self.created = time.time()
+        self.finished = None
+        self.result = None        # (response body, HTTP status) once done
+        self.stage_waits = {}     # stage -> seconds spent queued for it
+        self.token = CancellationToken()   # Cancelled on barge-in
+        self.speaking_until = None         # time.time() the avatar finishes this answer
+        self._lock = threading.Lock()
+        self._subscribers = []    # Queues of (event, data) for push clients (SSE)
+        self.state = {
+            "session_id": self.id,
+            "current_step": 0,
+            "status": "queued",
+            "transcript": "",
+            "claude_response": "",
+            "error": None,
+            "stream_active": False
+        }
+
+    @property
+    def done(self) -> bool:
+        return self.finished is not None
+
+    @property
+    def speaking(self) -> bool:
+        """True while the avatar may still be playing this session's answer"""
+        return self.speaking_until is not None and time.time() < self.speaking_until
+
+    def update(self, step, status, data=None):
+        """Send real-time progress updates"""
+        with self._lock:
+            self.state["current_step"] = step
+            self.state["status"] = status
+            if data:
+                self.state.update(data)
+            self._publish("progress", dict(self.state))
+        print(f"📡 [{self.id}] Progress Update: Step {step} - {status}")
+
+    def fail(self, error: str):
+        with self._lock:
+            self.state["error"] = error
+            self._publish("progress", dict(self.state))
+
+    def finish(self, result):
+        """Store the final (body, status) and tell every subscriber"""
+        with self._lock:
+            self.result = result
+            self.finished = time.time()
+            self._publish("result", self._result_event())
+
+    def subscribe(self) -> queue.Queue:
+        """
+        Queue of (event, data) pushes: the current state right away, then every
+        "progress" update, then one "result" event once the session is done.
+        """
+        events = queue.Queue()
+        with self._lock:
+            events.put(("progress", dict(self.state)))
+            if self.done:
+                events.put(("result", self._result_event()))
+            else:
+                self._subscribers.append(events)
+        return events
+
+    def unsubscribe(self, events: queue.Queue):
+        with self._lock:
+            if events in self._subscribers:
+                self._subscribers.remove(events)
+
+    def _result_event(self) -> dict:
+        body, status = self.result
+        return {"status": status, "body": body}
+
+    def _publish(self, event, data):
+        # Called with the lock held so subscribers see events in order
+        for events in self._subscribers:
+            events.put((event, data))
+        if event == "result":
+            self._subscribers.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.state)
+
+
+class SessionManager:
+    """
+    Runs sessions on a bounded worker pool.
+
+    Each pipeline stage runs inside stage(name), which only lets
+    DEFAULT_STAGE_LIMITS[name] sessions in at once: while one session holds
+    the GPU for Whisper, another can be waiting on Claude or ElevenLabs.
+    Finished sessions are kept (up to `history`) so their progress can
+    still be read; on_evict(session) is called when one is dropped.
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 16, history: int = 100,
+                 stage_limits: dict | None = None, on_evict=None):
+        self.max_pending = max_pending
+        self.history = history
+        self.on_evict = on_evict
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="session")
+        self._slots = {
+            name: threading.BoundedSemaphore(limit)
+            for name, limit in (stage_limits or DEFAULT_STAGE_LIMITS).items()
+        }
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._latest = None
+
+    def create(self, options: dict) -> PipelineSession:
+        """New session, or None if too many are already queued or running"""
+        with self._lock:
+            if self.active_count() >= self.max_pending:
+                return None
+            session = PipelineSession(options)
+            self._sessions[session.id] = session
+            self._latest = session
+            self._evict()
+        return session
+
+    def get(self, session_id: str) -> PipelineSession | None:
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def latest(self) -> PipelineSession | None:
+        return self._latest
+
+    def active_count(self) -> int:
+        return sum(1 for session in self._sessions.values() if not session.done)
+
+    def submit(self, session: PipelineSession, fn):
+        """Runs fn(session) on the pool; the future resolves to its (body, status)"""
+        def run():
+            try:
+                result = fn(session)
+            except Exception as e:
+                print(f"❌ [{session.id}] Error in AI pipeline: {str(e)}")
+                session.fail(str(e))
+                result = ({"error": f"AI pipeline failed: {str(e)}", "session_id": session.id}, 500)
+            session.finish(result)
+            return result
+
+        return self._executor.submit(run)
+
+    def slot(self, name: str):
+        """The semaphore guarding a stage (usable directly as a context manager)"""
+        return self._slots[name]
+
+    @contextmanager
+    def stage(self, name: str, session: PipelineSession | None = None, token: CancellationToken | None = None):
+        """
+        Holds one of the stage's slots for the duration of the block.
+
+        Raises Cancelled if the session (or `token`, e.g. a child token for
+        one part of the turn) is cancelled while still queued, so an
+        interrupted turn never takes a slot the next one is waiting for.
+        """
+        start = time.perf_counter()
+        token = token or (session.token if session is not None else None)
+        with span(f"queue.{name}"):
+            while not self._slots[name].acquire(timeout=0.05):
+                if token is not None:
+                    token.raise_if_cancelled()
+        try:
+            if session is not None:
+                session.stage_waits[name] = session.stage_waits.get(name, 0.0) + time.perf_counter() - start
+            yield
+        finally:
+            self._slots[name].release()
+
+    def interrupt(self, conversation_id: str, reason: str = "barge-in",
+                  exclude: PipelineSession | None = None) -> list[PipelineSession]:
+        """
+        Cancels the conversation's sessions that are still running or still
+        speaking. `exclude` is the turn doing the interrupting: it and any
+        session started after it are left alone.
+
+        Returns:
+        - the sessions that were cancelled
+        """
+        with self._lock:
+            candidates = [
+                session for session in self._sessions.values()
+                if session is not exclude
+                and (exclude is None or session.created <= exclude.created)
+                and session.options.get("conversation_id") == conversation_id
+                and (not session.done or session.speaking)
+            ]
+        return [session for session in candidates if session.token.cancel(reason)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "active": self.active_count(),
+                "max_pending": self.max_pending,
+            }
+
+    def _evict(self):
+        # Drop the oldest finished sessions beyond the history limit
+        finished = [sid for sid, session in self._sessions.items() if session.done]
+        for sid in finished[:max(0, len(self._sessions) - self.history)]:
+            session = self._sessions.pop(sid)
+            if self.on_evict:
+                self.on_evict(session)
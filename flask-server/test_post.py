@@ -30,6 +30,39 @@ def test_complete_pipeline():
     except requests.exceptions.RequestException as e:
         print(f"❌ Request failed: {e}")
 
+def test_job_pipeline():
+    """Test the async job API: submit, then follow progress over Server-Sent Events"""
+    
+    base = "http://127.0.0.1:5000"
+    payload = {"duration": 7}
+    
+    print("🎤 Submitting job...")
+    
+    try:
+        response = requests.post(f"{base}/jobs", json=payload, timeout=5)  # Returns right away
+        response.raise_for_status()
+        job = response.json()
+        print(f"🆔 Job ID: {job['job_id']}")
+        
+        # Each SSE message is "event: <name>" + "data: <json>" followed by a blank line
+        with requests.get(f"{base}{job['events_url']}", stream=True, timeout=60) as events:
+            event = None
+            for line in events.iter_lines(decode_unicode=True):
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: "):
+                    data = json.loads(line[len("data: "):])
+                    if event == "progress":
+                        print(f"📡 Step {data['current_step']} - {data['status']}")
+                    elif event == "result":
+                        print(f"📊 Status Code: {data['status']}")
+                        print(f"🔤 Transcript: '{data['body'].get('user_transcript')}'")
+                        print(f"💬 Claude: '{data['body'].get('claude_response')}'")
+                        break
+                        
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Request failed: {e}")
+
 def test_health():
     """Test the health endpoint"""
     url = "http://127.0.0.1:5000/health"
@@ -50,3 +83,7 @@ if __name__ == "__main__":
     
     # Test complete pipeline
     test_complete_pipeline()
+    print("\n" + "="*50 + "\n")
+    
+    # Test the async job API
+    test_job_pipeline()
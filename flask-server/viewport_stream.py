@@ -0,0 +1,306 @@
+# viewport_stream.py
+#
+# One capture/encode producer fanned out to any number of /video_feed viewers.
+
+import threading
+import time
+
+import numpy as np
+
+from lazy_imports import lazy_import
+
+cv2 = lazy_import("cv2", "pip install opencv-python")   # Loaded when the first frame is encoded
+
+# Resolution / JPEG quality / frame rate presets, best first.
+# ViewportCapture steps down this list when encoding can't keep up.
+CAPTURE_PROFILES = {
+    "high":   {"size": (640, 480), "quality": 95, "fps": 30},
+    "medium": {"size": (640, 480), "quality": 80, "fps": 24},
+    "low":    {"size": (480, 360), "quality": 70, "fps": 15},
+}
+PROFILE_ORDER = ["high", "medium", "low"]
+
+
+class FrameBroadcaster:
+    """
+    Shares the latest encoded frame between one producer and many viewers.
+
+    Frames carry a sequence number; viewers block on a condition variable
+    until the sequence moves past the last frame they sent, so nobody wakes
+    up (or re-sends) unless there is actually a new frame. A slow viewer
+    simply skips to the newest frame instead of queuing old ones. start()
+    never runs more than one producer thread.
+
+    Parameters:
+    - producer: callable(broadcaster) that loops while broadcaster.running,
+      calling publish() with each encoded frame
+    """
+
+    def __init__(self, producer):
+        self._producer = producer
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._frame = None
+        self._seq = 0
+        self.subscribers = 0
+        self.frames_published = 0
+        self.frames_dropped = 0   # Frames viewers skipped because they fell behind
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self) -> bool:
+        """Starts the producer thread; returns False if it was already running"""
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                self._running = True   # Cancel a pending stop()
+                return False
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="viewport-capture", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        """Asks the producer to exit and wakes every viewer so they can close"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def publish(self, frame: bytes):
+        """Called by the producer with each new encoded frame"""
+        with self._cond:
+            self._frame = frame
+            self._seq += 1
+            self.frames_published += 1
+            self._cond.notify_all()
+
+    def wait_for_frame(self, last_seq: int, timeout: float = 1.0):
+        """
+        Newest (seq, frame) after last_seq, or (last_seq, None) on timeout/stop.
+        Frames between last_seq and the returned one are skipped, not queued.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > last_seq or not self._running, timeout)
+            if self._seq <= last_seq or self._frame is None:
+                return last_seq, None
+            self.frames_dropped += self._seq - last_seq - 1 if last_seq else 0
+            return self._seq, self._frame
+
+    def frames(self):
+        """Yields each new frame for one viewer until the stream stops"""
+        with self._cond:
+            self.subscribers += 1
+        try:
+            last_seq = 0
+            while self._running:
+                last_seq, frame = self.wait_for_frame(last_seq)
+                if frame is not None:
+                    yield frame
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "running": self._running,
+                "subscribers": self.subscribers,
+                "frames_published": self.frames_published,
+                "frames_dropped": self.frames_dropped,
+            }
+
+    def _run(self):
+        # Keep producing until stop(); also restarts the producer if it crashes
+        while True:
+            try:
+                self._producer(self)
+            except Exception as e:
+                print(f"❌ Viewport producer error: {e}")
+                time.sleep(1)
+            with self._cond:
+                if not self._running:
+                    self._thread = None
+                    self._cond.notify_all()
+                    return
+
+
+class ScreenSource:
+    """Grabs a screen region with mss (BGRA frames)"""
+
+    def __init__(self, region: dict):
+        self.region = region
+        self._sct = None
+
+    def open(self):
+        import mss
+        self._sct = mss.mss()
+
+    def grab(self) -> np.ndarray:
+        return np.asarray(self._sct.grab(self.region))
+
+    def close(self):
+        if self._sct is not None:
+            self._sct.close()
+            self._sct = None
+
+
+class SyntheticFrameSource:
+    """
+    Display-free stand-in for ScreenSource: a square that moves for
+    `moving_frames` frames, then holds still (like an idle avatar).
+    """
+
+    def __init__(self, width: int = 800, height: int = 600, moving_frames: int = 60):
+        self.width = width
+        self.height = height
+        self.moving_frames = moving_frames
+        self.frame_count = 0
+
+    def open(self):
+        self.frame_count = 0
+
+    def grab(self) -> np.ndarray:
+        frame = np.full((self.height, self.width, 4), 40, dtype=np.uint8)
+        step = min(self.frame_count, self.moving_frames)
+        x = (step * 7) % (self.width - 100)
+        frame[250:350, x:x + 100, :3] = (0, 200, 255)
+        self.frame_count += 1
+        return frame
+
+    def close(self):
+        pass
+
+
+class ViewportCapture:
+    """
+    Producer for FrameBroadcaster: grab → convert → resize → JPEG encode.
+
+    A cheap downsampled diff against the previous grab skips the convert and
+    encode entirely while the avatar is idle. If grab+convert+encode keeps
+    overrunning the frame budget, the profile steps down (lower quality,
+    size, fps); it steps back up once there's plenty of headroom again.
+    Per-stage timings are kept for /metrics.
+
+    Parameters:
+    - source: ScreenSource / SyntheticFrameSource (anything with open/grab/close)
+    - profile: best CAPTURE_PROFILES entry to use
+    - adaptive: allow stepping down/up when over/under budget
+    - change_threshold: mean absolute pixel difference (0-255) that counts as a change
+    """
+
+    DEGRADE_AFTER = 10   # Consecutive over-budget frames before stepping down
+    UPGRADE_AFTER = 90   # Consecutive frames under half the budget before stepping up
+
+    def __init__(self, source, profile: str = "high", adaptive: bool = True, change_threshold: float = 1.0):
+        self.source = source
+        self.adaptive = adaptive
+        self.change_threshold = change_threshold
+        self._lock = threading.Lock()
+        self.set_profile(profile)
+
+        self._previous = None
+        self._over_budget = 0
+        self._under_budget = 0
+        self.frames_grabbed = 0
+        self.frames_encoded = 0
+        self.frames_skipped = 0
+        self.profile_changes = 0
+        self.timings = {"grab_ms": None, "convert_ms": None, "encode_ms": None, "total_ms": None}
+
+    @property
+    def profile(self) -> dict:
+        return CAPTURE_PROFILES[PROFILE_ORDER[self._level]]
+
+    def set_profile(self, name: str):
+        """Best profile allowed; adaptive mode may run below it, never above"""
+        if name not in CAPTURE_PROFILES:
+            raise ValueError(f"Unknown capture profile '{name}' (choose from {', '.join(PROFILE_ORDER)})")
+        with self._lock:
+            self._max_level = PROFILE_ORDER.index(name)
+            self._level = self._max_level
+
+    def __call__(self, broadcaster):
+        self.source.open()
+        try:
+            while broadcaster.running:
+                start = time.perf_counter()
+                try:
+                    grabbed = self.source.grab()
+                    frame = self.process(grabbed, time.perf_counter() - start)
+                except Exception as e:
+                    print(f"❌ Screen capture error: {e}")
+                    time.sleep(1)
+                    continue
+                if frame is not None:
+                    broadcaster.publish(frame)
+                budget = 1.0 / self.profile["fps"]
+                time.sleep(max(0.0, budget - (time.perf_counter() - start)))
+        finally:
+            self.source.close()
+
+    def process(self, grabbed: np.ndarray, grab_seconds: float = 0.0) -> bytes | None:
+        """Encodes one grabbed BGRA frame; None when it hasn't changed since the last one"""
+        self.frames_grabbed += 1
+
+        # Every 8th pixel is plenty to tell "the avatar moved" from "nothing happened"
+        small = grabbed[::8, ::8, :3].astype(np.int16)
+        if self._previous is not None and small.shape == self._previous.shape:
+            if np.abs(small - self._previous).mean() < self.change_threshold:
+                self.frames_skipped += 1
+                return None
+        self._previous = small
+
+        profile = self.profile
+        t0 = time.perf_counter()
+        frame = cv2.cvtColor(grabbed, cv2.COLOR_BGRA2BGR)   # imencode expects BGR
+        frame = cv2.resize(frame, profile["size"])
+        t1 = time.perf_counter()
+        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, profile["quality"]])
+        t2 = time.perf_counter()
+        self.frames_encoded += 1
+
+        self.timings = {
+            "grab_ms": grab_seconds * 1000.0,
+            "convert_ms": (t1 - t0) * 1000.0,
+            "encode_ms": (t2 - t1) * 1000.0,
+            "total_ms": (grab_seconds + t2 - t0) * 1000.0,
+        }
+        self._adapt(grab_seconds + t2 - t0)
+        return buffer.tobytes()
+
+    def stats(self) -> dict:
+        return {
+            "profile": PROFILE_ORDER[self._level],
+            "max_profile": PROFILE_ORDER[self._max_level],
+            "frames_grabbed": self.frames_grabbed,
+            "frames_encoded": self.frames_encoded,
+            "frames_skipped": self.frames_skipped,
+            "profile_changes": self.profile_changes,
+            "last_frame": dict(self.timings),
+        }
+
+    def _adapt(self, elapsed: float):
+        if not self.adaptive:
+            return
+        budget = 1.0 / self.profile["fps"]
+        with self._lock:
+            if elapsed > budget:
+                self._over_budget += 1
+                self._under_budget = 0
+            elif elapsed < budget / 2:
+                self._under_budget += 1
+                self._over_budget = 0
+            else:
+                self._over_budget = self._under_budget = 0
+
+            if self._over_budget >= self.DEGRADE_AFTER and self._level < len(PROFILE_ORDER) - 1:
+                self._level += 1
+            elif self._under_budget >= self.UPGRADE_AFTER and self._level > self._max_level:
+                self._level -= 1
+            else:
+                return
+            self._over_budget = self._under_budget = 0
+            self.profile_changes += 1
+            print(f"📹 Capture profile -> {PROFILE_ORDER[self._level]}")
@@ -0,0 +1,98 @@
+# warmup.py
+#
+# Startup warm-up for each pipeline component, plus the readiness state
+# reported by /ready and /health.
+
+import threading
+import time
+
+PENDING = "pending"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+
+
+class WarmUp:
+    """
+    Runs every component's warm-up on its own background thread.
+
+    A warm-up function succeeds unless it raises or returns False. Failed
+    components are retried every `retry_seconds` (e.g. Audio2Face started
+    after the server), so readiness recovers without a restart.
+
+    Parameters:
+    - retry_seconds: wait between attempts for a failed component (None = don't retry)
+    """
+
+    def __init__(self, retry_seconds: float | None = 30.0):
+        self.retry_seconds = retry_seconds
+        self._components = {}
+        self._lock = threading.Lock()
+        self._started = None
+
+    def add(self, name: str, fn, required: bool = True):
+        """Registers a warm-up; required components must be ready before /ready says so"""
+        with self._lock:
+            self._components[name] = {
+                "fn": fn,
+                "required": required,
+                "state": PENDING,
+                "attempts": 0,
+                "seconds": None,
+                "error": None,
+                "ready_at": None,
+            }
+
+    def start(self):
+        """Starts every registered warm-up (in parallel; Whisper doesn't wait for Bedrock)"""
+        self._started = time.time()
+        for name in list(self._components):
+            threading.Thread(target=self._run, args=(name,), name=f"warmup-{name}", daemon=True).start()
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return all(c["state"] == READY for c in self._components.values() if c["required"])
+
+    def is_ready(self, name: str) -> bool:
+        with self._lock:
+            component = self._components.get(name)
+            return component is not None and component["state"] == READY
+
+    def status(self) -> dict:
+        """Per-component state, attempts, warm-up duration and last error"""
+        with self._lock:
+            return {
+                name: {key: value for key, value in component.items() if key != "fn"}
+                for name, component in self._components.items()
+            }
+
+    def _run(self, name: str):
+        component = self._components[name]
+        while True:
+            with self._lock:
+                component["state"] = WARMING
+                component["attempts"] += 1
+            print(f"🔥 Warming up {name}...")
+            start = time.perf_counter()
+            try:
+                ok = component["fn"]() is not False
+                error = None if ok else "warm-up returned False"
+            except Exception as e:
+                ok, error = False, str(e)
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                component["seconds"] = elapsed
+                component["error"] = error
+                component["state"] = READY if ok else FAILED
+                if ok:
+                    component["ready_at"] = time.time()
+            if ok:
+                print(f"✅ {name} warm in {elapsed:.2f}s")
+                return
+
+            print(f"⚠️ {name} warm-up failed: {error}")
+            if self.retry_seconds is None:
+                return
+            time.sleep(self.retry_seconds)
@@ -2,7 +2,6 @@ import { Component, inject, type OnDestroy } from "@angular/core"
 import { CommonModule } from "@angular/common"
 import { HttpClient } from "@angular/common/http"
 import { FormsModule } from "@angular/forms"
-import { interval, type Subscription } from "rxjs"
 import { environment } from "C:\Users\Devan\Desktop\audio_pipeline_project\frontend\src\environments\environments.ts"
 
 interface PipelineResponse {
@@ -15,6 +14,24 @@ interface PipelineResponse {
   stream_active?: boolean
 }
 
+interface JobSubmitted {
+  job_id: string
+  status_url: string
+  events_url: string
+}
+
+interface JobResult {
+  status: number
+  body: PipelineResponse & { error?: string }
+}
+
+interface JobStatus {
+  job_id: string
+  done: boolean
+  progress: ProgressState
+  result?: JobResult
+}
+
 interface ProgressState {
   current_step: number
   status: string
@@ -33,7 +50,8 @@ interface ProgressState {
 })
 export class AudioPipelineComponent implements OnDestroy {
   private http = inject(HttpClient)
-  private progressSubscription?: Subscription
+  private jobEvents?: EventSource
+  private jobPoll?: ReturnType<typeof setTimeout>
 
   duration = 5
   isProcessing = false
@@ -61,62 +79,116 @@ export class AudioPipelineComponent implements OnDestroy {
     this.error = null
     this.streamActive = false
 
-    this.startProgressPolling()
-
     try {
-      const response = await this.http
-        .post<PipelineResponse>(`${this.API_URL}/record_and_speak`, {
+      // The server answers right away with a job ID; progress is pushed over SSE
+      const job = await this.http
+        .post<JobSubmitted>(`${this.API_URL}/jobs`, {
           duration: this.duration,
         })
         .toPromise()
 
-      this.result = response!
-      this.isProcessing = false
-      this.streamActive = response?.stream_active || false
+      this.followJob(job!)
     } catch (err: any) {
       this.error = err.error?.error || "AI conversation failed"
+      this.resetProgress()
+    }
+  }
+
+  private followJob(job: JobSubmitted) {
+    this.closeJobEvents()
+    this.jobEvents = new EventSource(`${this.API_URL}${job.events_url}`)
+
+    this.jobEvents.addEventListener("progress", (event) => {
+      this.applyProgress(JSON.parse((event as MessageEvent).data))
+    })
+
+    this.jobEvents.addEventListener("result", (event) => {
+      this.closeJobEvents()
+      this.applyResult(JSON.parse((event as MessageEvent).data))
+    })
+
+    // The server ends long streams (and refuses new ones when busy) to free its threads
+    this.jobEvents.addEventListener("poll", () => {
+      this.closeJobEvents()
+      this.pollJob(job)
+    })
+
+    this.jobEvents.onerror = () => {
+      // EventSource would keep reconnecting; the job keeps running server-side, so poll it
+      console.warn("Lost job event stream, polling instead:", job.job_id)
+      this.closeJobEvents()
+      if (this.isProcessing) {
+        this.pollJob(job)
+      }
+    }
+  }
+
+  private pollJob(job: JobSubmitted) {
+    this.jobPoll = setTimeout(async () => {
+      try {
+        const status = await this.http.get<JobStatus>(`${this.API_URL}${job.status_url}`).toPromise()
+        this.applyProgress(status!.progress)
+        if (status!.done && status!.result) {
+          this.jobPoll = undefined
+          this.applyResult(status!.result)
+        } else {
+          this.pollJob(job)
+        }
+      } catch (err) {
+        this.jobPoll = undefined
+        this.error = "Lost connection to the AI pipeline"
+        this.resetProgress()
+      }
+    }, 500)
+  }
+
+  private applyProgress(progress: ProgressState) {
+    this.currentStep = progress.current_step
+    this.isRecording = progress.status === "recording"
+
+    // Update result with real-time data
+    if (progress.transcript || progress.claude_response) {
+      this.result = {
+        ...this.result,
+        user_transcript: progress.transcript,
+        claude_response: progress.claude_response,
+      } as PipelineResponse
+    }
+
+    if (progress.error) {
+      this.error = progress.error
+    }
+
+    this.streamActive = progress.stream_active
+  }
+
+  private applyResult({ status, body }: JobResult) {
+    if (status === 200) {
+      this.result = body
       this.isProcessing = false
       this.isRecording = false
-      this.currentStep = 0
-      this.streamActive = false
-    } finally {
-      this.stopProgressPolling()
+      this.streamActive = body.stream_active || false
+    } else {
+      this.error = body.error || "AI conversation failed"
+      this.resetProgress()
     }
   }
 
-  private startProgressPolling() {
-    this.progressSubscription = interval(500).subscribe(() => {
-      this.http.get<ProgressState>(`${this.API_URL}/progress`).subscribe({
-        next: (progress) => {
-          this.currentStep = progress.current_step
-          this.isRecording = progress.status === "recording"
-
-          // Update result with real-time data
-          if (progress.transcript || progress.claude_response) {
-            this.result = {
-              ...this.result,
-              user_transcript: progress.transcript,
-              claude_response: progress.claude_response,
-            } as PipelineResponse
-          }
-
-          if (progress.error) {
-            this.error = progress.error
-            this.isProcessing = false
-            this.isRecording = false
-          }
-
-          this.streamActive = progress.stream_active
-        },
-        error: (err) => console.warn("Progress polling error:", err),
-      })
-    })
+  private resetProgress() {
+    this.isProcessing = false
+    this.isRecording = false
+    this.currentStep = 0
+    this.streamActive = false
   }
 
-  private stopProgressPolling() {
-    if (this.progressSubscription) {
-      this.progressSubscription.unsubscribe()
-      this.progressSubscription = undefined
+  private closeJobEvents() {
+    if (this.jobEvents) {
+      this.jobEvents.close()
+      this.jobEvents = undefined
+    }
+    if (this.jobPoll) {
+      clearTimeout(this.jobPoll)
+      this.jobPoll = undefined
     }
   }
 
@@ -147,6 +219,6 @@ export class AudioPipelineComponent implements OnDestroy {
   }
 
   ngOnDestroy() {
-    this.stopProgressPolling()
+    this.closeJobEvents()
   }
 }
@@ -0,0 +1,75 @@
+import importlib
+import importlib.util
+import sys
+import threading
+import types
+
+# Heavy dependencies are only imported the first time one of their attributes
+# is used, so CLI tools and the server start without paying for Whisper,
+# OpenCV or PortAudio until a request actually needs them.
+
+_import_lock = threading.Lock()
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stand-in for a module that imports the real one on first attribute access.
+
+        cv2 = lazy_import("cv2", "pip install opencv-python")
+        ...
+        cv2.imencode(...)   # OpenCV is imported here, not at startup
+    """
+
+    def __init__(self, name: str, install_hint: str | None = None):
+        super().__init__(name)
+        self.__dict__["_install_hint"] = install_hint
+        self.__dict__["_module"] = None
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__["_module"]
+        if module is not None:
+            return module
+        with _import_lock:
+            if self.__dict__["_module"] is None:
+                try:
+                    self.__dict__["_module"] = importlib.import_module(self.__name__)
+                except ImportError as e:
+                    hint = self.__dict__["_install_hint"]
+                    if hint:
+                        raise ImportError(f"{self.__name__} is needed for this feature ({hint})") from e
+                    raise
+        return self.__dict__["_module"]
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name: str, install_hint: str | None = None) -> types.ModuleType:
+    """
+    Returns the module if it's already imported, otherwise a LazyModule for it.
+
+    Parameters:
+    - name: module to import on first use ("faster_whisper", "cv2", ...)
+    - install_hint: added to the ImportError if the module turns out to be missing
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name, install_hint)
+
+
+def is_available(name: str) -> bool:
+    """True if the module can be imported (checked without importing it)."""
+    if name in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
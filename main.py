@@ -1,33 +1,38 @@
-from recorder import record_audio
+from recorder import capture_buffer
 from transcriber import transcribe_audio
 from tts import synthesize_speech
-from convert_to_wav import convert_mp3_to_wav
+from tracing import trace, span
 
 
 def main():
+    # The whole run is logged as one JSON trace with a span per step
+    with trace("main"):
+        run()
+
+
+def run():
     print("Starting recording...")
 
-    # Step 1: Record audio (5 seconds, default location)
-    record_audio()  # saves to audio/recording.wav
+    # Step 1: Record audio (5 seconds) straight into memory
+    with span("record"):
+        recording = capture_buffer(max_duration=5)
 
     print("Transcribing recorded audio...")
 
-    # Step 2: Transcribe the recorded audio
-    transcript = transcribe_audio("audio/recording.wav")
+    # Step 2: Transcribe the recording (no WAV round trip)
+    with span("transcribe"):
+        transcript = transcribe_audio(recording)
     print("Transcription complete.")
     print("Transcript:", transcript)
 
     print("Generating speech from transcript...")
 
-    # Step 3: Synthesize voice from transcript
-    synthesize_speech(transcript)
+    # Step 3: Synthesize voice from transcript, written directly as WAV
+    with span("tts"):
+        synthesize_speech(transcript, "output/tts_output.wav")
 
     print("Done! Audio and transcript saved in /output under specified file")
 
-    convert_mp3_to_wav("output/tts_output.mp3", "output/tts_output.wav")
-
-    print("Done! mp3 file converted alternatively to wav!")
-
 
 if __name__ == "__main__":
     main()
@@ -1,54 +1,614 @@
-import pyaudio       # Handles microphone input
+import atexit
+import collections   # deque backs our ring buffer
+import threading     # Reader thread keeps the mic drained while we process chunks
+import time
 import wave          # Allows saving audio in WAV format
 
+import numpy as np   # Fast RMS energy for the endpointer
+
+from audio_buffer import AudioBuffer
+from lazy_imports import lazy_import
+
+pyaudio = lazy_import("pyaudio", "pip install pyaudio")   # Handles microphone input (loaded when a mic opens)
+
+CHUNK = 1024               # Size of each audio buffer (1024 frames)
+SAMPLE_WIDTH = 2           # Bytes per sample: streams open as pyaudio.paInt16 (16-bit PCM)
+CHANNELS = 1               # 1 = mono input (1 microphone), 2 = stereo
+RATE = 44100               # Sample rate (samples/second). 44100 = CD-quality audio
+
+
 def record_audio(filename="audio/recording.wav", duration=5): #Output and duration for our recording
     """
     Records audio from your microphone and saves it as a .wav file.
 
+    Uses the shared capture device, so the mic is opened once per process
+    instead of on every call.
+
     Parameters:
     - filename: where the recorded audio should be saved
     - duration: how long (in seconds) to record
     """
+    # capture_buffer() prints the started / finished messages
+    recording = capture_buffer(duration, get_device().source(preroll=False))
+
+    # Save the recorded data to a .wav file
+    recording.write_wav(filename)
+
+
+# ─── Streaming capture ───
+#
+# Input devices all share the same tiny interface: open(), read(frames) -> bytes
+# (b"" once the input is exhausted), close(), plus rate/channels/sample_width.
+# That lets the streaming code below run against the real mic, a WAV file, or
+# any generator of PCM chunks.
+
+class MicrophoneSource:
+    """Live microphone input through PyAudio."""
+
+    def __init__(self, rate=RATE, channels=CHANNELS, chunk=CHUNK):
+        self.rate = rate
+        self.channels = channels
+        self.sample_width = SAMPLE_WIDTH
+        self.chunk = chunk
+        self._pa = None
+        self._stream = None
+
+    def open(self):
+        self._pa = pyaudio.PyAudio()
+        self._stream = self._pa.open(
+            format=pyaudio.paInt16,
+            channels=self.channels,
+            rate=self.rate,
+            input=True,
+            frames_per_buffer=self.chunk
+        )
+
+    def read(self, frames):
+        # Don't raise on overflow; a dropped buffer is better than a dead request
+        return self._stream.read(frames, exception_on_overflow=False)
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._pa is not None:
+            self._pa.terminate()
+            self._pa = None
+
+
+class WavFileSource:
+    """Fake input device that plays back a WAV file (for tests and benchmarks)."""
+
+    def __init__(self, path, realtime=False):
+        self.path = path
+        self.realtime = realtime   # True = pace reads like a real mic would
+        self._wf = None
+        with wave.open(path, 'rb') as wf:
+            self.rate = wf.getframerate()
+            self.channels = wf.getnchannels()
+            self.sample_width = wf.getsampwidth()
+
+    def open(self):
+        self._wf = wave.open(self.path, 'rb')
+
+    def read(self, frames):
+        data = self._wf.readframes(frames)
+        if self.realtime and data:
+            time.sleep(frames / self.rate)
+        return data
+
+    def close(self):
+        if self._wf is not None:
+            self._wf.close()
+            self._wf = None
+
+
+class GeneratorSource:
+    """Fake input device fed by any iterable of 16-bit PCM byte chunks."""
+
+    def __init__(self, chunks, rate=RATE, channels=CHANNELS):
+        self.rate = rate
+        self.channels = channels
+        self.sample_width = SAMPLE_WIDTH
+        self._chunks = chunks
+        self._iter = None
+
+    def open(self):
+        self._iter = iter(self._chunks)
+
+    def read(self, frames):
+        return next(self._iter, b"")
+
+    def close(self):
+        self._iter = None
+
+
+class RingBuffer:
+    """
+    Bounded chunk queue between the device reader thread and the consumer.
+
+    When the consumer falls behind, the oldest chunks are overwritten and
+    counted in `dropped` instead of letting memory grow without limit.
+    """
+
+    def __init__(self, capacity=256):
+        self._chunks = collections.deque(maxlen=capacity)
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, chunk):
+        with self._cond:
+            if len(self._chunks) == self._chunks.maxlen:
+                self.dropped += 1
+            self._chunks.append(chunk)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Next chunk, or None once the buffer is closed and drained (or on timeout)."""
+        with self._cond:
+            while not self._chunks and not self._closed:
+                if not self._cond.wait(timeout):
+                    return None
+            return self._chunks.popleft() if self._chunks else None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+# ─── Persistent capture device ───
+#
+# Opening PortAudio costs time on every recording and tends to clip the first
+# syllable. A CaptureDevice keeps one input stream running for the life of the
+# process; each recording just subscribes to it for a while. Backends only
+# need start(callback) / stop() / active, where callback(data, overflow) is
+# called with every chunk, so tests can drive it with FakeCaptureBackend.
+
+class PyAudioBackend:
+    """Callback-mode PyAudio input stream; one PyAudio instance for the device's lifetime."""
+
+    def __init__(self, rate=RATE, channels=CHANNELS, chunk=CHUNK):
+        self.rate = rate
+        self.channels = channels
+        self.chunk = chunk
+        self._pa = None
+        self._stream = None
+
+    @property
+    def active(self):
+        return self._stream is not None and self._stream.is_active()
+
+    def start(self, callback):
+        if self._pa is None:
+            self._pa = pyaudio.PyAudio()
+
+        def on_audio(in_data, frame_count, time_info, status):
+            callback(in_data, bool(status & pyaudio.paInputOverflow))
+            return (None, pyaudio.paContinue)
+
+        self._stream = self._pa.open(
+            format=pyaudio.paInt16,
+            channels=self.channels,
+            rate=self.rate,
+            input=True,
+            frames_per_buffer=self.chunk,
+            stream_callback=on_audio
+        )
+        self._stream.start_stream()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+
+    def terminate(self):
+        self.stop()
+        if self._pa is not None:
+            self._pa.terminate()
+            self._pa = None
+
+
+class FakeCaptureBackend:
+    """
+    Test backend: plays any input source (default: silence) through the
+    device callback in chunk-sized pieces, looping when it runs out.
+
+    Parameters:
+    - source: WavFileSource / GeneratorSource / anything with open/read/close
+    - realtime: pace chunks like a real mic (False = as fast as possible)
+    - overflow_every: flag every Nth chunk as an input overflow (0 = never)
+    """
+
+    def __init__(self, source=None, rate=RATE, channels=CHANNELS, chunk=CHUNK, realtime=True, overflow_every=0):
+        self.source = source
+        self.rate = source.rate if source else rate
+        self.channels = source.channels if source else channels
+        self.chunk = chunk
+        self.realtime = realtime
+        self.overflow_every = overflow_every
+        self.chunks_sent = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def active(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, callback):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(callback,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, callback):
+        silence = bytes(SAMPLE_WIDTH * self.channels * self.chunk)
+        if self.source:
+            self.source.open()
+        try:
+            while not self._stop.is_set():
+                data = self.source.read(self.chunk) if self.source else silence
+                if not data:
+                    self.source.close()   # Loop the fixture
+                    self.source.open()
+                    continue
+                self.chunks_sent += 1
+                callback(data, bool(self.overflow_every) and self.chunks_sent % self.overflow_every == 0)
+                if self.realtime:
+                    time.sleep(self.chunk / self.rate)
+        finally:
+            if self.source:
+                self.source.close()
+
+
+class CaptureDevice:
+    """
+    Long-lived input stream shared by every recording.
+
+    The backend runs continuously and the last `preroll_seconds` of audio are
+    always kept, so a recording starts with whatever was said just before it
+    was asked for. Each recording gets its own ring buffer through source().
+    If the backend stops (device unplugged, host error) it is restarted on the
+    next source().open().
+
+    Counters:
+    - overflows: chunks the host flagged as input overflow (we lost audio upstream)
+    - underruns: times a recording waited more than two chunk periods for audio
+    - dropped: chunks overwritten because a recording's consumer fell behind
+
+    Parameters:
+    - backend: PyAudioBackend (default) or FakeCaptureBackend
+    - preroll_seconds: audio kept from before each recording starts
+    - buffer_chunks: ring buffer size per recording
+    """
+
+    def __init__(self, backend=None, preroll_seconds=0.5, buffer_chunks=256):
+        self.backend = backend or PyAudioBackend()
+        self.rate = self.backend.rate
+        self.channels = self.backend.channels
+        self.sample_width = SAMPLE_WIDTH
+        self.preroll_seconds = preroll_seconds
+        self.buffer_chunks = buffer_chunks
+
+        self._lock = threading.Lock()
+        self._preroll = collections.deque()
+        self._preroll_bytes = 0
+        self._subscribers = []
+        self._started = False
+
+        self.chunks = 0
+        self.overflows = 0
+        self.underruns = 0
+        self.dropped = 0
+        self.restarts = 0
+
+    @property
+    def chunk_seconds(self):
+        return self.backend.chunk / self.rate
+
+    def start(self):
+        """Starts the stream (or restarts it if the backend died); no-op while it's running"""
+        with self._lock:
+            if self._started and self.backend.active:
+                return
+            if self._started:
+                self.restarts += 1
+                print("Capture device stopped, reopening...")
+                self.backend.stop()
+            self.backend.start(self._on_audio)
+            self._started = True
+
+    def stop(self):
+        with self._lock:
+            if self._started:
+                self.backend.stop()
+                self._started = False
+            self._preroll.clear()
+            self._preroll_bytes = 0
+
+    def close(self):
+        """Stops the stream and releases the audio system"""
+        self.stop()
+        if hasattr(self.backend, "terminate"):
+            self.backend.terminate()
 
-    chunk = 1024               # Size of each audio buffer (1024 frames)
-    format = pyaudio.paInt16   # Format: 16-bit PCM encoding (standard audio format)
-    channels = 1               # 1 = mono input (1 microphone), 2 = stereo
-    rate = 44100               # Sample rate (samples/second). 44100 = CD-quality audio
+    def source(self, preroll=True):
+        """Input source (open/read/close) for one recording, starting with the pre-roll"""
+        return DeviceSource(self, preroll)
 
-    p = pyaudio.PyAudio()      # Initialize the PyAudio engine
-    #Turn on the microphone system (the control board)
+    def stats(self):
+        with self._lock:
+            return {
+                "running": self._started and self.backend.active,
+                "rate": self.rate,
+                "channels": self.channels,
+                "preroll_seconds": self._preroll_bytes / (self.sample_width * self.channels * self.rate),
+                "recordings_active": len(self._subscribers),
+                "chunks": self.chunks,
+                "overflows": self.overflows,
+                "underruns": self.underruns,
+                "dropped": self.dropped,
+                "restarts": self.restarts,
+            }
 
-    # Open a stream to capture audio from the microphone
-    stream = p.open(                # 🎙️ Open a live mic wire (your channel to listen through)
-        format=format,              # Audio format (16-bit)
-        channels=channels,          # Mono or Stereo
-        rate=rate,                  # How fast to collect samples
-        input=True,                 # True = mic input
-        frames_per_buffer=chunk     # How many frames per chunk
-    )
+    def _on_audio(self, data, overflow):
+        # Runs on the backend's thread for every chunk
+        max_bytes = int(self.preroll_seconds * self.rate) * self.sample_width * self.channels
+        with self._lock:
+            self.chunks += 1
+            self.overflows += int(overflow)
+            self._preroll.append(data)
+            self._preroll_bytes += len(data)
+            while self._preroll and self._preroll_bytes - len(self._preroll[0]) >= max_bytes:
+                self._preroll_bytes -= len(self._preroll.popleft())
+            for ring in self._subscribers:
+                ring.put(data)
 
-    print("Recording started...")
+    def _subscribe(self, preroll):
+        self.start()
+        ring = RingBuffer(self.buffer_chunks)
+        with self._lock:
+            preroll_bytes = self._preroll_bytes if preroll else 0
+            if preroll:
+                for data in self._preroll:
+                    ring.put(data)
+            self._subscribers.append(ring)
+        return ring, preroll_bytes // (self.sample_width * self.channels)
 
-    frames = []  # This list will collect each chunk of audio data
+    def _unsubscribe(self, ring):
+        with self._lock:
+            if ring in self._subscribers:
+                self._subscribers.remove(ring)
+            self.dropped += ring.dropped
+        ring.close()
 
-    # Loop for the duration: collect (rate / chunk) chunks per second
-    for _ in range(0, int(rate / chunk * duration)):
-        data = stream.read(chunk)  # Read one chunk of audio from the mic
-        frames.append(data)        # Store that chunk in the list
 
+class DeviceSource:
+    """One recording's view of a CaptureDevice (same interface as MicrophoneSource)."""
+
+    def __init__(self, device, preroll=True, stall_timeout=2.0):
+        self.device = device
+        self.rate = device.rate
+        self.channels = device.channels
+        self.sample_width = device.sample_width
+        self.preroll = preroll
+        self.stall_timeout = stall_timeout   # No audio for this long = the device is gone
+        self.preroll_frames = 0   # Audio from before open(); doesn't count against max_duration
+        self._ring = None
+
+    def open(self):
+        self._ring, self.preroll_frames = self.device._subscribe(self.preroll)
+
+    def read(self, frames):
+        # Hands back whole device chunks; stream_audio counts what it actually got
+        waited = 0.0
+        wait = 2 * self.device.chunk_seconds
+        while waited < self.stall_timeout:
+            data = self._ring.get(timeout=wait)
+            if data is not None:
+                return data
+            with self.device._lock:
+                self.device.underruns += 1
+            waited += wait
+        print("Capture device stalled, ending recording")
+        return b""
+
+    def close(self):
+        if self._ring is not None:
+            self.device._unsubscribe(self._ring)
+            self._ring = None
+
+
+_default_device = None
+_default_device_lock = threading.Lock()
+
+
+def get_device():
+    """The process-wide microphone CaptureDevice (created on first use)."""
+    global _default_device
+    with _default_device_lock:
+        if _default_device is None:
+            _default_device = CaptureDevice()
+            atexit.register(_default_device.close)
+        return _default_device
+
+
+class EnergyEndpointer:
+    """
+    Energy-based voice activity endpointer.
+
+    Tracks the background noise floor and calls the utterance finished once
+    speech has been followed by `silence_ms` of quiet. If nobody speaks
+    within `no_speech_timeout` seconds we give up early as well.
+    on_speech_start() is called once, as soon as real speech is detected.
+    """
+
+    def __init__(
+        self,
+        rate=RATE,
+        silence_ms=700,
+        min_speech_ms=200,
+        margin_db=12.0,
+        min_speech_db=-45.0,
+        no_speech_timeout=5.0,
+        on_speech_start=None
+    ):
+        self.rate = rate
+        self.on_speech_start = on_speech_start
+        self.silence_ms = silence_ms
+        self.min_speech_ms = min_speech_ms
+        self.margin_db = margin_db
+        self.min_speech_db = min_speech_db
+        self.no_speech_timeout = no_speech_timeout
+        self.reset()
+
+    def reset(self):
+        self.noise_floor_db = None
+        self.speech_ms = 0.0
+        self.silence_run_ms = 0.0
+        self.elapsed_ms = 0.0
+        self.in_speech = False
+        self.done = False
+
+    @staticmethod
+    def chunk_db(chunk):
+        """RMS level of a 16-bit PCM chunk in dBFS."""
+        samples = np.frombuffer(chunk, dtype=np.int16).astype(np.float32)
+        if samples.size == 0:
+            return -120.0
+        rms = np.sqrt(np.mean(samples * samples))
+        return 20.0 * np.log10(max(rms, 1e-3) / 32768.0)
+
+    def is_speech(self, level_db):
+        threshold = self.min_speech_db
+        if self.noise_floor_db is not None:
+            threshold = max(threshold, self.noise_floor_db + self.margin_db)
+        return level_db > threshold
+
+    def process(self, chunk, channels=CHANNELS):
+        """Feeds one chunk; returns True once the utterance has ended."""
+        chunk_ms = 1000.0 * len(chunk) / (SAMPLE_WIDTH * channels * self.rate)
+        self.elapsed_ms += chunk_ms
+        level_db = self.chunk_db(chunk)
+
+        if self.is_speech(level_db):
+            self.speech_ms += chunk_ms
+            self.silence_run_ms = 0.0
+            if self.speech_ms >= self.min_speech_ms and not self.in_speech:
+                self.in_speech = True
+                if self.on_speech_start:
+                    self.on_speech_start()
+        else:
+            self.silence_run_ms += chunk_ms
+            # Slowly adapt the noise floor during quiet chunks
+            if self.noise_floor_db is None:
+                self.noise_floor_db = level_db
+            else:
+                self.noise_floor_db = 0.95 * self.noise_floor_db + 0.05 * level_db
+            if not self.in_speech:
+                self.speech_ms = 0.0   # Short blips before real speech don't count
+
+        if self.in_speech and self.silence_run_ms >= self.silence_ms:
+            self.done = True
+        elif not self.in_speech and self.elapsed_ms >= self.no_speech_timeout * 1000.0:
+            self.done = True
+        return self.done
+
+
+def stream_audio(source=None, max_duration=30, endpointer=None, chunk=CHUNK, buffer_chunks=256):
+    """
+    Yields 16-bit PCM chunks as they are captured.
+
+    A reader thread drains the device into a ring buffer so slow consumers
+    never stall the mic. Stops at `max_duration`, when the source runs dry,
+    or as soon as the endpointer detects the end of the utterance.
+
+    Parameters:
+    - source: input device (defaults to the shared microphone CaptureDevice)
+    - max_duration: hard cap on capture length in seconds
+    - endpointer: EnergyEndpointer (or None to always capture max_duration)
+    - chunk: frames per read
+    - buffer_chunks: ring buffer capacity in chunks
+    """
+    source = source or get_device().source()
+    ring = RingBuffer(buffer_chunks)
+    stop = threading.Event()
+
+    def reader():
+        frames_read = 0
+        try:
+            while not stop.is_set() and frames_read < max_frames:
+                data = source.read(min(chunk, max_frames - frames_read))
+                if not data:
+                    break
+                frames_read += len(data) // (source.sample_width * source.channels)
+                ring.put(data)
+        finally:
+            ring.close()
+
+    source.open()
+    max_frames = int(source.rate * max_duration) + getattr(source, "preroll_frames", 0)
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    try:
+        while True:
+            data = ring.get()
+            if data is None:
+                break
+            yield data
+            if endpointer is not None and endpointer.process(data, source.channels):
+                break
+    finally:
+        stop.set()
+        thread.join()
+        source.close()
+        if ring.dropped:
+            print(f"Ring buffer dropped {ring.dropped} chunks")
+
+
+def capture_buffer(max_duration=30, source=None, endpointer=None, endpointing=False):
+    """
+    Records into memory, ending early once the speaker stops talking if an endpointer is used.
+
+    Parameters:
+    - max_duration: longest we'll listen for, in seconds
+    - source: input device (defaults to the shared microphone CaptureDevice)
+    - endpointer: EnergyEndpointer to stop on (None to record the full window, as in stream_audio)
+    - endpointing: without an endpointer, stop on a default EnergyEndpointer instead
+
+    Returns:
+    - AudioBuffer with the captured 16-bit audio
+    """
+    source = source or get_device().source()
+    if endpointer is None and endpointing:
+        endpointer = EnergyEndpointer(rate=source.rate)
+
+    print("Recording started (listening for end of speech)..." if endpointer else "Recording started...")
+    frames = list(stream_audio(source, max_duration, endpointer))
     print("Recording finished.")
 
-    # Cleanup: stop the mic stream and close it
-    stream.stop_stream()
-    stream.close()
-    p.terminate()
+    return AudioBuffer.from_pcm16(b''.join(frames), source.rate, source.channels)
 
-    # Save the recorded data to a .wav file
-    with wave.open(filename, 'wb') as wf:
-        wf.setnchannels(channels)                            # Set to mono
-        wf.setsampwidth(p.get_sample_size(format))           # Auto-detect size from format
-        wf.setframerate(rate)                                # Set sample rate
-        wf.writeframes(b''.join(frames))                     # Join all chunks and write to file
+
+def record_until_silence(filename="audio/recording.wav", max_duration=30, source=None, endpointer=None):
+    """
+    Records until the speaker stops talking (or max_duration) and saves a .wav file.
+    Stops on a default EnergyEndpointer unless one is passed in.
+
+    Returns:
+    - duration: seconds of audio actually recorded
+    """
+    buffer = capture_buffer(max_duration, source, endpointer, endpointing=True)
+    buffer.write_wav(filename)
+    return buffer.duration
 
 
 # Run directly for testing
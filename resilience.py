@@ -0,0 +1,282 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from cancellation import CancellationToken, Cancelled, cancel_scope, current_token
+from tracing import record
+
+# Outbound calls (ElevenLabs, Bedrock) go through a Resilient policy: each
+# call gets a deadline, a duplicate "hedge" request is sent if the first one
+# is slower than the recent p95, and a circuit breaker stops calling a
+# provider that keeps failing so the caller can fall back right away instead
+# of waiting out every timeout.
+
+HEDGE_WINDOW = 50        # Recent successful latencies kept for the p95
+HEDGE_MIN_SAMPLES = 10   # Until then, hedge after the configured initial delay
+POLL_SECONDS = 0.05      # How often a waiting call checks for a barge-in
+
+# Attempts run here so the caller can stop waiting for a slow one
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="outbound")
+
+# Every policy by name, for get_resilience_metrics()
+_policies = {}
+_policies_lock = threading.Lock()
+
+
+class Unavailable(Exception):
+    """The provider couldn't answer in time; use a fallback"""
+
+
+class DeadlineExceeded(Unavailable):
+    """No attempt finished before the call's deadline"""
+
+
+class CircuitOpen(Unavailable):
+    """The breaker is open; the provider wasn't called"""
+
+
+class Resilient:
+    """
+    Deadline, hedging and circuit breaking for one outbound dependency.
+
+        elevenlabs = Resilient("elevenlabs", deadline=10.0)
+        audio = elevenlabs.call(fetch_speech, text)   # raises Unavailable -> fall back
+
+    Attempts run on a worker thread inside their own cancel_scope(), linked
+    to the caller's, so a losing or timed-out attempt is cancelled (and its
+    HTTP response closed via abort_on_cancel) and a barge-in stops them all.
+    A hedge costs a duplicate request, so with the p95 delay it fires on
+    roughly one call in twenty.
+
+    Parameters:
+    - name: provider name in logs and metrics
+    - deadline: seconds the caller waits for a result, across all attempts
+    - hedge_after: delay before the hedge until enough latencies are known (None: no hedging)
+    - hedge_min, hedge_max: bounds for the p95-based hedge delay
+    - max_attempts: first request + hedges/retries
+    - failure_threshold: consecutive failures that open the breaker
+    - reset_seconds: how long the breaker stays open before one trial call
+    """
+
+    def __init__(self, name: str, deadline: float, hedge_after: float | None = None, hedge_min: float = 0.05,
+                 hedge_max: float | None = None, max_attempts: int = 2, failure_threshold: int = 5,
+                 reset_seconds: float = 30.0):
+        self.name = name
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        self.hedge_min = hedge_min
+        self.hedge_max = hedge_max if hedge_max is not None else deadline / 2
+        self.max_attempts = max_attempts
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._latencies = deque(maxlen=HEDGE_WINDOW)
+        self._failures = 0            # Consecutive
+        self._opened_at = None        # Set while the breaker is open / half-open
+        self._trial_running = False   # Half-open: the single call let through
+        self._lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "deadline_exceeded": 0,
+            "short_circuited": 0,
+            "hedges_fired": 0,
+            "hedges_won": 0,
+            "retries": 0,
+            "breaker_opened": 0,
+            "fallbacks": 0,
+        }
+        with _policies_lock:
+            _policies[name] = self
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def hedge_delay(self) -> float | None:
+        """Seconds before a duplicate request goes out (None: never)"""
+        if self.hedge_after is None or self.max_attempts < 2:
+            return None
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return self.hedge_after
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        return min(max(p95, self.hedge_min), self.hedge_max)
+
+    def call(self, fn, *args, discard=None, **kwargs):
+        """
+        Runs fn(*args, **kwargs) under the deadline, hedging and breaker.
+
+        Parameters:
+        - fn: the request; raise on failure (a bad status code counts too)
+        - discard: optional fn(result) for results that lost the race (close streams etc.)
+
+        Returns:
+        - the first successful attempt's result
+
+        Raises:
+        - Unavailable (CircuitOpen / DeadlineExceeded / the last attempt's error as the cause)
+        - Cancelled if the caller's turn was cancelled meanwhile
+        """
+        trial = self._admit()
+        parent = current_token()
+        start = time.perf_counter()
+        deadline = start + self.deadline
+        hedge = None if trial else self.hedge_delay()
+        attempts = {}    # future -> (why it was launched: "first" / "hedge" / "retry", token)
+        error = None
+
+        def launch(reason):
+            token = CancellationToken()
+            unlink = parent.on_cancel(lambda: token.cancel("cancelled")) if parent is not None else None
+            future = _executor.submit(contextvars.copy_context().run, self._attempt, token, fn, args, kwargs)
+            if unlink is not None:
+                future.add_done_callback(lambda _: unlink())
+            attempts[future] = (reason, token)
+
+        def abandon(winner=None):
+            for future, (_, token) in attempts.items():
+                if future is winner:
+                    continue
+                token.cancel("abandoned")
+                if discard is not None:
+                    future.add_done_callback(lambda f: discard(f.result()) if f.exception() is None else None)
+
+        launch("first")
+        pending = set(attempts)
+        try:
+            while True:
+                if parent is not None:
+                    parent.raise_if_cancelled()
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                next_event = deadline
+                if hedge is not None and len(attempts) < self.max_attempts:
+                    next_event = min(next_event, start + hedge)
+                    if now >= start + hedge:
+                        self._count("hedges_fired")
+                        print(f"⏱️ {self.name} slower than {hedge * 1000:.0f} ms, sending a hedged request")
+                        launch("hedge")
+                        pending = {f for f in attempts if not f.done()}
+                        continue
+                done, pending = wait(pending, timeout=min(max(next_event - now, 0), POLL_SECONDS),
+                                     return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        # Only a request sent by the hedge timer wins as a hedge, not a retry after a fast failure
+                        reason, _ = attempts[future]
+                        self._succeeded(time.perf_counter() - start, hedged=reason == "hedge", trial=trial)
+                        abandon(winner=future)
+                        return future.result()
+                    error = future.exception()
+                if not pending:
+                    if len(attempts) >= self.max_attempts or trial:
+                        break
+                    # Failed fast: don't sit out the hedge delay, try again now
+                    self._count("retries")
+                    launch("retry")
+                    pending = {f for f in attempts if not f.done()}
+        except Cancelled:
+            abandon()
+            with self._lock:
+                self._trial_running = False
+            raise
+
+        abandon()
+        timed_out = bool(pending)
+        self._failed(trial, timed_out=timed_out)
+        elapsed = time.perf_counter() - start
+        record(f"{self.name}.unavailable", elapsed, timed_out=timed_out)
+        if timed_out:
+            raise DeadlineExceeded(f"{self.name} gave no answer within {self.deadline:.1f}s") from error
+        raise Unavailable(f"{self.name} failed: {error}") from error
+
+    def record_fallback(self) -> None:
+        """Counts a call the caller answered from its fallback"""
+        self._count("fallbacks")
+
+    def reset(self) -> None:
+        """Closes the breaker and forgets latencies (tests, benchmarks)"""
+        with self._lock:
+            self._latencies.clear()
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["state"] = self._state()
+            snapshot["consecutive_failures"] = self._failures
+        delay = self.hedge_delay()
+        snapshot["hedge_delay_seconds"] = delay
+        snapshot["hedge_win_rate"] = (snapshot["hedges_won"] / snapshot["hedges_fired"]
+                                      if snapshot["hedges_fired"] else None)
+        return snapshot
+
+    # ─── Internals ───
+
+    def _attempt(self, token, fn, args, kwargs):
+        with cancel_scope(token):
+            return fn(*args, **kwargs)
+
+    def _state(self) -> str:
+        # Called with the lock held
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.reset_seconds:
+            return "open"
+        return "half_open"
+
+    def _admit(self) -> bool:
+        # Raises CircuitOpen while the breaker is open; True for a half-open trial call
+        with self._lock:
+            self._stats["calls"] += 1
+            state = self._state()
+            if state == "closed":
+                return False
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            self._stats["short_circuited"] += 1
+        raise CircuitOpen(f"{self.name} circuit is open")
+
+    def _succeeded(self, elapsed, hedged, trial):
+        with self._lock:
+            self._latencies.append(elapsed)
+            self._stats["successes"] += 1
+            self._stats["hedges_won"] += int(hedged)
+            self._failures = 0
+            if trial:
+                print(f"✅ {self.name} is answering again, closing the circuit")
+            self._opened_at = None
+            self._trial_running = False
+        record(f"{self.name}.call", elapsed, hedged=hedged)
+
+    def _failed(self, trial, timed_out):
+        with self._lock:
+            self._stats["failures"] += 1
+            self._stats["deadline_exceeded"] += int(timed_out)
+            self._failures += 1
+            self._trial_running = False
+            if trial or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self._stats["breaker_opened"] += 1
+                print(f"🔌 {self.name} failed {self._failures} times in a row, "
+                      f"circuit open for {self.reset_seconds:.0f}s")
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+
+def get_resilience_metrics() -> dict:
+    """Per-provider calls, hedges, deadline misses and breaker state"""
+    with _policies_lock:
+        policies = dict(_policies)
+    return {name: policy.stats() for name, policy in policies.items()}
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import wave
+from collections import OrderedDict
+
+from audio_buffer import AudioBuffer
+
+
+def normalize_transcript(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace ("What's your name?" -> "whats your name")."""
+    text = re.sub(r"[^\w\s]", "", text.lower())
+    return " ".join(text.split())
+
+
+class ResponseCache:
+    """
+    Content-addressed cache of Claude answers and their synthesized speech.
+
+    Entries are keyed on the normalized transcript plus the voice/model
+    settings that produced them. Recent entries live in memory (bounded by
+    count); everything is also written to cache_dir as <key>.wav plus an
+    index.json, evicted least-recently-used once the WAVs exceed max_disk_bytes.
+
+    Parameters:
+    - cache_dir: where WAVs and the index are stored
+    - max_memory_items: entries kept decoded in memory
+    - max_disk_bytes: total WAV bytes kept on disk
+    """
+
+    def __init__(self, cache_dir: str, max_memory_items: int = 32, max_disk_bytes: int = 200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._memory = OrderedDict()   # key -> (text, AudioBuffer)
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(cache_dir, "index.json")
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._load_index()   # key -> {"text", "bytes", "last_used"}
+
+    @staticmethod
+    def key(transcript: str, **settings) -> str:
+        """Cache key for a transcript under the given voice/model settings."""
+        material = json.dumps({"text": normalize_transcript(transcript), **settings}, sort_keys=True)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> tuple[str, AudioBuffer] | None:
+        """(response text, speech) for a key, or None on a miss."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._touch(key)
+                self.hits += 1
+                return entry
+
+            meta = self._index.get(key)
+            if meta is None:
+                self.misses += 1
+                return None
+            try:
+                audio = AudioBuffer.from_wav(self._wav_path(key))
+            except (OSError, EOFError, ValueError, wave.Error):
+                # WAV went missing or is corrupt; forget about it
+                self._index.pop(key, None)
+                self._save_index()
+                self.misses += 1
+                return None
+
+            entry = (meta["text"], audio)
+            self._remember(key, entry)
+            self._touch(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, text: str, audio: AudioBuffer) -> None:
+        """Stores an answer and its speech in memory and on disk."""
+        with self._lock:
+            wav_path = audio.write_wav(self._wav_path(key))
+            self._index[key] = {
+                "text": text,
+                "bytes": os.path.getsize(wav_path),
+                "last_used": time.time(),
+            }
+            self._remember(key, (text, audio))
+            self._evict_disk()
+            self._save_index()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "disk_entries": len(self._index),
+                "disk_bytes": sum(meta["bytes"] for meta in self._index.values()),
+            }
+
+    # ─── Internals (call with the lock held) ───
+
+    def _wav_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.wav")
+
+    def _remember(self, key, entry) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _touch(self, key) -> None:
+        if key in self._index:
+            self._index[key]["last_used"] = time.time()
+
+    def _evict_disk(self) -> None:
+        total = sum(meta["bytes"] for meta in self._index.values())
+        for key in sorted(self._index, key=lambda k: self._index[k]["last_used"]):
+            if total <= self.max_disk_bytes:
+                break
+            total -= self._index.pop(key)["bytes"]
+            self._memory.pop(key, None)
+            self.evictions += 1
+            try:
+                os.remove(self._wav_path(key))
+            except OSError:
+                pass
+
+    def _load_index(self) -> dict:
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self) -> None:
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self._index_path)
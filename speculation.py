@@ -0,0 +1,238 @@
+import contextvars
+import re
+import threading
+import time
+
+from cancellation import CancellationToken, cancel_scope, current_token
+
+# Speculative LLM calls: once the streaming transcript has stopped changing
+# for a moment, start Claude on it while the endpointer is still waiting out
+# the trailing silence. If the final transcript says the same thing, the
+# answer is already underway; if not, the guess is cancelled and the real
+# request goes out as usual.
+
+DEFAULT_STABLE_SECONDS = 0.6   # Partial must be unchanged this long before we guess
+DEFAULT_MIN_WORDS = 2          # Don't guess on "um" or a lone "what"
+
+# Hit rate and time saved, exposed through get_speculation_metrics()
+_metrics_lock = threading.Lock()
+_metrics = {
+    "started": 0,
+    "hits": 0,
+    "misses": 0,            # Final transcript differed; guess cancelled, request re-issued
+    "superseded": 0,        # Partial changed again before the recording ended
+    "saved_seconds_total": 0.0,
+    "wasted_seconds_total": 0.0,
+}
+
+_PUNCTUATION = re.compile(r"[^\w\s']")
+
+
+def normalize_transcript(text: str) -> str:
+    """Lowercase, no punctuation, single spaces: what has to match for a hit"""
+    return " ".join(_PUNCTUATION.sub(" ", text.lower()).split())
+
+
+class Speculation:
+    """
+    One speculative Claude call, streaming on its own thread.
+
+    deltas() replays what has been generated so far and then follows the
+    live stream, so a hit can be handed to the sentence pipeline as if the
+    call had just been made (including an IncompleteResponse at the end).
+    """
+
+    def __init__(self, text: str, stream, on_done=None):
+        self.text = text
+        self.key = normalize_transcript(text)
+        self.token = CancellationToken()
+        self.started = time.perf_counter()
+        self.finished = None
+        self._deltas = []
+        self._done = False
+        self.error = None   # What the stream raised, re-raised by deltas() after the last delta
+        self._on_done = on_done
+        self._cond = threading.Condition()
+        # Copy the caller's context so the call's spans join the conversation's trace
+        self._thread = threading.Thread(
+            target=contextvars.copy_context().run, args=(self._run, stream), name="speculative-llm", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def response(self) -> str:
+        with self._cond:
+            return "".join(self._deltas).strip()
+
+    def deltas(self):
+        """Yields every text delta, waiting for new ones until the call is done"""
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self._deltas) and not self._done:
+                    self._cond.wait()
+                if index >= len(self._deltas):
+                    if self.error is not None:
+                        raise self.error
+                    return
+                delta = self._deltas[index]
+            index += 1
+            yield delta
+
+    def result(self) -> str:
+        """Waits for the whole response"""
+        return "".join(self.deltas()).strip()
+
+    def _run(self, stream):
+        with cancel_scope(self.token):
+            try:
+                for delta in stream(self.text):
+                    with self._cond:
+                        self._deltas.append(delta)
+                        self._cond.notify_all()
+            except Exception as e:
+                self.error = e
+            finally:
+                with self._cond:
+                    self._done = True
+                    self.finished = time.perf_counter()
+                    self._cond.notify_all()
+                if self._on_done:
+                    self._on_done(self)
+
+
+class SpeculativeResponder:
+    """
+    Starts Claude on the partial transcript once it has been stable for
+    `stable_seconds`, then commits or throws the guess away at resolve().
+
+    Feed it every partial with update(); call resolve(final_text) when the
+    transcript is final. One speculation runs at a time: a partial that
+    changes cancels it and restarts the stability timer. Created inside a
+    conversation's cancel_scope(), a barge-in cancels the speculation too.
+
+    Parameters:
+    - stream: text -> iterable of response deltas (e.g. stream_claude_response with remember=False)
+    - on_commit: fn(user_text, response), called once a committed answer has finished (e.g. memory.add_turn)
+    - stable_seconds: how long the partial must stay the same before we guess
+    - min_words: shortest partial worth guessing on
+    """
+
+    def __init__(self, stream, on_commit=None, stable_seconds: float = DEFAULT_STABLE_SECONDS,
+                 min_words: int = DEFAULT_MIN_WORDS):
+        self.stream = stream
+        self.on_commit = on_commit
+        self.stable_seconds = stable_seconds
+        self.min_words = min_words
+        self.speculation = None
+        self._key = ""
+        self._timer = None
+        self._committed = None    # (user_text, speculation) once resolve() hits
+        self._closed = False
+        self._lock = threading.Lock()
+        self._context = contextvars.copy_context()
+        parent = current_token()
+        if parent is not None:
+            parent.on_cancel(self.close)
+
+    def update(self, partial: str) -> None:
+        """New partial transcript from the streaming transcriber"""
+        key = normalize_transcript(partial)
+        with self._lock:
+            if self._closed or key == self._key:
+                return
+            self._key = key
+            if self._timer is not None:
+                self._timer.cancel()
+            if self.speculation is not None and self.speculation.key != key:
+                self._drop("superseded")
+            if len(key.split()) < self.min_words:
+                return
+            self._timer = threading.Timer(self.stable_seconds, self._context.copy().run, args=(self._fire, key, partial))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def resolve(self, final_text: str) -> Speculation | None:
+        """
+        Commits the running guess if it matches the final transcript.
+
+        Returns:
+        - the Speculation to take the answer from (read it with deltas() or
+          result()), or None on a miss: re-issue the request as usual
+        """
+        key = normalize_transcript(final_text)
+        with self._lock:
+            self._closed = True
+            if self._timer is not None:
+                self._timer.cancel()
+            speculation = self.speculation
+            if speculation is None:
+                return None
+            if speculation.key != key:
+                self._drop("misses")
+                return None
+            self._committed = (final_text, speculation)
+
+        now = time.perf_counter()
+        saved = min(now, speculation.finished or now) - speculation.started
+        with _metrics_lock:
+            _metrics["hits"] += 1
+            _metrics["saved_seconds_total"] += saved
+        print(f"🔮 Speculative answer hit, {saved:.2f}s head start")
+        if speculation.finished is not None:
+            self._commit(speculation)
+        return speculation
+
+    def close(self) -> None:
+        """Cancels any guess that hasn't been committed (cache hit, barge-in, failure)"""
+        with self._lock:
+            self._closed = True
+            if self._timer is not None:
+                self._timer.cancel()
+            if self._committed is not None:
+                speculation = self._committed[1]
+                if speculation.finished is None:
+                    speculation.token.cancel("cancelled")
+            elif self.speculation is not None:
+                self._drop("wasted")
+
+    def _fire(self, key: str, partial: str) -> None:
+        with self._lock:
+            if self._closed or key != self._key or self.speculation is not None:
+                return
+            print(f"🔮 Speculating on stable partial: '{partial}'")
+            self.speculation = Speculation(partial, self.stream, on_done=self._commit)
+        with _metrics_lock:
+            _metrics["started"] += 1
+
+    def _drop(self, outcome: str) -> None:
+        # Called with the lock held: cancel the current guess and count it
+        speculation, self.speculation = self.speculation, None
+        speculation.token.cancel(outcome)
+        with _metrics_lock:
+            if outcome in ("misses", "superseded"):
+                _metrics[outcome] += 1
+            _metrics["wasted_seconds_total"] += (speculation.finished or time.perf_counter()) - speculation.started
+
+    def _commit(self, speculation: Speculation) -> None:
+        # Runs once the committed call has finished (from resolve() or the call's own thread)
+        with self._lock:
+            if self._committed is None or self._committed[1] is not speculation:
+                return
+            user_text, _ = self._committed
+            self._committed = (None, speculation)   # Only once
+        if user_text is None or speculation.token.cancelled or speculation.error or not self.on_commit:
+            return
+        response = speculation.response
+        if response:
+            self.on_commit(user_text, response)
+
+
+def get_speculation_metrics() -> dict:
+    """Speculative call outcomes, hit rate and latency saved / spent"""
+    with _metrics_lock:
+        snapshot = dict(_metrics)
+    resolved = snapshot["hits"] + snapshot["misses"]
+    snapshot["hit_rate"] = snapshot["hits"] / resolved if resolved else None
+    snapshot["avg_saved_seconds"] = snapshot["saved_seconds_total"] / snapshot["hits"] if snapshot["hits"] else None
+    return snapshot
@@ -0,0 +1,166 @@
+import contextvars
+import queue
+import re
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor, wait
+
+from audio_buffer import AudioBuffer
+from cancellation import count, current_token
+from claude_integration import IncompleteResponse
+from tts import synthesize_to_buffer
+
+# End of a sentence: terminal punctuation (plus closing quotes/brackets) followed by whitespace
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*(?=\s)')
+
+
+def split_sentences(deltas, min_chars: int = 20):
+    """
+    Regroups a stream of LLM text deltas into whole sentences.
+
+    Fragments shorter than min_chars ("Hi!") are merged into the next
+    sentence so we don't pay a TTS round trip for a single word.
+
+    Parameters:
+    - deltas: iterable of text pieces as they arrive from the model
+    - min_chars: shortest sentence worth synthesizing on its own
+
+    Yields:
+    - sentences, in order
+    """
+    buffer = ""
+    for delta in deltas:
+        buffer += delta
+        while True:
+            match = next((m for m in SENTENCE_END.finditer(buffer) if m.end() >= min_chars), None)
+            if match is None:
+                break
+            sentence = buffer[:match.end()].strip()
+            buffer = buffer[match.end():].lstrip()
+            if sentence:
+                yield sentence
+    if buffer.strip():
+        yield buffer.strip()
+
+
+class SentencePipeline:
+    """
+    Sends each sentence to TTS as soon as the LLM finishes writing it.
+
+    Sentences are synthesized concurrently on a small thread pool, but audio()
+    always hands the results back in sentence order, so time to first audio
+    is one sentence of LLM + TTS instead of the whole response.
+
+    Created inside a cancel_scope(), a cancelled turn stops feeding,
+    cancels sentences still waiting for TTS and ends audio() right away.
+
+    A source that raises IncompleteResponse ends the response early: what it
+    wrote is still spoken, but `complete` stays False, as it does when a
+    sentence's TTS fails, so a cut-short answer never gets cached.
+
+    Parameters:
+    - sentences: iterable of sentences (e.g. split_sentences(stream_claude_response(...)))
+    - synthesize: text -> AudioBuffer (or None on failure)
+    - max_workers: concurrent TTS requests
+    - on_sentence: optional callback with the response text so far
+    """
+
+    def __init__(self, sentences, synthesize=synthesize_to_buffer, max_workers: int = 3, on_sentence=None):
+        self.sentences = []
+        self.time_to_first_audio = None
+        self._synthesize = synthesize
+        self._on_sentence = on_sentence
+        self._start = time.perf_counter()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts")
+        self._futures = queue.Queue()   # Futures in sentence order; None marks the end
+        self._submitted = []
+        self._played = 0
+        self._missing = 0               # Sentences whose TTS returned nothing
+        self._source_finished = False   # The sentence source ran to its end
+        self._error = None
+        self._token = current_token()
+        self._unregister = self._token.on_cancel(self._discard) if self._token else (lambda: None)
+        # Run the feeder and TTS calls in the caller's context so their spans join its trace
+        self._feeder = threading.Thread(
+            target=contextvars.copy_context().run, args=(self._feed, sentences), daemon=True
+        )
+        self._feeder.start()
+
+    @property
+    def text(self) -> str:
+        """Response text produced so far (the full response once audio() is exhausted)."""
+        return " ".join(self.sentences)
+
+    @property
+    def complete(self) -> bool:
+        """True once audio() has yielded every sentence of a response that finished cleanly."""
+        return (self._source_finished and not self.cancelled and not self._missing
+                and self._played == len(self.sentences))
+
+    @property
+    def cancelled(self) -> bool:
+        return self._token is not None and self._token.cancelled
+
+    def _feed(self, sentences) -> None:
+        try:
+            for sentence in sentences:
+                if self.cancelled:
+                    break
+                self.sentences.append(sentence)
+                if self._on_sentence:
+                    self._on_sentence(self.text)
+                future = self._executor.submit(contextvars.copy_context().run, self._synthesize, sentence)
+                self._submitted.append(future)
+                self._futures.put(future)
+            self._source_finished = not self.cancelled
+        except IncompleteResponse as e:
+            print(f"⚠️ Response cut short, speaking what we have: {e}")
+        except Exception as e:
+            if not self.cancelled:   # Submitting after _discard() shut the pool down
+                self._error = e
+        finally:
+            self._futures.put(None)
+
+    def _discard(self) -> None:
+        # Barge-in: drop sentences that haven't reached TTS yet and wake up audio()
+        for future in list(self._submitted):
+            future.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._futures.put(None)
+
+    def audio(self):
+        """Yields each sentence's AudioBuffer in order, as soon as it's ready."""
+        try:
+            while True:
+                future = self._futures.get()
+                if future is None or self.cancelled:
+                    break
+                # A sentence already at ElevenLabs can't be cancelled; stop waiting for it instead
+                while not future.done() and not self.cancelled:
+                    wait([future], timeout=0.05)
+                if self.cancelled:
+                    break
+                try:
+                    speech = future.result()
+                except CancelledError:
+                    break   # Discarded by a barge-in while we waited
+                self._played += 1
+                if speech is None:
+                    self._missing += 1
+                    continue
+                if self.time_to_first_audio is None:
+                    self.time_to_first_audio = time.perf_counter() - self._start
+                    print(f"First sentence audio ready after {self.time_to_first_audio:.2f}s")
+                yield speech
+        finally:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._unregister()
+            if self.cancelled:
+                count("sentences_discarded", len(self.sentences) - self._played)
+        if self._error is not None:
+            raise self._error
+
+    def assemble(self) -> AudioBuffer | None:
+        """Waits for every sentence and joins the audio in order (for file-based playback)."""
+        parts = list(self.audio())
+        return AudioBuffer.concatenate(parts) if parts else None
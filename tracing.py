@@ -0,0 +1,194 @@
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+# Where finished traces go: "stdout" (default), "off", or a JSONL file path
+TRACE_LOG = os.getenv("TRACE_LOG", "stdout")
+HISTOGRAM_SAMPLES = 1024   # Recent durations kept per span name for percentiles
+
+# The span that's open in the current thread/context (None outside a trace)
+_current = contextvars.ContextVar("current_span", default=None)
+
+# Span name -> recent durations + running totals, exposed through get_trace_metrics()
+_histograms = {}
+_histograms_lock = threading.Lock()
+_log_lock = threading.Lock()
+
+
+class Span:
+    """One timed stage. The outermost span of a trace collects all of its children."""
+
+    def __init__(self, name: str, parent: "Span | None" = None, attrs: dict | None = None):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent = parent
+        self.root = parent.root if parent else self
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.attrs = dict(attrs or {})
+        self.start = time.perf_counter()
+        self.started_at = time.time()
+        self.duration = None
+        self.error = None
+        self._finished = []   # Root only: every finished span in the trace
+        self._lock = threading.Lock()
+
+    def set(self, **attrs) -> None:
+        """Attach extra attributes (e.g. status, cache hit) to the span."""
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "start_ms": round((self.start - self.root.start) * 1000.0, 2),
+            "duration_ms": round(self.duration * 1000.0, 2),
+            "attrs": self.attrs,
+            "error": self.error,
+        }
+
+    def _finish(self, duration: float) -> None:
+        self.duration = duration
+        _observe(self.name, duration)
+        with self.root._lock:
+            self.root._finished.append(self)
+
+
+@contextmanager
+def trace(name: str, **attrs):
+    """
+    Starts a new trace: times the block and, when it ends, writes the block
+    plus every span opened inside it as one JSON log line.
+
+    Parameters:
+    - name: what is being traced, e.g. "conversation"
+    - attrs: extra fields to log with the trace (session id, options, ...)
+
+    Yields:
+    - the root Span, so callers can .set() more attributes
+    """
+    root = Span(name, None, attrs)
+    try:
+        with _timed(root):
+            yield root
+    finally:
+        _emit(root)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Times a block as a child of the current trace.
+
+    Outside a trace (e.g. a background decode thread) the duration still
+    lands in the per-name histogram, it just isn't logged.
+
+    Parameters:
+    - name: stage name, e.g. "whisper.inference" (also the histogram key)
+    - attrs: extra fields to log with the span
+
+    Yields:
+    - the Span, so callers can .set() more attributes
+    """
+    current = Span(name, _current.get(), attrs)
+    with _timed(current):
+        yield current
+
+
+def record(name: str, seconds: float, **attrs) -> None:
+    """
+    Records an already-measured duration as a finished span of the current trace.
+
+    For timings that don't fit a with-block, like time to first token
+    inside a generator.
+    """
+    finished = Span(name, _current.get(), attrs)
+    finished.start = time.perf_counter() - seconds
+    finished._finish(seconds)
+
+
+@contextmanager
+def _timed(current: Span):
+    token = _current.set(current)
+    try:
+        yield
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        current._finish(time.perf_counter() - current.start)
+
+
+def current_span() -> Span | None:
+    return _current.get()
+
+
+def get_trace_metrics() -> dict:
+    """p50/p95/p99 (over recent samples) plus totals for every span name."""
+    with _histograms_lock:
+        snapshot = {name: (list(h["samples"]), h["count"], h["total"], h["max"]) for name, h in _histograms.items()}
+
+    metrics = {}
+    for name, (samples, count, total, maximum) in sorted(snapshot.items()):
+        samples.sort()
+        metrics[name] = {
+            "count": count,
+            "avg_ms": total / count * 1000.0,
+            "max_ms": maximum * 1000.0,
+            "p50_ms": _percentile(samples, 50) * 1000.0,
+            "p95_ms": _percentile(samples, 95) * 1000.0,
+            "p99_ms": _percentile(samples, 99) * 1000.0,
+        }
+    return metrics
+
+
+def reset_metrics() -> None:
+    with _histograms_lock:
+        _histograms.clear()
+
+
+def _percentile(sorted_samples: list, pct: float) -> float:
+    # Nearest-rank percentile
+    index = max(0, min(len(sorted_samples) - 1, int(round(pct / 100.0 * len(sorted_samples))) - 1))
+    return sorted_samples[index]
+
+
+def _observe(name: str, seconds: float) -> None:
+    with _histograms_lock:
+        h = _histograms.get(name)
+        if h is None:
+            h = _histograms[name] = {"samples": deque(maxlen=HISTOGRAM_SAMPLES), "count": 0, "total": 0.0, "max": 0.0}
+        h["samples"].append(seconds)
+        h["count"] += 1
+        h["total"] += seconds
+        h["max"] = max(h["max"], seconds)
+
+
+def _emit(root: Span) -> None:
+    if TRACE_LOG == "off":
+        return
+    with root._lock:
+        spans = sorted(root._finished, key=lambda s: s.start)
+    line = json.dumps({
+        "trace_id": root.trace_id,
+        "name": root.name,
+        "timestamp": root.started_at,
+        "duration_ms": round(root.duration * 1000.0, 2),
+        "attrs": root.attrs,
+        "error": root.error,
+        "spans": [s.to_dict() for s in spans if s is not root],
+    }, default=str)
+
+    with _log_lock:
+        if TRACE_LOG == "stdout":
+            print(line, file=sys.stdout, flush=True)
+        else:
+            with open(TRACE_LOG, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
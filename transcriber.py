@@ -1,53 +1,374 @@
-from faster_whisper import WhisperModel
+import os
+import threading
+import time
+import wave
+from collections import OrderedDict
+from contextlib import nullcontext
 
-def transcribe_audio(transcribe_file: str) -> str:
+import numpy as np
+
+from audio_buffer import AudioBuffer, WHISPER_RATE
+from audio_preprocess import preprocess_for_whisper
+from lazy_imports import lazy_import
+from tracing import span
+
+# Imported on the first model load, not when this module is imported
+faster_whisper = lazy_import("faster_whisper", "pip install faster-whisper")
+
+# Default Whisper settings. "medium" is our sweet spot between speed and accuracy.
+DEFAULT_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "medium")
+GPU_COMPUTE_TYPE = "int8_float16"   # Quantized weights, fp16 activations on the GPU
+CPU_COMPUTE_TYPE = "int8"           # Best option when there's no CUDA device
+MAX_LOADED_MODELS = int(os.getenv("WHISPER_MAX_MODELS", "2"))  # Each model holds hundreds of MB
+TRANSCRIPT_PATH = "output/transcript.txt"
+
+# Process-wide model pool: (model_size, device, compute_type) -> WhisperModel
+# Oldest-used models are evicted once we go over MAX_LOADED_MODELS.
+_model_pool = OrderedDict()
+_pool_lock = threading.Lock()
+_override_model = None   # Set with set_model() to bypass the pool (stubs, benchmarks)
+
+# Load/inference timings, exposed through get_model_metrics()
+_metrics_lock = threading.Lock()
+_metrics = {
+    "loads": 0,
+    "evictions": 0,
+    "load_seconds_total": 0.0,
+    "last_load_seconds": None,
+    "inference_calls": 0,
+    "inference_seconds_total": 0.0,
+    "last_inference_seconds": None,
+    "max_inference_seconds": 0.0,
+}
+
+
+def cuda_available() -> bool:
+    """Returns True if CTranslate2 (faster-whisper's backend) can see a CUDA device."""
+    try:
+        import ctranslate2
+        return ctranslate2.get_cuda_device_count() > 0
+    except Exception:
+        return False
+
+
+def resolve_device(device: str | None = None, compute_type: str | None = None) -> tuple[str, str]:
     """
-    Transcribes audio using the faster-whisper 'large-v2' model with GPU support.
+    Picks the device/compute_type pair to load Whisper with.
+
+    Falls back to CPU with int8 weights when CUDA isn't available, so the
+    same code runs on a laptop without the NVIDIA stack installed.
+    """
+    if device is None:
+        device = "cuda" if cuda_available() else "cpu"
+    if compute_type is None:
+        compute_type = GPU_COMPUTE_TYPE if device == "cuda" else CPU_COMPUTE_TYPE
+    return device, compute_type
+
+
+def get_model(
+    model_size: str = DEFAULT_MODEL_SIZE,
+    device: str | None = None,
+    compute_type: str | None = None
+) -> "faster_whisper.WhisperModel":
+    """
+    Returns a shared WhisperModel, loading it the first time it's asked for.
 
     Parameters:
-    - transcribe_file: path to the audio file
+    - model_size: Whisper model name ("medium", "large-v2", ...)
+    - device: "cuda" or "cpu" (auto-detected when None)
+    - compute_type: CTranslate2 compute type (picked from the device when None)
+    """
+    if _override_model is not None:
+        return _override_model
+
+    key = (model_size,) + resolve_device(device, compute_type)
+
+    with _pool_lock:
+        model = _model_pool.get(key)
+        if model is not None:
+            _model_pool.move_to_end(key)
+            return model
+
+        print(f"Loading Whisper {key[0]} on {key[1]} with {key[2]}...")
+        start = time.perf_counter()
+        with span("whisper.load", model=key[0], device=key[1], compute_type=key[2]):
+            model = faster_whisper.WhisperModel(key[0], device=key[1], compute_type=key[2])
+        elapsed = time.perf_counter() - start
+        print(f"Whisper {key[0]} loaded in {elapsed:.2f}s")
+
+        _model_pool[key] = model
+        evicted = 0
+        while len(_model_pool) > MAX_LOADED_MODELS:
+            old_key, _ = _model_pool.popitem(last=False)
+            evicted += 1
+            print(f"Evicted Whisper model {old_key} from the pool")
+
+    with _metrics_lock:
+        _metrics["loads"] += 1
+        _metrics["evictions"] += evicted
+        _metrics["load_seconds_total"] += elapsed
+        _metrics["last_load_seconds"] = elapsed
+
+    return model
+
+
+def set_model(model) -> None:
+    """
+    Use one model for every request instead of the pool (e.g. a stub with
+    WhisperModel's transcribe() API). Pass None to go back to the pool.
+    """
+    global _override_model
+    with _pool_lock:
+        _override_model = model
+
+
+def warm_up(
+    model_size: str = DEFAULT_MODEL_SIZE,
+    device: str | None = None,
+    compute_type: str | None = None,
+    decode: bool = True
+) -> None:
+    """
+    Loads the model ahead of time so the first request doesn't pay for it.
+
+    With decode=True it also transcribes a second of silence, which sets up
+    the CUDA context and kernels that the first real decode would otherwise wait for.
+    """
+    model = get_model(model_size, device, compute_type)
+    if decode:
+        with span("whisper.warm_up_decode"):
+            segments, _ = model.transcribe(np.zeros(WHISPER_RATE, dtype=np.float32), beam_size=1)
+            list(segments)
+
+
+def loaded_models() -> list[tuple[str, str, str]]:
+    """Keys of the models currently held in the pool."""
+    with _pool_lock:
+        return list(_model_pool.keys())
+
+
+def get_model_metrics() -> dict:
+    """Snapshot of model load and inference timings."""
+    with _metrics_lock:
+        snapshot = dict(_metrics)
+    calls = snapshot["inference_calls"]
+    snapshot["avg_inference_seconds"] = snapshot["inference_seconds_total"] / calls if calls else None
+    snapshot["loaded_models"] = [list(key) for key in loaded_models()]
+    return snapshot
+
+
+def _record_inference(elapsed: float) -> None:
+    with _metrics_lock:
+        _metrics["inference_calls"] += 1
+        _metrics["inference_seconds_total"] += elapsed
+        _metrics["last_inference_seconds"] = elapsed
+        _metrics["max_inference_seconds"] = max(_metrics["max_inference_seconds"], elapsed)
+
+
+def transcribe_audio(
+    transcribe_file: str | AudioBuffer,
+    model_size: str = DEFAULT_MODEL_SIZE,
+    device: str | None = None,
+    compute_type: str | None = None
+) -> str:
+    """
+    Transcribes audio using a pooled faster-whisper model (GPU when available).
+
+    Parameters:
+    - transcribe_file: path to the audio file, or an in-memory AudioBuffer
+    - model_size / device / compute_type: which pooled model to use
 
     Returns:
     - segment_text: full transcription result
     """
 
-    print("Loading large-v2 model on GPU with float16...")
+    # Shared model, only loaded on the very first call (or at server warm-up)
+    model = get_model(model_size, device, compute_type)
+    #More accurate but much more slower: model_size="large-v2"
+
+    start = time.perf_counter()
 
-    # Load large-v2 model, cuda for GPU
-    model = WhisperModel("medium", device="cuda", compute_type="int8_float16")   
-    #use this once downloaded nvidia stuff
-    #model = WhisperModel("large-v2", device="cpu", compute_type="int8")
-    #More accurate but much more slower
+    # 16-bit WAVs are read directly instead of going through faster-whisper's generic decoder
+    if isinstance(transcribe_file, str) and transcribe_file.lower().endswith(".wav"):
+        try:
+            transcribe_file = AudioBuffer.from_wav(transcribe_file)
+        except (ValueError, wave.Error):
+            pass   # Other sample widths or non-PCM (float, A-law...): let faster-whisper decode it
 
-    # Transcribing, beam search looks at 5 possible outputs
-    segments, info = model.transcribe(transcribe_file, beam_size=1)
-    # segments = generator (start, end, text), info = tuple (language, language_probability)
+    # In-memory audio: resample to 16 kHz, remove DC, normalize and trim silence in one pass
+    if isinstance(transcribe_file, AudioBuffer):
+        with span("audio.preprocess"):
+            transcribe_file = preprocess_for_whisper(transcribe_file)
 
-    # def generate_segments(audio_path):
-    # waveform = load_audio(audio_path)
-    # audio_chunks = split_waveform(waveform)
+    with span("whisper.inference"):
+        # Transcribing, beam search looks at 5 possible outputs
+        segments, info = model.transcribe(transcribe_file, beam_size=1)
+        # segments = generator (start, end, text), info = tuple (language, language_probability)
 
-    # for chunk in audio_chunks:
-    #     text = transcribe(chunk)
-    #     yield Segment(start=..., end=..., text=text)
+        # def generate_segments(audio_path):
+        # waveform = load_audio(audio_path)
+        # audio_chunks = split_waveform(waveform)
 
-    print(f"Detected language: {info.language} ({info.language_probability * 100:.2f}% confidence from our model)")
+        # for chunk in audio_chunks:
+        #     text = transcribe(chunk)
+        #     yield Segment(start=..., end=..., text=text)
 
-    # Piecing together the text transcript
-    segment_text = ""
-    for segment in segments:
-        segment_text += " " + segment.text
+        print(f"Detected language: {info.language} ({info.language_probability * 100:.2f}% confidence from our model)")
+
+        # Piecing together the text transcript (segments decode lazily, so this is timed too)
+        segment_text = " ".join(segment.text for segment in segments)
+
+    _record_inference(time.perf_counter() - start)
 
     # Save transcription to file
-    with open("output/transcript.txt", "w", encoding="utf-8") as f:
-        f.write(segment_text.strip())
+    save_transcript(segment_text)
 
     return segment_text
 
 
+def save_transcript(text: str, path: str = TRANSCRIPT_PATH) -> None:
+    """Writes the final transcript to disk."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text.strip())
+
+
+# ─── Streaming transcription ───
+
+class StreamingTranscriber:
+    """
+    Transcribes audio while it is still being recorded.
+
+    feed() takes PCM chunks straight from the capture stream; a background
+    thread re-decodes the uncommitted audio every `step_seconds` and reports
+    a partial hypothesis. Once the buffer grows past `window_seconds`, segments
+    that ended well before the live edge are committed and their audio is
+    dropped, so the final decode in finish() never covers more than one
+    window no matter how long the user spoke.
+    """
+
+    def __init__(
+        self,
+        rate: int = 44100,
+        channels: int = 1,
+        model_size: str = DEFAULT_MODEL_SIZE,
+        device: str | None = None,
+        compute_type: str | None = None,
+        step_seconds: float = 1.0,
+        window_seconds: float = 15.0,
+        keep_seconds: float = 3.0,
+        on_partial=None,
+        decode_lock=None
+    ):
+        self.rate = rate
+        self.channels = channels
+        self.model = get_model(model_size, device, compute_type)
+        self.step_seconds = step_seconds
+        self.window_seconds = window_seconds
+        self.keep_seconds = keep_seconds      # Audio kept uncommitted for context
+        self.on_partial = on_partial
+        self.decode_lock = decode_lock or nullcontext()   # e.g. a GPU semaphore shared across sessions
+
+        self.committed = []                   # Finalized text pieces
+        self.partial = ""                     # Latest full hypothesis
+        self.audio_seconds = 0.0              # Total audio fed so far
+        self.final_latency = None             # finish() call -> final text, in seconds
+
+        self._buffer = np.zeros(0, dtype=np.float32)   # Uncommitted audio (native rate)
+        self._pending = []                             # Fed but not yet merged into _buffer
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._decode_loop, daemon=True)
+        self._thread.start()
+
+    def feed(self, chunk: bytes) -> None:
+        """Adds one PCM chunk from the capture stream (never blocks on decoding)."""
+        samples = AudioBuffer.from_pcm16(chunk, self.rate, self.channels).to_mono().to_float32().samples
+        with self._lock:
+            self._pending.append(samples)
+        self.audio_seconds += samples.size / self.rate
+
+    def finish(self) -> str:
+        """Stops streaming, decodes whatever is left and returns the full transcript."""
+        start = time.perf_counter()
+        self._closed.set()
+        self._thread.join()
+
+        self._merge_pending()
+        if self._buffer.size:
+            segments = self._decode(self._buffer)
+            self.committed.extend(segment.text.strip() for segment in segments)
+        text = " ".join(piece for piece in self.committed if piece)
+
+        self.final_latency = time.perf_counter() - start
+        self.partial = text
+        return text
+
+    def _merge_pending(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if pending:
+            self._buffer = np.concatenate([self._buffer] + pending)
+
+    def _decode(self, audio: np.ndarray) -> list:
+        with self.decode_lock, span("whisper.decode", audio_seconds=round(audio.size / self.rate, 2)):
+            start = time.perf_counter()
+            # No trimming: segment timestamps have to line up with the buffer for commits
+            whisper_input = preprocess_for_whisper(AudioBuffer(audio, self.rate), trim=False)
+            segments, _ = self.model.transcribe(whisper_input, beam_size=1)
+            segments = list(segments)
+            _record_inference(time.perf_counter() - start)
+        return segments
+
+    def _decode_loop(self) -> None:
+        decoded_samples = 0
+        step_samples = int(self.step_seconds * self.rate)
+
+        while not self._closed.wait(self.step_seconds):
+            self._merge_pending()
+            if self._buffer.size - decoded_samples < step_samples:
+                continue
+            decoded_samples = self._buffer.size
+
+            segments = self._decode(self._buffer)
+
+            # Commit segments that ended well before the live edge once the window is full
+            if self._buffer.size > self.window_seconds * self.rate:
+                cutoff = self._buffer.size / self.rate - self.keep_seconds
+                done = [segment for segment in segments if segment.end <= cutoff]
+                if done:
+                    self.committed.extend(segment.text.strip() for segment in done)
+                    drop = int(done[-1].end * self.rate)
+                    self._buffer = self._buffer[drop:]
+                    decoded_samples = max(0, decoded_samples - drop)
+                    segments = segments[len(done):]
+
+            pieces = self.committed + [segment.text.strip() for segment in segments]
+            self.partial = " ".join(piece for piece in pieces if piece)
+            if self.on_partial:
+                self.on_partial(self.partial)
+
+
+def transcribe_stream(chunks, rate: int = 44100, channels: int = 1, on_partial=None, **kwargs) -> str:
+    """
+    Transcribes an iterable of PCM chunks (e.g. recorder.stream_audio) as it is captured.
+
+    Returns:
+    - the final transcript, also saved to output/transcript.txt
+    """
+    transcriber = StreamingTranscriber(rate, channels, on_partial=on_partial, **kwargs)
+    for chunk in chunks:
+        transcriber.feed(chunk)
+    text = transcriber.finish()
+    print(f"Final transcript ready {transcriber.final_latency:.2f}s after speech ended")
+
+    save_transcript(text)
+    return text
+
+
 # ✅ Test mode: only runs when we run this file directly
 if __name__ == "__main__":
     test_file = "output/tts_output.mp3"  # 👈 change if testing other files
     print("Transcribing:", test_file)
     result = transcribe_audio(test_file)
     print("\n Final Transcription:\n" + result)
+    print("Metrics:", get_model_metrics())
@@ -1,29 +1,50 @@
-import requests
+import itertools
 import os
+import tempfile
+import time
 from dotenv import load_dotenv
-from pydub import AudioSegment
+
+from audio_buffer import AudioBuffer
+from cancellation import Cancelled, abort_on_cancel, is_cancelled
+from lazy_imports import lazy_import
+from resilience import Resilient, Unavailable
+from tracing import record, span
+
+requests = lazy_import("requests")   # Deferred until the first synthesis call
 
 
 # 🟡 Load variables from the .env file
 load_dotenv()
 API_KEY = os.getenv("ELEVENLABS_API_KEY")
 VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID")
+API_BASE = os.getenv("ELEVENLABS_API_URL", "https://api.elevenlabs.io")
+TTS_MODEL_ID = "eleven_turbo_v2"
 
-def synthesize_speech(text: str, output_path: str = "output/tts_output.mp3") -> None:
-    """
-    Converts text into speech using ElevenLabs Turbo v2.5 API and saves it.
+# ElevenLabs can send raw 16-bit mono PCM, which saves an MP3 decode per answer
+TTS_SAMPLE_RATE = 22050
+STREAM_CHUNK_MS = 100   # Audio per chunk handed downstream while streaming
 
-    Parameters:
-    - text: The text to convert to speech.
-    - output_path: File path to save the MP3 audio output.
-    """
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+# Per-call limits: a hung ElevenLabs request used to hang the conversation
+CONNECT_TIMEOUT = 3.05
+TTS_DEADLINE = float(os.getenv("ELEVENLABS_DEADLINE", "10"))          # Whole response
+TTS_FIRST_CHUNK_DEADLINE = float(os.getenv("ELEVENLABS_FIRST_CHUNK_DEADLINE", "4"))
+
+# Hedged + circuit-broken calls; the stream policy hedges on time to the first chunk
+elevenlabs = Resilient("elevenlabs", deadline=TTS_DEADLINE, hedge_after=3.0)
+elevenlabs_stream = Resilient("elevenlabs.stream", deadline=TTS_FIRST_CHUNK_DEADLINE, hedge_after=1.0)
+
+# Windows SAPI output format / open mode constants
+SAPI_22KHZ_16BIT_MONO = 22
+SAPI_CREATE_FOR_WRITE = 3
+
+
+class TTSError(Exception):
+    """ElevenLabs answered with an error status"""
 
-    if not API_KEY or not VOICE_ID:
-        print("Missing API key or Voice ID. Check your .env file.")
-        return
 
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}"
+def _tts_request(text: str) -> tuple[str, dict, dict]:
+    """URL, headers and JSON body for an ElevenLabs text-to-speech call."""
+    url = f"{API_BASE}/v1/text-to-speech/{VOICE_ID}"
 
     headers = {
         "xi-api-key": API_KEY,
@@ -31,52 +52,295 @@ def synthesize_speech(text: str, output_path: str = "output/tts_output.mp3") ->
     }
 
     payload = {
-        "model_id": "eleven_turbo_v2",  
+        "model_id": TTS_MODEL_ID,
         "text": text,
         "voice_settings": {
             "stability": 0.5,
             "similarity_boost": 0.75
         }
     }
+    return url, headers, payload
 
-   
 
-    print("Sending text to ElevenLabs Turbo API...")
+def _read_body(response) -> bytes | None:
+    """Whole response body, or None if a barge-in closed the connection mid-download."""
+    try:
+        return response.content
+    except Exception:
+        if is_cancelled():
+            return None
+        raise
+
+
+def _fetch(text: str, params: dict | None = None) -> bytes | None:
+    """
+    One ElevenLabs request (run by the elevenlabs policy, possibly twice).
+
+    Returns:
+    - the response body, or None if the attempt was cancelled mid-download
+
+    Raises:
+    - TTSError on a non-200 answer, requests errors on timeouts / connection failures
+    """
+    url, headers, payload = _tts_request(text)
+
+    with span("tts.http", chars=len(text)) as http:
+        # Body streamed so a barge-in (or a hedge that lost) can drop the connection mid-download
+        with requests.post(
+            url,
+            headers=headers,
+            json=payload,
+            params=params,
+            stream=True,
+            timeout=(CONNECT_TIMEOUT, TTS_DEADLINE)
+        ) as response, abort_on_cancel(response.close):
+            if response.status_code != 200:
+                http.set(status=response.status_code)
+                raise TTSError(f"Error {response.status_code}: {response.text}")
+            body = _read_body(response)
+        http.set(status=response.status_code, bytes=len(body or b""), cancelled=body is None)
+    return body
+
+
+def _open_stream(text: str, chunk_bytes: int):
+    """Starts a streaming request and waits for its first chunk: (response, chunk iterator, first chunk)."""
+    url, headers, payload = _tts_request(text)
+    response = requests.post(
+        f"{url}/stream",
+        headers=headers,
+        json=payload,
+        params={"output_format": f"pcm_{TTS_SAMPLE_RATE}"},
+        stream=True,
+        timeout=(CONNECT_TIMEOUT, TTS_FIRST_CHUNK_DEADLINE)
+    )
+    try:
+        if response.status_code != 200:
+            raise TTSError(f"Error {response.status_code}: {response.text}")
+        chunks = response.iter_content(chunk_size=chunk_bytes)
+        with abort_on_cancel(response.close):
+            first = next(chunks, b"")
+    except Exception:
+        response.close()
+        raise
+    return response, chunks, first
+
+
+def local_voice(text: str) -> AudioBuffer | None:
+    """
+    Speaks text with the Windows SAPI voice, no network needed.
+
+    The avatar PC already has pywin32; anywhere else this returns None.
+
+    Returns:
+    - AudioBuffer at TTS_SAMPLE_RATE, or None if SAPI isn't available
+    """
+    try:
+        import pythoncom
+        import win32com.client
+    except ImportError:
+        return None
+
+    pythoncom.CoInitialize()   # COM is per thread and TTS runs on pool threads
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "fallback.wav")
+            audio_format = win32com.client.Dispatch("SAPI.SpAudioFormat")
+            audio_format.Type = SAPI_22KHZ_16BIT_MONO
+            stream = win32com.client.Dispatch("SAPI.SpFileStream")
+            stream.Format = audio_format
+            stream.Open(path, SAPI_CREATE_FOR_WRITE)
+            voice = win32com.client.Dispatch("SAPI.SpVoice")
+            voice.AudioOutputStream = stream
+            voice.Speak(text)
+            stream.Close()
+            return AudioBuffer.from_wav(path)
+    except Exception as e:
+        print(f"⚠️ Local fallback voice failed: {e}")
+        return None
+    finally:
+        pythoncom.CoUninitialize()
+
+
+# What speaks while ElevenLabs is unreachable (see set_fallback_voice)
+_fallback_voice = local_voice
+
+
+def set_fallback_voice(voice):
+    """
+    Swap the voice used when ElevenLabs is unavailable (text -> AudioBuffer or None).
+    Pass None to stay silent instead.
+    """
+    global _fallback_voice
+    _fallback_voice = voice
+
 
-    response = requests.post(url, headers=headers, json=payload)
+def fallback_speech(text: str, policy: Resilient = elevenlabs) -> AudioBuffer | None:
+    """Speech from the fallback voice (counted against policy), or None if there is none."""
+    if _fallback_voice is None or is_cancelled():
+        return None
+    with span("tts.fallback", chars=len(text)):
+        speech = _fallback_voice(text)
+    if speech is not None:
+        policy.record_fallback()
+    return speech
 
 
+def synthesize_to_buffer(text: str, fallback: bool = True) -> AudioBuffer | None:
+    """
+    Converts text into speech and returns it in memory (no files, no MP3 decode).
+
+    The request has a deadline and is hedged if it runs past the recent p95;
+    while ElevenLabs is failing (or its circuit is open) the fallback voice
+    speaks instead.
+
+    Parameters:
+    - text: The text to convert to speech.
+    - fallback: use the fallback voice if ElevenLabs is unavailable (off for offline renders)
 
+    Returns:
+    - AudioBuffer with 16-bit mono PCM at TTS_SAMPLE_RATE, or None on failure
+      (or if the turn was cancelled)
+    """
+    if not API_KEY or not VOICE_ID:
+        print("Missing API key or Voice ID. Check your .env file.")
+        return None
+    if is_cancelled():
+        return None
 
-    temp_mp3_path = output_path.replace(".wav", ".mp3")
+    print("Sending text to ElevenLabs Turbo API...")
 
+    try:
+        body = elevenlabs.call(_fetch, text, {"output_format": f"pcm_{TTS_SAMPLE_RATE}"})
+    except Cancelled:
+        return None
+    except Unavailable as e:
+        if not fallback:
+            print(f"❌ ElevenLabs unavailable: {e}")
+            return None
+        print(f"❌ ElevenLabs unavailable ({e}), using the fallback voice")
+        return fallback_speech(text)
 
-    if response.status_code == 200:
-        # with open(output_path, "wb") as file:
-        with open(temp_mp3_path, "wb") as file:
+    if body is None or is_cancelled():
+        return None
 
-            file.write(response.content)
+    with span("tts.decode"):
+        return AudioBuffer.from_pcm16(body, TTS_SAMPLE_RATE)
 
 
+def synthesize_stream(text: str, chunk_ms: int = STREAM_CHUNK_MS):
+    """
+    Streams speech from ElevenLabs, yielding audio while the response is still downloading.
 
+    The first chunk is handed to the caller as soon as enough bytes arrive,
+    so Audio2Face can start talking before synthesis has finished.
 
+    Parameters:
+    - text: The text to convert to speech.
+    - chunk_ms: roughly how much audio each yielded chunk holds
 
+    Yields:
+    - AudioBuffer chunks of 16-bit mono PCM at TTS_SAMPLE_RATE (stops early if the turn is cancelled)
+    """
+    if not API_KEY or not VOICE_ID:
+        print("Missing API key or Voice ID. Check your .env file.")
+        return
+    if is_cancelled():
+        return
 
-             # Force proper format conversion after generation
-        sound = AudioSegment.from_file(temp_mp3_path)
-        sound = sound.set_channels(1).set_sample_width(2)  # Mono, 16-bit
-        sound.export(output_path, format="wav")
+    chunk_bytes = 2 * TTS_SAMPLE_RATE * chunk_ms // 1000
 
+    print("Streaming text to ElevenLabs Turbo API...")
+    start = time.perf_counter()
 
+    # Hedged on time to the first chunk; a duplicate that loses is closed unread
+    try:
+        response, chunks, head = elevenlabs_stream.call(
+            _open_stream, text, chunk_bytes, discard=lambda opened: opened[0].close()
+        )
+    except Cancelled:
+        return
+    except Unavailable as e:
+        print(f"❌ ElevenLabs unavailable ({e}), using the fallback voice")
+        speech = fallback_speech(text, elevenlabs_stream)
+        if speech is not None:
+            yield speech
+        return
 
+    with response, abort_on_cancel(response.close):
+        first = True
+        leftover = b""   # A network read can split a 16-bit sample in half
+        try:
+            for data in itertools.chain([head], chunks):
+                if is_cancelled():
+                    break
+                data = leftover + data
+                usable = len(data) - len(data) % 2
+                leftover = data[usable:]
+                if not usable:
+                    continue
+                if first:
+                    print(f"First audio chunk after {time.perf_counter() - start:.2f}s")
+                    record("tts.first_chunk", time.perf_counter() - start)
+                    first = False
+                yield AudioBuffer.from_pcm16(data[:usable], TTS_SAMPLE_RATE)
+        except Exception:
+            if not is_cancelled():
+                raise   # Otherwise it's just the barge-in closing the connection
+        record("tts.stream", time.perf_counter() - start, chars=len(text), cancelled=is_cancelled())
 
 
+def synthesize_speech(text: str, output_path: str = "output/tts_output.mp3") -> str | None:
+    """
+    Converts text into speech using ElevenLabs Turbo v2.5 API and saves it.
+
+    A .wav output_path is written straight from the PCM response; any other
+    extension saves the MP3 exactly as ElevenLabs sends it.
+
+    Parameters:
+    - text: The text to convert to speech.
+    - output_path: File path to save the audio output.
+
+    Returns:
+    - output_path on success, None on failure (or if the turn was cancelled)
+    """
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    if output_path.endswith(".wav"):
+        speech = synthesize_to_buffer(text)
+        if speech is None:
+            return None
+        with span("tts.write"):
+            speech.write_wav(output_path)
         print(f"Audio saved to {output_path}")
-    else:
-        print(f"Error {response.status_code}: {response.text}")
+        return output_path
+
+    if not API_KEY or not VOICE_ID:
+        print("Missing API key or Voice ID. Check your .env file.")
+        return None
+
+    if is_cancelled():
+        return None
+
+    print("Sending text to ElevenLabs Turbo API...")
+
+    try:
+        body = elevenlabs.call(_fetch, text)
+    except Cancelled:
+        return None
+    except Unavailable as e:
+        print(f"❌ ElevenLabs unavailable: {e}")
+        return None
+
+    # Don't leave an empty or half-written MP3 behind for a cancelled turn
+    if body is None or is_cancelled():
+        return None
+
+    with span("tts.write"), open(output_path, "wb") as file:
+        file.write(body)
+    print(f"Audio saved to {output_path}")
+    return output_path
 
 # 🧪 Direct testing mode
 if __name__ == "__main__":
     test_text = "The Ocean has many undiscovered species living in it."
     synthesize_speech(test_text)
-